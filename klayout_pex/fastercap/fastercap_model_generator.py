@@ -78,6 +78,7 @@ from ..log import (
     error,
     subproc
 )
+from ..util.stage_timer import record_metric
 
 
 @dataclass
@@ -735,6 +736,15 @@ class FasterCapModelGenerator:
 
         self.diel_data = dk
 
+        for net_name, count in self.triangle_counts_by_net().items():
+            record_metric('triangles by net', net_name, count)
+
+    def triangle_counts_by_net(self) -> Dict[str, int]:
+        counts: Dict[str, int] = defaultdict(int)
+        for k, v in self.cond_data.items():
+            counts[k.net_name] += len(v)
+        return dict(counts)
+
     def write_fastcap(self, output_dir_path: str, prefix: str) -> str:
         max_filename_length: Optional[int] = None
         try:
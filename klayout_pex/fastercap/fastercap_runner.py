@@ -21,6 +21,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 # --------------------------------------------------------------------------------
 #
+import os
 import re
 import subprocess
 import time
@@ -44,7 +45,8 @@ def run_fastercap(exe_path: str,
                   ooc_condition: Optional[int],
                   auto_preconditioner: bool,
                   galerkin_scheme: bool,
-                  jacobi_preconditioner: bool):
+                  jacobi_preconditioner: bool,
+                  num_threads: Optional[int] = None):
     args = [
         exe_path,
         '-b',                          # console mode, without GUI
@@ -73,10 +75,16 @@ def run_fastercap(exe_path: str,
     info(f"Calling FasterCap")
     subproc(f"{' '.join(args)}, output file: {log_path}")
 
+    env = None
+    if num_threads is not None:
+        info(f"Configure number of OpenMP threads (environmental variable OMP_NUM_THREADS) as {num_threads}")
+        env = {**os.environ, 'OMP_NUM_THREADS': f"{num_threads}"}
+
     rule('FasterCap Output')
     start = time.time()
 
     proc = subprocess.Popen(args,
+                            env=env,
                             stdin=subprocess.DEVNULL,
                             stdout=subprocess.PIPE,
                             stderr=subprocess.STDOUT,
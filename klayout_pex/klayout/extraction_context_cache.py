@@ -0,0 +1,343 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import cached_property
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import *
+
+import klayout.db as kdb
+
+from ..log import (
+    debug,
+    warning,
+)
+from ..tech_info import TechInfo
+from ..util.lru_cache_directory import LRUCacheDirectory
+from .lvsdb_cache import hash_file
+from .lvsdb_extractor import (
+    GDSPair,
+    KLayoutExtractedLayerInfo,
+    KLayoutExtractionContext,
+    KLayoutMergedExtractedLayerInfo,
+)
+import klayout_pex_protobuf.kpex.request.pex_request_pb2 as pex_request_pb2
+
+
+@dataclass(frozen=True)
+class ExtractionContextCacheKey:
+    """
+    All inputs which determine the result of KLayoutExtractionContext.prepare_extraction
+    """
+    lvsdb_path: str
+    tech_pbjson_path: str
+    top_cell: str
+    blackbox_devices: bool
+    tool_version: str
+
+    @cached_property
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        for name, value in (('top_cell', self.top_cell),
+                            ('blackbox_devices', self.blackbox_devices),
+                            ('tool_version', self.tool_version)):
+            h.update(f"{name}={value}\0".encode('utf-8'))
+        for name, path in (('lvsdb', self.lvsdb_path),
+                           ('tech', self.tech_pbjson_path)):
+            h.update(f"{name}\0".encode('utf-8'))
+            hash_file(h, path)
+        return h.hexdigest()
+
+
+class ExtractionContextCache(LRUCacheDirectory):
+    """
+    On-disk cache of prepared extraction contexts, so that re-runs with different
+    engine options (e.g. --halo, --delaunay_amax, --mode) can skip building the nets.
+
+    Each entry is a directory <digest>/ containing
+        - annotated_layout.oas: the annotated layout (net names as shape properties)
+        - context.json: the layer maps and the extracted layer metadata
+        - devices_and_pins.pb: the device and pin protobufs
+
+    Like the LVSDB cache, the least recently used entries are evicted
+    once the size limit is exceeded.
+
+    NOTE: the per-net shape partitions (see KLayoutExtractionContext.shapes_by_net)
+          are not persisted, they are rebuilt from the restored layers on first use
+          with a single pass over the shapes.
+    """
+
+    LAYOUT_FILE_NAME = 'annotated_layout.oas'
+    CONTEXT_FILE_NAME = 'context.json'
+    DEVICES_AND_PINS_FILE_NAME = 'devices_and_pins.pb'
+    COPY_PROPERTY_NAME = 'kpex_copy'
+
+    def entry_path(self, key: ExtractionContextCacheKey) -> str:
+        return os.path.join(self.cache_dir_path, key.digest)
+
+    def remove_entry(self, digest: str, entry: Dict[str, Any]):
+        debug(f"Evicting cached extraction context {digest} (cell {entry.get('top_cell')})")
+        shutil.rmtree(os.path.join(self.cache_dir_path, digest))
+
+    @staticmethod
+    def unique_layer_name(layer_index: int) -> str:
+        # NOTE: the annotated layout may contain multiple layers with the same GDS pair,
+        #       which would be merged when reading the OASIS file back
+        return f"kpex_layer_{layer_index}"
+
+    def store(self,
+              key: ExtractionContextCacheKey,
+              pex_context: KLayoutExtractionContext):
+        os.makedirs(self.cache_dir_path, exist_ok=True)
+        tmp_dir_path = tempfile.mkdtemp(dir=self.cache_dir_path, prefix='.context_')
+        try:
+            self._write_entry(entry_path=tmp_dir_path, pex_context=pex_context)
+            try:
+                os.rename(tmp_dir_path, self.entry_path(key))
+            except OSError:  # NOTE: stored concurrently by another run
+                debug(f"Extraction context {key.digest} is already cached")
+        finally:
+            if os.path.exists(tmp_dir_path):
+                shutil.rmtree(tmp_dir_path, ignore_errors=True)
+
+        entry_path = self.entry_path(key)
+        with self._locked_index() as index:
+            index[key.digest] = {
+                'size': sum(os.path.getsize(os.path.join(entry_path, f)) for f in os.listdir(entry_path)),
+                'last_used': time.time(),
+                'top_cell': key.top_cell,
+                'lvsdb_path': os.path.abspath(key.lvsdb_path),
+            }
+            self._evict(index=index, keep_digest=key.digest)
+
+    @classmethod
+    def _tag_identical_shapes(cls, layout: kdb.Layout) -> List[Tuple[str, int]]:
+        """
+        OASIS compression folds identical shapes into repetitions, which are dropped when reading.
+        To let them survive the round trip, every further copy of a shape is tagged
+        with its copy number as a property (stripped again by _untag_identical_shapes)
+
+        :return: the tagged (cell name, layer index) pairs
+        """
+        tagged = []
+        for cell in layout.each_cell():
+            for layer_index in layout.layer_indexes():
+                shapes: kdb.Shapes = cell.shapes(layer_index)
+                if shapes.is_empty():
+                    continue
+                shape_keys = [str(s) for s in shapes.each()]
+                if len(set(shape_keys)) == len(shape_keys):
+                    continue
+                original_shapes = kdb.Shapes()
+                original_shapes.insert(shapes)
+                shapes.clear()
+                copy_counts: Dict[str, int] = defaultdict(int)
+                for s in original_shapes.each():
+                    copy_number = copy_counts[str(s)]
+                    copy_counts[str(s)] += 1
+                    new_shape = shapes.insert(s)
+                    if copy_number > 0:
+                        new_shape.set_property(cls.COPY_PROPERTY_NAME, copy_number)
+                tagged.append((cell.name, layer_index))
+        return tagged
+
+    @classmethod
+    def _untag_identical_shapes(cls,
+                                layout: kdb.Layout,
+                                tagged: List[Tuple[str, int]],
+                                layer_index_by_name: Dict[str, int]):
+        for cell_name, original_layer_index in tagged:
+            layer_index = layer_index_by_name[cls.unique_layer_name(original_layer_index)]
+            shapes: kdb.Shapes = layout.cell(cell_name).shapes(layer_index)
+            tagged_shapes = kdb.Shapes()
+            tagged_shapes.insert(shapes)
+            shapes.clear()
+            for s in tagged_shapes.each():
+                if s.property(cls.COPY_PROPERTY_NAME) is None:
+                    shapes.insert(s)
+                elif len(s.properties()) == 1:  # NOTE: insert the bare geometry, without an (empty) property set
+                    shapes.insert(s.box if s.is_box() else
+                                  s.path if s.is_path() else
+                                  s.text if s.is_text() else
+                                  s.edge if s.is_edge() else
+                                  s.polygon)
+                else:
+                    shapes.insert(s).delete_property(cls.COPY_PROPERTY_NAME)
+
+    def _write_entry(self,
+                     entry_path: str,
+                     pex_context: KLayoutExtractionContext):
+        layout: kdb.Layout = pex_context.annotated_layout.dup()
+        layer_infos = []
+        for layer_index in layout.layer_indexes():
+            li: kdb.LayerInfo = layout.get_info(layer_index)
+            layer_infos.append([layer_index, li.layer, li.datatype])
+            layout.set_info(layer_index, kdb.LayerInfo(li.layer, li.datatype, self.unique_layer_name(layer_index)))
+        tagged_shapes = self._tag_identical_shapes(layout)
+        options = kdb.SaveLayoutOptions()
+        options.format = 'OASIS'
+        layout.write(os.path.join(entry_path, self.LAYOUT_FILE_NAME), options)
+
+        lvsdb_layer_indexes = pex_context.lvsdb.layer_indexes()
+
+        def layer_info_json(linfo: KLayoutExtractedLayerInfo) -> Dict[str, Any]:
+            return {
+                'index': linfo.index,
+                'lvs_layer_name': linfo.lvs_layer_name,
+                'gds_pair': list(linfo.gds_pair),
+                'annotated_layer_index': pex_context.layer_index_map[lvsdb_layer_indexes[linfo.index]],
+            }
+
+        devices_and_pins = pex_request_pb2.RExtractionRequest()
+        pin_counts_by_gds_pair = []
+        for gds_pair, pin_list in pex_context.pins_pb2_by_layer.items():
+            devices_and_pins.pins.extend(pin_list)
+            pin_counts_by_gds_pair.append([list(gds_pair), len(pin_list)])
+        devices_and_pins.devices.extend(pex_context.devices_by_name.values())
+
+        context_json = {
+            'top_cell': pex_context.annotated_top_cell.name,
+            'dbu': pex_context.dbu,
+            'layer_infos': layer_infos,
+            'tagged_shapes': [list(t) for t in tagged_shapes],
+            'layer_index_map': [[k, v] for k, v in pex_context.layer_index_map.items()],
+            'extracted_layers': [[layer_info_json(sl) for sl in lyr.source_layers]
+                                 for lyr in pex_context.extracted_layers.values()],
+            'unnamed_layers': [layer_info_json(linfo) for linfo in pex_context.unnamed_layers],
+            'pin_counts_by_gds_pair': pin_counts_by_gds_pair,
+        }
+        with open(os.path.join(entry_path, self.CONTEXT_FILE_NAME), 'w', encoding='utf-8') as f:
+            json.dump(context_json, f, indent=2)
+
+        with open(os.path.join(entry_path, self.DEVICES_AND_PINS_FILE_NAME), 'wb') as f:
+            f.write(devices_and_pins.SerializeToString())
+
+    def lookup(self,
+               key: ExtractionContextCacheKey,
+               lvsdb: kdb.LayoutToNetlist,
+               tech: TechInfo,
+               blackbox_devices: bool) -> Optional[KLayoutExtractionContext]:
+        """
+        :return: the restored extraction context, or None for a cache miss
+        """
+        entry_path = self.entry_path(key)
+        # NOTE: the entry is read while holding the lock,
+        #       so parallel runs can't evict it in the meantime
+        with self._locked_index() as index:
+            entry = index.get(key.digest, None)
+            if entry is None:
+                return None
+            try:
+                pex_context = self._read_entry(entry_path=entry_path,
+                                               lvsdb=lvsdb,
+                                               tech=tech,
+                                               blackbox_devices=blackbox_devices)
+            except (OSError, ValueError, KeyError) as e:
+                warning(f"Ignoring corrupt cached extraction context {entry_path}: {e}")
+                del index[key.digest]
+                shutil.rmtree(entry_path, ignore_errors=True)
+                return None
+            entry['last_used'] = time.time()
+        return pex_context
+
+    def _read_entry(self,
+                    entry_path: str,
+                    lvsdb: kdb.LayoutToNetlist,
+                    tech: TechInfo,
+                    blackbox_devices: bool) -> KLayoutExtractionContext:
+        with open(os.path.join(entry_path, self.CONTEXT_FILE_NAME), 'r', encoding='utf-8') as f:
+            context_json = json.load(f)
+
+        loaded_layout = kdb.Layout()
+        loaded_layout.read(os.path.join(entry_path, self.LAYOUT_FILE_NAME))
+        self._untag_identical_shapes(layout=loaded_layout,
+                                     tagged=[tuple(t) for t in context_json['tagged_shapes']],
+                                     layer_index_by_name={loaded_layout.get_info(li).name: li
+                                                          for li in loaded_layout.layer_indexes()})
+
+        # NOTE: the layer indexes are referenced by the layer maps and the protobufs,
+        #       so recreate the layers at their original indexes (with the unique names,
+        #       so copy_tree maps the loaded layers onto them), and strip the names afterwards
+        annotated_layout = kdb.Layout()
+        annotated_layout.dbu = context_json['dbu']
+        for layer_index, layer, datatype in context_json['layer_infos']:
+            annotated_layout.insert_layer_at(layer_index,
+                                             kdb.LayerInfo(layer, datatype, self.unique_layer_name(layer_index)))
+        top_cell = annotated_layout.create_cell(context_json['top_cell'])
+        top_cell.copy_tree(loaded_layout.cell(context_json['top_cell']))
+        for layer_index, layer, datatype in context_json['layer_infos']:
+            annotated_layout.set_info(layer_index, kdb.LayerInfo(layer, datatype))
+
+        layer_index_map = {k: v for k, v in context_json['layer_index_map']}
+        lvsdb_regions = {v: lvsdb.layer_by_index(k) for k, v in layer_index_map.items()}
+
+        def layer_info(linfo_json: Dict[str, Any]) -> KLayoutExtractedLayerInfo:
+            region = kdb.Region(top_cell.begin_shapes_rec(linfo_json['annotated_layer_index']))
+            region.enable_properties()
+            return KLayoutExtractedLayerInfo(index=linfo_json['index'],
+                                             lvs_layer_name=linfo_json['lvs_layer_name'],
+                                             gds_pair=tuple(linfo_json['gds_pair']),
+                                             region=region)
+
+        extracted_layers: Dict[GDSPair, KLayoutMergedExtractedLayerInfo] = {}
+        for source_layers_json in context_json['extracted_layers']:
+            source_layers = [layer_info(sl) for sl in source_layers_json]
+            gds_pair = source_layers[0].gds_pair
+            extracted_layers[gds_pair] = KLayoutMergedExtractedLayerInfo(source_layers=source_layers,
+                                                                         gds_pair=gds_pair)
+
+        pex_context = KLayoutExtractionContext(
+            lvsdb=lvsdb,
+            tech=tech,
+            dbu=annotated_layout.dbu,
+            annotated_top_cell=top_cell,
+            layer_index_map=layer_index_map,
+            lvsdb_regions=lvsdb_regions,
+            cell_mapping=lvsdb.cell_mapping_into(annotated_layout, top_cell, not blackbox_devices),
+            annotated_layout=annotated_layout,
+            extracted_layers=extracted_layers,
+            unnamed_layers=[layer_info(linfo) for linfo in context_json['unnamed_layers']]
+        )
+
+        devices_and_pins = pex_request_pb2.RExtractionRequest()
+        with open(os.path.join(entry_path, self.DEVICES_AND_PINS_FILE_NAME), 'rb') as f:
+            devices_and_pins.ParseFromString(f.read())
+
+        pins_pb2_by_layer = {}
+        pin_iter = iter(devices_and_pins.pins)
+        for gds_pair, count in context_json['pin_counts_by_gds_pair']:
+            pins_pb2_by_layer[tuple(gds_pair)] = [next(pin_iter) for _ in range(count)]
+
+        # NOTE: prefill the cached properties
+        pex_context.__dict__['pins_pb2_by_layer'] = pins_pb2_by_layer
+        pex_context.__dict__['devices_by_name'] = {d.device_name: d for d in devices_and_pins.devices}
+
+        return pex_context
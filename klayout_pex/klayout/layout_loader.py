@@ -0,0 +1,104 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from dataclasses import dataclass
+import os
+import threading
+import time
+from typing import *
+
+import klayout.db as kdb
+
+from ..log import (
+    debug,
+    info,
+)
+
+
+@dataclass
+class LayoutHierarchyInfo:
+    """
+    Cell names and top cells of a layout file, without any geometry
+    """
+    dbu: float
+    cell_names: List[str]
+    top_cell_names: List[str]
+
+
+class LayoutLoader:
+    """
+    Loads layout files at most once per process.
+
+    The cell hierarchy can be read cheaply, without loading any shapes
+    (all layers are unmapped), which is sufficient to discover the cells and top cells.
+    Full layout loads are cached and shared by all stages needing the geometry.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._layouts: Dict[str, kdb.Layout] = {}
+        self._hierarchy_infos: Dict[str, LayoutHierarchyInfo] = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.realpath(path)
+
+    def hierarchy_info(self, path: str) -> LayoutHierarchyInfo:
+        key = self._key(path)
+        with self._lock:
+            hierarchy_info = self._hierarchy_infos.get(key, None)
+            if hierarchy_info is not None:
+                return hierarchy_info
+
+            layout = self._layouts.get(key, None)
+            if layout is None:
+                start = time.time()
+                options = kdb.LoadLayoutOptions()
+                options.layer_map = kdb.LayerMap()  # NOTE: map no layers …
+                options.create_other_layers = False  # … and skip all others, so no shapes are loaded
+                layout = kdb.Layout()
+                layout.read(path, options)
+                debug(f"Read cell hierarchy of {path} in {'%.4g' % (time.time() - start)}s")
+
+            hierarchy_info = LayoutHierarchyInfo(dbu=layout.dbu,
+                                                 cell_names=[c.name for c in layout.each_cell()],
+                                                 top_cell_names=[c.name for c in layout.top_cells()])
+            self._hierarchy_infos[key] = hierarchy_info
+            return hierarchy_info
+
+    def layout(self, path: str) -> kdb.Layout:
+        """
+        The fully loaded layout (shared, must not be modified)
+        """
+        key = self._key(path)
+        with self._lock:
+            layout = self._layouts.get(key, None)
+            if layout is None:
+                start = time.time()
+                layout = kdb.Layout()
+                layout.read(path)
+                info(f"Read layout {path} in {'%.4g' % (time.time() - start)}s")
+                self._layouts[key] = layout
+            return layout
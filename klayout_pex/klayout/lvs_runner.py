@@ -38,6 +38,14 @@ from ..log import (
 
 
 class LVSRunner:
+    @staticmethod
+    def klayout_version(exe_path: str) -> str:
+        proc = subprocess.run([exe_path, '-b', '-v'],
+                              stdin=subprocess.DEVNULL,
+                              capture_output=True,
+                              text=True)
+        return proc.stdout.strip()
+
     @staticmethod
     def run_klayout_lvs(exe_path: str,
                         lvs_script: str,
@@ -45,7 +53,7 @@ class LVSRunner:
                         schematic_path: str,
                         log_path: str,
                         lvsdb_path: str,
-                        verbose: bool):
+                        verbose: bool) -> int:
         args = [
             exe_path,
             '-b',
@@ -97,3 +105,5 @@ class LVSRunner:
         else:
             warning(f"klayout LVS failed with status code {proc.returncode} after {'%.4g' % duration}s, "
                     f"see log file: {log_path}")
+
+        return proc.returncode
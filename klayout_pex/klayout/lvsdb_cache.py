@@ -0,0 +1,141 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cached_property
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from typing import *
+
+from ..log import (
+    debug,
+)
+from ..util.lru_cache_directory import LRUCacheDirectory
+
+
+def hash_file(hasher: Any,  # NOTE: a hashlib hash object, e.g. hashlib.sha256()
+              path: str,
+              chunk_size: int = 1 << 20):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+
+@dataclass(frozen=True)
+class LVSDBCacheKey:
+    """
+    All inputs which determine the LVSDB created by the LVS run
+    """
+    gds_path: str
+    cell_name: str
+    schematic_path: str
+    lvs_script_path: str
+    pdk: str
+    tool_version: str  # e.g. the KLayout and KPEX versions
+
+    @cached_property
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        for name, value in (('cell', self.cell_name),
+                            ('pdk', self.pdk),
+                            ('tool_version', self.tool_version)):
+            h.update(f"{name}={value}\0".encode('utf-8'))
+        for name, path in (('gds', self.gds_path),
+                           ('schematic', self.schematic_path),
+                           ('lvs_script', self.lvs_script_path)):
+            h.update(f"{name}\0".encode('utf-8'))
+            hash_file(h, path)
+        return h.hexdigest()
+
+
+class LVSDBCache(LRUCacheDirectory):
+    """
+    Content addressed cache of LVSDB files.
+
+    Entries are stored as <digest>.lvsdb.gz, an index file keeps track of their sizes and
+    last usage, so the least recently used entries can be evicted once the size limit is exceeded.
+
+    All writes go to temporary files which are atomically renamed, and index updates are
+    serialized by a lock file, so parallel kpex runs can share a cache directory.
+    """
+
+    def entry_path(self, key: LVSDBCacheKey) -> str:
+        return os.path.join(self.cache_dir_path, f"{key.digest}.lvsdb.gz")
+
+    def remove_entry(self, digest: str, entry: Dict[str, Any]):
+        debug(f"Evicting cached LVSDB {digest} (cell {entry.get('cell_name')})")
+        os.remove(os.path.join(self.cache_dir_path, f"{digest}.lvsdb.gz"))
+
+    def lookup(self, key: LVSDBCacheKey, dest_path: str) -> bool:
+        """
+        Copies the cached LVSDB to dest_path.
+
+        NOTE: the copy is made while holding the lock,
+              so parallel runs can't evict the entry in the meantime
+
+        :return: True for a cache hit, False for a cache miss
+        """
+        path = self.entry_path(key)
+        with self._locked_index() as index:
+            entry = index.get(key.digest, None)
+            if entry is None:
+                return False
+            try:
+                shutil.copyfile(path, dest_path)
+            except FileNotFoundError:  # removed behind our back
+                del index[key.digest]
+                return False
+            entry['last_used'] = time.time()
+        return True
+
+    def store(self, key: LVSDBCacheKey, lvsdb_path: str):
+        """
+        Copies the LVSDB into the cache, and evicts the least recently used entries
+        if the cache exceeds its size limit
+        """
+        os.makedirs(self.cache_dir_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir_path, prefix='.lvsdb_', suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(lvsdb_path, tmp_path)
+            os.replace(tmp_path, self.entry_path(key))
+        except BaseException:
+            self._remove_temp_file(tmp_path)
+            raise
+
+        with self._locked_index() as index:
+            index[key.digest] = {
+                'size': os.path.getsize(self.entry_path(key)),
+                'last_used': time.time(),
+                'cell_name': key.cell_name,
+                'gds_path': os.path.abspath(key.gds_path),
+            }
+            self._evict(index=index, keep_digest=key.digest)
@@ -24,7 +24,7 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import cached_property
 import tempfile
 from typing import *
@@ -42,6 +42,7 @@ from ..log import (
     rule
 )
 
+from .pin_label_join import PinLabelJoin
 from .shapes_pb2_converter import ShapesConverter
 
 from ..tech_info import TechInfo
@@ -52,9 +53,11 @@ import klayout_pex_protobuf.kpex.layout.location_pb2 as location_pb2
 import klayout_pex_protobuf.kpex.tech.tech_pb2 as tech_pb2
 
 GDSPair = Tuple[int, int]
+NetName = str
 
 LayerIndexMap = Dict[int, int]  # maps layer indexes of LVSDB to annotated_layout
 LVSDBRegions = Dict[int, kdb.Region]  # maps layer index of annotated_layout to LVSDB region
+ShapesByNet = Dict[NetName, kdb.Region]  # maps net name to the (merged source layer) shapes of that net
 
 
 @dataclass
@@ -84,6 +87,9 @@ class KLayoutExtractionContext:
     extracted_layers: Dict[GDSPair, KLayoutMergedExtractedLayerInfo]
     unnamed_layers: List[KLayoutExtractedLayerInfo]
 
+    # NOTE: lazily built per GDS pair, see shapes_by_net()
+    shapes_by_net_by_gds_pair: Dict[GDSPair, ShapesByNet] = field(default_factory=dict)
+
     @classmethod
     def prepare_extraction(cls,
                            lvsdb: kdb.LayoutToNetlist,
@@ -262,25 +268,39 @@ class KLayoutExtractionContext:
         else:
             return b2
 
-    def shapes_of_net(self, gds_pair: GDSPair, net: kdb.Net | str) -> Optional[kdb.Region]:
+    def shapes_by_net(self, gds_pair: GDSPair) -> Optional[ShapesByNet]:
+        """
+        Net-partitioned shapes of a layer.
+
+        The index is built with a single pass over the source layers on first use
+        and cached, so that subsequent per-net lookups don't have to scan the whole layer again.
+
+        NOTE: the regions are shared by all callers and must not be modified,
+              use shapes_of_net() for a modifiable copy
+        """
         lyr = self.extracted_layers.get(gds_pair, None)
         if not lyr:
             return None
 
-        shapes = kdb.Region()
-        shapes.enable_properties()
+        shapes_by_net = self.shapes_by_net_by_gds_pair.get(gds_pair, None)
+        if shapes_by_net is not None:
+            return shapes_by_net
 
-        requested_net_name = net.name if isinstance(net, kdb.Net) else net
+        shapes_by_net = {}
 
         def add_shapes_from_region(source_region: kdb.Region):
             iter, transform = source_region.begin_shapes_rec()
             while not iter.at_end():
                 shape = iter.shape()
                 net_name = shape.property('net')
-                if net_name == requested_net_name:
-                    shapes.insert(transform *     # NOTE: this is a global/initial iterator-wide transformation
-                                  iter.trans() *  # NOTE: this is local during the iteration (due to sub hierarchy)
-                                  shape.polygon)
+                shapes = shapes_by_net.get(net_name, None)
+                if shapes is None:
+                    shapes = kdb.Region()
+                    shapes.enable_properties()
+                    shapes_by_net[net_name] = shapes
+                shapes.insert(transform *     # NOTE: this is a global/initial iterator-wide transformation
+                              iter.trans() *  # NOTE: this is local during the iteration (due to sub hierarchy)
+                              shape.polygon)
                 iter.next()
 
         match len(lyr.source_layers):
@@ -290,7 +310,37 @@ class KLayoutExtractionContext:
                 for sl in lyr.source_layers:
                     add_shapes_from_region(sl.region)
 
-        return shapes
+        self.shapes_by_net_by_gds_pair[gds_pair] = shapes_by_net
+        return shapes_by_net
+
+    def warm_caches(self):
+        """
+        Fills the lazily built caches (per-net shapes, pins, devices) up front,
+        so that engines running concurrently in threads only read them
+        """
+        for gds_pair in self.extracted_layers.keys():
+            self.shapes_by_net(gds_pair)
+        _ = self.top_circuit
+        _ = self.devices_by_name
+        _ = self.pins_pb2_by_layer
+
+    def shapes_of_net(self, gds_pair: GDSPair, net: kdb.Net | str) -> Optional[kdb.Region]:
+        """
+        :return: a copy of the shapes of the net (see shapes_by_net),
+                 so the caller may modify it without affecting the cached index
+        """
+        shapes_by_net = self.shapes_by_net(gds_pair)
+        if shapes_by_net is None:
+            return None
+
+        requested_net_name = net.name if isinstance(net, kdb.Net) else net
+
+        shapes = shapes_by_net.get(requested_net_name, None)
+        if shapes is None:
+            shapes = kdb.Region()
+            shapes.enable_properties()
+            return shapes
+        return shapes.dup()
 
     def shapes_of_layer(self, gds_pair: GDSPair) -> Optional[kdb.Region]:
         lyr = self.extracted_layers.get(gds_pair, None)
@@ -428,15 +478,25 @@ class KLayoutExtractionContext:
             if gds_pair not in self.tech.layer_info_by_gds_pair:
                 continue
 
+            pins = self.pins_of_layer(gds_pair)
+            labels = self.labels_of_layer(gds_pair)
+
+            join_result = PinLabelJoin(pins.each()).join(labels.each())
+            for l in join_result.unmatched:
+                debug(f"Label '{l.string}' at {l.position()} on layer {canonical_layer_name} "
+                      f"is not inside of any pin shape, skipping")
+            for l, candidate_pins in join_result.ambiguous:
+                candidate_nets = ', '.join(sorted({p.property('net') for p in candidate_pins}))
+                warning(f"Label '{l.string}' at {l.position()} on layer {canonical_layer_name} "
+                        f"is inside of pin shapes of multiple nets ({candidate_nets}), "
+                        f"using net {candidate_pins[0].property('net')}")
+
             for lyr in lyr_info.source_layers:
                 klayout_index = self.annotated_layout.layer(*lyr.gds_pair)
 
-                pins = self.pins_of_layer(gds_pair)
-                labels = self.labels_of_layer(gds_pair)
-
-                pin_labels: kdb.Texts = labels & pins
-                for l in pin_labels:
+                for l, p in join_result.matched:
                     l: kdb.Text
+                    p: kdb.PolygonWithProperties
                     # NOTE: because we want more like a point as a junction
                     #       and folx create huge pins (covering the whole metal)
                     #       we create our own "mini squares"
@@ -448,12 +508,7 @@ class KLayoutExtractionContext:
 
                     pos = l.position()
 
-                    # is there more elegant / faster way to do this?
-                    for p in pins:
-                        p: kdb.PolygonWithProperties
-                        if p.inside(pos):
-                            pin.net_name = p.property('net')
-                            break
+                    pin.net_name = p.property('net')
 
                     canonical_layer_name = self.tech.canonical_layer_name_by_gds_pair[lyr.gds_pair]
                     lvs_layer_name = self.tech.computed_layer_info_by_gds_pair[lyr.gds_pair].layer_info.name
@@ -0,0 +1,102 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+import statistics
+from typing import *
+
+import klayout.db as kdb
+
+
+GridCell = Tuple[int, int]
+
+
+@dataclass
+class PinLabelJoinResult:
+    matched: List[Tuple[kdb.Text, kdb.PolygonWithProperties]] = field(default_factory=list)
+    unmatched: List[kdb.Text] = field(default_factory=list)
+    ambiguous: List[Tuple[kdb.Text, List[kdb.PolygonWithProperties]]] = field(default_factory=list)
+
+
+class PinLabelJoin:
+    """
+    Bulk spatial join of labels (texts) to the pin polygons containing them.
+
+    The pin polygons are bucketed once into a uniform grid (by their bounding boxes),
+    so every label only has to be tested against the few pins sharing its grid cell,
+    instead of scanning all pins of the layer for every label.
+    """
+
+    # NOTE: pins spanning more grid cells than this (e.g. huge pins covering a whole metal)
+    #       are not bucketed, but tested against each label directly
+    MAX_CELLS_PER_PIN = 64
+
+    def __init__(self, pins: Iterable[kdb.PolygonWithProperties]):
+        self.pins: List[kdb.PolygonWithProperties] = list(pins)
+        self.grid: Dict[GridCell, List[int]] = defaultdict(list)
+        self.oversized_pin_indices: List[int] = []
+
+        bboxes = [p.bbox() for p in self.pins]
+        self.cell_size = max(1, int(statistics.median([max(b.width(), b.height()) for b in bboxes]))) \
+                         if bboxes else 1
+
+        for idx, bbox in enumerate(bboxes):
+            x1, y1 = self._cell_coords(bbox.left, bbox.bottom)
+            x2, y2 = self._cell_coords(bbox.right, bbox.top)
+            if (x2 - x1 + 1) * (y2 - y1 + 1) > self.MAX_CELLS_PER_PIN:
+                self.oversized_pin_indices.append(idx)
+                continue
+            for x in range(x1, x2 + 1):
+                for y in range(y1, y2 + 1):
+                    self.grid[x, y].append(idx)
+
+    def _cell_coords(self, x: int, y: int) -> GridCell:
+        return x // self.cell_size, y // self.cell_size
+
+    def pins_at(self, pos: kdb.Point) -> List[kdb.PolygonWithProperties]:
+        """
+        :return: all pins containing the point, in the order of the input pins
+        """
+        candidates = self.grid.get(self._cell_coords(pos.x, pos.y), [])
+        if self.oversized_pin_indices:
+            candidates = sorted(set(candidates).union(self.oversized_pin_indices))
+        return [self.pins[idx] for idx in candidates if self.pins[idx].inside(pos)]
+
+    def join(self, labels: Iterable[kdb.Text]) -> PinLabelJoinResult:
+        result = PinLabelJoinResult()
+        for l in labels:
+            pins = self.pins_at(l.position())
+            match len(pins):
+                case 0:
+                    result.unmatched.append(l)
+                case 1:
+                    result.matched.append((l, pins[0]))
+                case _:
+                    # NOTE: several pins of the same net are fine (e.g. overlapping pin shapes)
+                    if len({p.property('net') for p in pins}) >= 2:
+                        result.ambiguous.append((l, pins))
+                    result.matched.append((l, pins[0]))
+        return result
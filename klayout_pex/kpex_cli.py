@@ -27,6 +27,7 @@ import argparse
 from datetime import datetime
 from enum import StrEnum
 from functools import cached_property
+import importlib.metadata
 import logging
 import os
 import os.path
@@ -48,7 +49,10 @@ from .fastercap.fastercap_input_builder import FasterCapInputBuilder
 from .fastercap.fastercap_model_generator import FasterCapModelGenerator
 from .fastercap.fastercap_runner import run_fastercap, fastercap_parse_capacitance_matrix
 from .fastcap.fastcap_runner import run_fastcap, fastcap_parse_capacitance_matrix
+from .klayout.layout_loader import LayoutLoader
 from .klayout.lvs_runner import LVSRunner
+from .klayout.extraction_context_cache import ExtractionContextCache, ExtractionContextCacheKey
+from .klayout.lvsdb_cache import LVSDBCache, LVSDBCacheKey
 from .klayout.lvsdb_extractor import KLayoutExtractionContext, KLayoutExtractedLayerInfo
 from .klayout.netlist_expander import NetlistExpander
 from .klayout.netlist_csv import NetlistCSVWriter
@@ -77,12 +81,20 @@ from .magic.magic_runner import (
 )
 from .magic.magic_log_analyzer import MagicLogAnalyzer
 from .pdk_config import PDKConfig
+from .rcx25.c.bulk_overlap_extractor import OverlapEngine
+from .rcx25.c.bulk_sidewall_extractor import SidewallEngine
+from .rcx25.extraction_reporter import ReportLevel
+from .rcx25.extraction_results import ResultsMode
 from .rcx25.extractor import RCX25Extractor, ExtractionResults
 from .rcx25.netlist_expander import RCX25NetlistExpander
 from .rcx25.pex_mode import PEXMode
+from .rcx25.pex_result_file import write_pex_result
 from .tech_info import TechInfo
 from .util.multiple_choice import MultipleChoicePattern
 from .util.argparse_helpers import render_enum_help, true_or_false
+from .util.artifact_writer import ArtifactPolicy, ArtifactWriter
+from .util.engine_scheduler import EngineScheduler, EngineSpec
+from .util.stage_timer import StageTimer, stage, set_stage_timer, record_metric
 from .version import __version__
 
 
@@ -157,6 +169,18 @@ class KpexCLI:
         group_special.add_argument("--threads", dest='num_threads', type=int,
                                    default=os.cpu_count() * 4,
                                    help="number of threads (e.g. for FasterCap) (default is %(default)s)")
+        group_special.add_argument("--artifacts", dest='artifact_policy',
+                                   type=ArtifactPolicy, choices=list(ArtifactPolicy), default=ArtifactPolicy.DEFAULT,
+                                   help=render_enum_help(topic='artifacts', enum_cls=ArtifactPolicy))
+        group_special.add_argument("--concurrent-engines", dest='concurrent_engines',
+                                   type=true_or_false, default=True,
+                                   help="Run the selected PEX engines concurrently, "
+                                        "splitting the number of threads between them (default is %(default)s)")
+        group_special.add_argument("--profile", dest='profile',
+                                   action='store_true', default=False,
+                                   help="Profile each stage of the run (cProfile), "
+                                        "writing one .pstats file per stage. NOTE: of concurrent engines, "
+                                        "only one is profiled at a time (default is %(default)s)")
 
         group_pex = main_parser.add_argument_group("Parasitic Extraction Setup")
         group_pex.add_argument("--pdk", dest="pdk", required=True,
@@ -183,6 +207,14 @@ class KpexCLI:
                                      help="Used cached LVSDB (for given input GDS) (default is %(default)s)")
         group_pex_input.add_argument("--cache-dir", dest="cache_dir_path", default=None,
                                      help="Path for cached LVSDB (default is .kpex_cache within --out_dir)")
+        group_pex_input.add_argument("--cache-size", dest="cache_max_size_mb",
+                                     type=float, default=1024.0,
+                                     help="Size limit of each cache (LVSDB, extraction context) in MB, "
+                                          "the least recently used entries are evicted (default is %(default)s)")
+        group_pex_input.add_argument("--cache-context", dest="cache_context",
+                                     type=true_or_false, default=True,
+                                     help="Used cached extraction context (for given LVSDB and tech), "
+                                          "e.g. when only changing engine options (default is %(default)s)")
         group_pex_input.add_argument("--lvs-verbose", dest="klayout_lvs_verbose",
                                      type=true_or_false, default=False,
                                      help="Verbose KLayout LVS output (default is %(default)s)")
@@ -295,6 +327,47 @@ class KpexCLI:
         group_25d.add_argument("--scale", dest="scale_ratio_to_fit_halo",
                                 type=true_or_false, default=True,
                                 help=f"Scale fringe ratios, so that halo distance is 100%% (default is %(default)s)")
+        group_25d.add_argument("--parallel", dest="rcx25d_parallel",
+                               type=true_or_false, default=False,
+                               help="Run the per-layer capacitance passes in a pool of worker processes, "
+                                    "sized by --threads. NOTE: implies --concurrent-engines n "
+                                    "(default is %(default)s)")
+        group_25d.add_argument("--tile_size", dest="rcx25d_tile_size",
+                               type=float, default=None,
+                               help="Split the capacitance extraction into square tiles of this size (in µm), "
+                                    "e.g. to limit the memory of large layouts (default is no tiling)")
+        group_25d.add_argument("--hierarchical", dest="rcx25d_hierarchical",
+                               type=true_or_false, default=False,
+                               help="Extract the capacitances within each unique leaf cell only once, "
+                                    "and only the couplings between the instances on the top level. "
+                                    "NOTE: cells of instances near other shapes are extracted once per "
+                                    "distinct context, i.e. with the surrounding shapes within the halo "
+                                    "(e.g. routing over the cell), which shield the cell internal capacitances "
+                                    "(default is %(default)s)")
+        group_25d.add_argument("--overlap_engine", dest='rcx25d_overlap_engine',
+                               default=OverlapEngine.DEFAULT, type=OverlapEngine, choices=list(OverlapEngine),
+                               help=render_enum_help(topic='overlap_engine', enum_cls=OverlapEngine))
+        group_25d.add_argument("--sidewall_engine", dest='rcx25d_sidewall_engine',
+                               default=SidewallEngine.DEFAULT, type=SidewallEngine, choices=list(SidewallEngine),
+                               help=render_enum_help(topic='sidewall_engine', enum_cls=SidewallEngine))
+        group_25d.add_argument("--results", dest='rcx25d_results_mode',
+                               default=ResultsMode.DEFAULT, type=ResultsMode, choices=list(ResultsMode),
+                               help=render_enum_help(topic='results', enum_cls=ResultsMode))
+        group_25d.add_argument("--report_level", dest='rcx25d_report_level',
+                               default=ReportLevel.DEFAULT, type=ReportLevel, choices=list(ReportLevel),
+                               help=render_enum_help(topic='report_level', enum_cls=ReportLevel))
+        group_25d.add_argument("--report_max_items", dest="rcx25d_report_max_items",
+                               type=int, default=None,
+                               help="Maximum number of reported capacitance contributions per category "
+                                    "(default is no limit)")
+        group_25d.add_argument("--report_deferred", dest="rcx25d_report_deferred",
+                               type=true_or_false, default=False,
+                               help="Buffer the reported capacitance contributions "
+                                    "and build the report database once at the end (default is %(default)s)")
+        group_25d.add_argument("--report_streaming", dest="rcx25d_report_streaming",
+                               type=true_or_false, default=False,
+                               help="Stream the report items into the report file, "
+                                    "instead of building the report database in memory (default is %(default)s)")
 
         if arg_list is None:
             arg_list = sys.argv[1:]
@@ -312,6 +385,8 @@ class KpexCLI:
     def validate_args(args: argparse.Namespace):
         found_errors = False
 
+        args.layout_loader = LayoutLoader()
+
         pdk_config: PDKConfig = args.pdk.config
         args.tech_pbjson_path = pdk_config.tech_pb_json_path
         args.lvs_script_path = pdk_config.pex_lvs_script_path
@@ -334,6 +409,14 @@ class KpexCLI:
             error(f"Can't locate LVS script path at {args.lvs_script_path}")
             found_errors = True
 
+        if args.rcx25d_tile_size is not None and args.rcx25d_tile_size <= 0:
+            error(f"Tile size must be positive, but is {args.rcx25d_tile_size} µm")
+            found_errors = True
+
+        if args.rcx25d_report_max_items is not None and args.rcx25d_report_max_items <= 0:
+            error(f"Maximum number of report items must be positive, but is {args.rcx25d_report_max_items}")
+            found_errors = True
+
         rule('Input Layout')
 
         # check engines VS input possiblities
@@ -367,27 +450,21 @@ class KpexCLI:
                 error(f"Can't read GDS file (LVS input) at path {args.gds_path}")
                 found_errors = True
             else:
-                args.layout = kdb.Layout()
-                args.layout.read(args.gds_path)
-
-                top_cells = args.layout.top_cells()
+                hierarchy_info = args.layout_loader.hierarchy_info(args.gds_path)
+                top_cell_names = hierarchy_info.top_cell_names
 
                 if args.cell_name:  # explicit user-specified cell name
                     args.effective_cell_name = args.cell_name
 
-                    found_cell: Optional[kdb.Cell] = None
-                    for cell in args.layout.cells('*'):
-                        if cell.name == args.effective_cell_name:
-                            found_cell = cell
-                            break
+                    found_cell = args.effective_cell_name in hierarchy_info.cell_names
                     if not found_cell:
                         error(f"Could not find cell {args.cell_name} in GDS {args.gds_path}")
                         found_errors = True
 
-                    is_only_top_cell = len(top_cells) == 1 and top_cells[0].name == args.cell_name
+                    is_only_top_cell = top_cell_names == [args.cell_name]
                     if is_only_top_cell:
                         info(f"Found cell {args.cell_name} in GDS {args.gds_path} (only top cell)")
-                    else:  # there are other cells => extract the top cell to a tmp layout
+                    elif found_cell:  # there are other cells => extract the top cell to a tmp layout
                         run_dir_id = f"{input_file_stem(args.gds_path)}__{args.effective_cell_name}"
                         args.output_dir_path = os.path.join(args.output_dir_base_path, run_dir_id)
                         os.makedirs(args.output_dir_path, exist_ok=True)
@@ -397,15 +474,16 @@ class KpexCLI:
                              f"but it is not the only top cell, "
                              f"so layout is exported to: {args.effective_gds_path}")
 
-                        found_cell.write(args.effective_gds_path)
+                        layout = args.layout_loader.layout(args.gds_path)
+                        layout.cell(args.cell_name).write(args.effective_gds_path)
                 else:  # find top cell
-                    if len(top_cells) == 1:
-                        args.effective_cell_name = top_cells[0].name
+                    if len(top_cell_names) == 1:
+                        args.effective_cell_name = top_cell_names[0]
                         info(f"No explicit top cell specified, using top cell '{args.effective_cell_name}'")
                     else:
                         args.effective_cell_name = 'TOP'
                         error(f"Could not determine the default top cell in GDS {args.gds_path}, "
-                              f"there are multiple: {', '.join([c.name for c in top_cells])}. "
+                              f"there are multiple: {', '.join(top_cell_names)}. "
                               f"Use --cell to specify the cell")
                         found_errors = True
 
@@ -435,6 +513,12 @@ class KpexCLI:
 
             args.output_dir_path = os.path.join(args.output_dir_base_path, run_dir_id)
             os.makedirs(args.output_dir_path, exist_ok=True)
+            match args.input_mode:
+                case InputMode.GDS:
+                    args.effective_lvsdb_path = os.path.join(args.output_dir_path,
+                                                             f"{args.effective_cell_name}.lvsdb.gz")
+                case InputMode.LVSDB:
+                    args.effective_lvsdb_path = args.lvsdb_path
             if args.input_mode == InputMode.GDS:
                 if args.schematic_path:
                     args.effective_schematic_path = args.schematic_path
@@ -469,35 +553,49 @@ class KpexCLI:
         if args.cache_dir_path is None:
             args.cache_dir_path = os.path.join(args.output_dir_base_path, '.kpex_cache')
 
+        num_engines = sum([args.run_magic, args.run_fastercap, args.run_fastcap, args.run_2_5D])
+        if args.rcx25d_parallel and args.concurrent_engines and num_engines >= 2:
+            # NOTE: forking the 2.5D worker pool while other engine threads run is unsafe,
+            #       the children would inherit locks held by those threads (e.g. logging)
+            warning("Running the engines sequentially, as --parallel can't be combined "
+                    "with --concurrent-engines")
+            args.concurrent_engines = False
+
         if found_errors:
             raise ArgumentValidationError("Argument validation failed")
 
     def build_fastercap_input(self,
                               args: argparse.Namespace,
                               pex_context: KLayoutExtractionContext,
-                              tech_info: TechInfo) -> str:
+                              tech_info: TechInfo,
+                              artifact_writer: ArtifactWriter) -> str:
         rule('Process stackup')
-        fastercap_input_builder = FasterCapInputBuilder(pex_context=pex_context,
-                                                        tech_info=tech_info,
-                                                        k_void=args.k_void,
-                                                        delaunay_amax=args.delaunay_amax,
-                                                        delaunay_b=args.delaunay_b)
-        gen: FasterCapModelGenerator = fastercap_input_builder.build()
+        with stage('model generation'):
+            fastercap_input_builder = FasterCapInputBuilder(pex_context=pex_context,
+                                                            tech_info=tech_info,
+                                                            k_void=args.k_void,
+                                                            delaunay_amax=args.delaunay_amax,
+                                                            delaunay_b=args.delaunay_b)
+            gen: FasterCapModelGenerator = fastercap_input_builder.build()
 
         rule('FasterCap Input File Generation')
         faster_cap_input_dir_path = os.path.join(args.output_dir_path, 'FasterCap_Input_Files')
         os.makedirs(faster_cap_input_dir_path, exist_ok=True)
 
-        lst_file = gen.write_fastcap(output_dir_path=faster_cap_input_dir_path, prefix='FasterCap_Input_')
+        with stage('input files'):
+            lst_file = gen.write_fastcap(output_dir_path=faster_cap_input_dir_path, prefix='FasterCap_Input_')
 
-        rule('STL File Generation')
-        geometry_dir_path = os.path.join(args.output_dir_path, 'Geometries')
-        os.makedirs(geometry_dir_path, exist_ok=True)
-        gen.dump_stl(output_dir_path=geometry_dir_path, prefix='')
+        if args.artifact_policy.includes(ArtifactPolicy.ALL):
+            rule('STL File Generation')
+            geometry_dir_path = os.path.join(args.output_dir_path, 'Geometries')
+            os.makedirs(geometry_dir_path, exist_ok=True)
+            artifact_writer.write(description=f"STL files in {geometry_dir_path}",
+                                 write=lambda: gen.dump_stl(output_dir_path=geometry_dir_path, prefix=''))
 
         if args.geometry_check:
             rule('Geometry Validation')
-            gen.check()
+            with stage('geometry validation'):
+                gen.check()
 
         return lst_file
 
@@ -505,10 +603,9 @@ class KpexCLI:
     def run_fastercap_extraction(self,
                                  args: argparse.Namespace,
                                  pex_context: KLayoutExtractionContext,
-                                 lst_file: str):
+                                 lst_file: str,
+                                 num_threads: int):
         rule('FasterCap Execution')
-        info(f"Configure number of OpenMP threads (environmental variable OMP_NUM_THREADS) as {args.num_threads}")
-        os.environ['OMP_NUM_THREADS'] = f"{args.num_threads}"
 
         log_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_FasterCap_Output.txt")
         raw_csv_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_FasterCap_Result_Matrix_Raw.csv")
@@ -519,36 +616,41 @@ class KpexCLI:
                                                  f"{args.effective_cell_name}_FasterCap_Expanded_Netlist.csv")
         reduced_netlist_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_FasterCap_Reduced_Netlist.cir")
 
-        run_fastercap(exe_path=args.fastercap_exe_path,
-                      lst_file_path=lst_file,
-                      log_path=log_path,
-                      tolerance=args.fastercap_tolerance,
-                      d_coeff=args.fastercap_d_coeff,
-                      mesh_refinement_value=args.fastercap_mesh_refinement_value,
-                      ooc_condition=args.fastercap_ooc_condition,
-                      auto_preconditioner=args.fastercap_auto_preconditioner,
-                      galerkin_scheme=args.fastercap_galerkin_scheme,
-                      jacobi_preconditioner=args.fastercap_jacobi_preconditioner)
-
-        cap_matrix = fastercap_parse_capacitance_matrix(log_path)
-        cap_matrix.write_csv(raw_csv_path)
-
-        cap_matrix = cap_matrix.averaged_off_diagonals()
-        cap_matrix.write_csv(avg_csv_path)
-
-        netlist_expander = NetlistExpander()
-        expanded_netlist = netlist_expander.expand(
-            extracted_netlist=pex_context.lvsdb.netlist(),
-            top_cell_name=pex_context.annotated_top_cell.name,
-            cap_matrix=cap_matrix,
-            blackbox_devices=args.blackbox_devices
-        )
+        with stage('solver'):
+            run_fastercap(exe_path=args.fastercap_exe_path,
+                          lst_file_path=lst_file,
+                          log_path=log_path,
+                          tolerance=args.fastercap_tolerance,
+                          d_coeff=args.fastercap_d_coeff,
+                          mesh_refinement_value=args.fastercap_mesh_refinement_value,
+                          ooc_condition=args.fastercap_ooc_condition,
+                          auto_preconditioner=args.fastercap_auto_preconditioner,
+                          galerkin_scheme=args.fastercap_galerkin_scheme,
+                          jacobi_preconditioner=args.fastercap_jacobi_preconditioner,
+                          num_threads=num_threads)
+
+        with stage('matrix parsing'):
+            cap_matrix = fastercap_parse_capacitance_matrix(log_path)
+            cap_matrix.write_csv(raw_csv_path)
+
+            cap_matrix = cap_matrix.averaged_off_diagonals()
+            cap_matrix.write_csv(avg_csv_path)
+
+        with stage('netlist expansion'):
+            netlist_expander = NetlistExpander()
+            expanded_netlist = netlist_expander.expand(
+                extracted_netlist=pex_context.lvsdb.netlist(),
+                top_cell_name=pex_context.annotated_top_cell.name,
+                cap_matrix=cap_matrix,
+                blackbox_devices=args.blackbox_devices
+            )
 
         # create a nice CSV for reports, useful for spreadsheets
-        netlist_csv_writer = NetlistCSVWriter()
-        netlist_csv_writer.write_csv(netlist=expanded_netlist,
-                                     top_cell_name=pex_context.annotated_top_cell.name,
-                                     output_path=expanded_netlist_csv_path)
+        with stage('netlist writing'):
+            netlist_csv_writer = NetlistCSVWriter()
+            netlist_csv_writer.write_csv(netlist=expanded_netlist,
+                                         top_cell_name=pex_context.annotated_top_cell.name,
+                                         output_path=expanded_netlist_csv_path)
 
         rule("Extended netlist (CSV format):")
         with open(expanded_netlist_csv_path, 'r') as f:
@@ -558,17 +660,18 @@ class KpexCLI:
 
         info(f"Wrote expanded netlist CSV to: {expanded_netlist_csv_path}")
 
-        spice_writer = kdb.NetlistSpiceWriter()
-        spice_writer.use_net_names = True
-        spice_writer.with_comments = False
-        expanded_netlist.write(expanded_netlist_path, spice_writer)
-        info(f"Wrote expanded netlist to: {expanded_netlist_path}")
+        with stage('netlist writing'):
+            spice_writer = kdb.NetlistSpiceWriter()
+            spice_writer.use_net_names = True
+            spice_writer.with_comments = False
+            expanded_netlist.write(expanded_netlist_path, spice_writer)
+            info(f"Wrote expanded netlist to: {expanded_netlist_path}")
 
-        netlist_reducer = NetlistReducer()
-        reduced_netlist = netlist_reducer.reduce(netlist=expanded_netlist,
-                                                 top_cell_name=pex_context.annotated_top_cell.name)
-        reduced_netlist.write(reduced_netlist_path, spice_writer)
-        info(f"Wrote reduced netlist to: {reduced_netlist_path}")
+            netlist_reducer = NetlistReducer()
+            reduced_netlist = netlist_reducer.reduce(netlist=expanded_netlist,
+                                                     top_cell_name=pex_context.annotated_top_cell.name)
+            reduced_netlist.write(reduced_netlist_path, spice_writer)
+            info(f"Wrote reduced netlist to: {reduced_netlist_path}")
 
         self._fastercap_extracted_csv_path = expanded_netlist_csv_path
 
@@ -603,20 +706,18 @@ class KpexCLI:
                              short_mode=args.magic_short_mode,
                              merge_mode=args.magic_merge_mode)
 
-        run_magic(exe_path=args.magic_exe_path,
-                  magicrc_path=args.magicrc_path,
-                  script_path=magic_script_path,
-                  log_path=magic_log_path)
+        with stage('extraction'):
+            run_magic(exe_path=args.magic_exe_path,
+                      magicrc_path=args.magicrc_path,
+                      script_path=magic_script_path,
+                      log_path=magic_log_path)
 
         magic_pex_run = parse_magic_pex_run(Path(magic_run_dir))
 
-        layout = kdb.Layout()
-        layout.read(args.effective_gds_path)
-
         report = rdb.ReportDatabase('')
         magic_log_analyzer = MagicLogAnalyzer(magic_pex_run=magic_pex_run,
                                               report=report,
-                                              dbu=layout.dbu)
+                                              dbu=args.layout_loader.hierarchy_info(args.effective_gds_path).dbu)
         magic_log_analyzer.analyze()
         report.save(report_db_path)
 
@@ -643,35 +744,39 @@ class KpexCLI:
         reduced_netlist_path = os.path.join(args.output_dir_path,
                                             f"{args.effective_cell_name}_FastCap2_Reduced_Netlist.cir")
 
-        run_fastcap(exe_path=args.fastcap_exe_path,
-                    lst_file_path=lst_file,
-                    log_path=log_path)
+        with stage('solver'):
+            run_fastcap(exe_path=args.fastcap_exe_path,
+                        lst_file_path=lst_file,
+                        log_path=log_path)
 
-        cap_matrix = fastcap_parse_capacitance_matrix(log_path)
-        cap_matrix.write_csv(raw_csv_path)
+        with stage('matrix parsing'):
+            cap_matrix = fastcap_parse_capacitance_matrix(log_path)
+            cap_matrix.write_csv(raw_csv_path)
 
-        cap_matrix = cap_matrix.averaged_off_diagonals()
-        cap_matrix.write_csv(avg_csv_path)
+            cap_matrix = cap_matrix.averaged_off_diagonals()
+            cap_matrix.write_csv(avg_csv_path)
 
-        netlist_expander = NetlistExpander()
-        expanded_netlist = netlist_expander.expand(
-            extracted_netlist=pex_context.lvsdb.netlist(),
-            top_cell_name=pex_context.annotated_top_cell.name,
-            cap_matrix=cap_matrix,
-            blackbox_devices=args.blackbox_devices
-        )
+        with stage('netlist expansion'):
+            netlist_expander = NetlistExpander()
+            expanded_netlist = netlist_expander.expand(
+                extracted_netlist=pex_context.lvsdb.netlist(),
+                top_cell_name=pex_context.annotated_top_cell.name,
+                cap_matrix=cap_matrix,
+                blackbox_devices=args.blackbox_devices
+            )
 
-        spice_writer = kdb.NetlistSpiceWriter()
-        spice_writer.use_net_names = True
-        spice_writer.with_comments = False
-        expanded_netlist.write(expanded_netlist_path, spice_writer)
-        info(f"Wrote expanded netlist to: {expanded_netlist_path}")
+        with stage('netlist writing'):
+            spice_writer = kdb.NetlistSpiceWriter()
+            spice_writer.use_net_names = True
+            spice_writer.with_comments = False
+            expanded_netlist.write(expanded_netlist_path, spice_writer)
+            info(f"Wrote expanded netlist to: {expanded_netlist_path}")
 
-        netlist_reducer = NetlistReducer()
-        reduced_netlist = netlist_reducer.reduce(netlist=expanded_netlist,
-                                                 top_cell_name=pex_context.annotated_top_cell.name)
-        reduced_netlist.write(reduced_netlist_path, spice_writer)
-        info(f"Wrote reduced netlist to: {reduced_netlist_path}")
+            netlist_reducer = NetlistReducer()
+            reduced_netlist = netlist_reducer.reduce(netlist=expanded_netlist,
+                                                     top_cell_name=pex_context.annotated_top_cell.name)
+            reduced_netlist.write(reduced_netlist_path, spice_writer)
+            info(f"Wrote reduced netlist to: {reduced_netlist_path}")
 
     def run_kpex_2_5d_engine(self,
                              args: argparse.Namespace,
@@ -679,7 +784,9 @@ class KpexCLI:
                              tech_info: TechInfo,
                              report_path: str,
                              netlist_csv_path: Optional[str],
-                             expanded_netlist_path: Optional[str]):
+                             expanded_netlist_path: Optional[str],
+                             pex_result_path: Optional[str],
+                             num_threads: int):
         # TODO: make this separatly configurable
         #       for now we use 0
         args.rcx25d_delaunay_amax = 0
@@ -691,13 +798,23 @@ class KpexCLI:
                                    delaunay_b=args.rcx25d_delaunay_b,
                                    scale_ratio_to_fit_halo=args.scale_ratio_to_fit_halo,
                                    tech_info=tech_info,
-                                   report_path=report_path)
+                                   report_path=report_path,
+                                   num_processes=num_threads if args.rcx25d_parallel else 1,
+                                   tile_size=args.rcx25d_tile_size,
+                                   hierarchical=args.rcx25d_hierarchical,
+                                   overlap_engine=args.rcx25d_overlap_engine,
+                                   sidewall_engine=args.rcx25d_sidewall_engine,
+                                   results_mode=args.rcx25d_results_mode,
+                                   report_level=args.rcx25d_report_level,
+                                   report_max_items_per_category=args.rcx25d_report_max_items,
+                                   report_deferred=args.rcx25d_report_deferred,
+                                   report_streaming=args.rcx25d_report_streaming)
         extraction_results = extractor.extract()
 
         if netlist_csv_path is not None:
             # TODO: merge this with klayout_pex/klayout/netlist_csv.py
 
-            with open(netlist_csv_path, 'w', encoding='utf-8') as f:
+            with stage('netlist writing'), open(netlist_csv_path, 'w', encoding='utf-8') as f:
                 summary = extraction_results.summarize()
 
                 f.write('Device;Net1;Net2;Capacitance [fF];Resistance [Ω]\n')
@@ -714,20 +831,27 @@ class KpexCLI:
             rule('Extracted netlist CSV')
             subproc(f"{netlist_csv_path}")
 
+        if pex_result_path is not None:
+            with stage('result writing'):
+                write_pex_result(pex_result_path, extraction_results)
+            subproc(f"Wrote PEX result to: {pex_result_path}")
+
         if expanded_netlist_path is not None:
             rule('kpex/2.5D extracted netlist (SPICE format)')
-            netlist_expander = RCX25NetlistExpander()
-            expanded_netlist = netlist_expander.expand(
-                extracted_netlist=pex_context.lvsdb.netlist(),
-                top_cell_name=pex_context.annotated_top_cell.name,
-                extraction_results=extraction_results,
-                blackbox_devices=args.blackbox_devices
-            )
+            with stage('netlist expansion'):
+                netlist_expander = RCX25NetlistExpander()
+                expanded_netlist = netlist_expander.expand(
+                    extracted_netlist=pex_context.lvsdb.netlist(),
+                    top_cell_name=pex_context.annotated_top_cell.name,
+                    extraction_results=extraction_results,
+                    blackbox_devices=args.blackbox_devices
+                )
 
-            spice_writer = kdb.NetlistSpiceWriter()
-            spice_writer.use_net_names = True
-            spice_writer.with_comments = False
-            expanded_netlist.write(expanded_netlist_path, spice_writer)
+            with stage('netlist writing'):
+                spice_writer = kdb.NetlistSpiceWriter()
+                spice_writer.use_net_names = True
+                spice_writer.with_comments = False
+                expanded_netlist.write(expanded_netlist_path, spice_writer)
             subproc(f"Wrote expanded netlist to: {expanded_netlist_path}")
 
         # NOTE: there was a KLayout bug that some of the categories were lost,
@@ -787,56 +911,145 @@ class KpexCLI:
 
         set_log_level(args.log_level)
 
-    @staticmethod
-    def modification_date(filename: str) -> datetime:
-        t = os.path.getmtime(filename)
-        return datetime.fromtimestamp(t)
-
     def create_lvsdb(self, args: argparse.Namespace) -> kdb.LayoutVsSchematic:
         lvsdb = kdb.LayoutVsSchematic()
 
         match args.input_mode:
             case InputMode.LVSDB:
-                lvsdb.read(args.lvsdb_path)
+                lvsdb.read(args.effective_lvsdb_path)
             case InputMode.GDS:
                 lvs_log_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_lvs.log")
-                lvsdb_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}.lvsdb.gz")
-                lvsdb_cache_path = os.path.join(args.cache_dir_path, args.pdk,
-                                                os.path.splitroot(os.path.abspath(args.gds_path))[-1],
-                                                f"{args.effective_cell_name}.lvsdb.gz")
+                lvsdb_path = args.effective_lvsdb_path
 
                 lvs_needed = True
 
                 if args.cache_lvs:
-                    if not os.path.exists(lvsdb_cache_path):
-                        info(f"Cache miss: extracted LVSDB does not exist")
-                        subproc(lvsdb_cache_path)
-                    elif self.modification_date(lvsdb_cache_path) <= self.modification_date(args.gds_path):
-                        info(f"Cache miss: extracted LVSDB is older than the input GDS")
-                        subproc(lvsdb_cache_path)
-                    else:
+                    lvsdb_cache = LVSDBCache(cache_dir_path=args.cache_dir_path,
+                                             max_size_bytes=int(args.cache_max_size_mb * 1024 * 1024))
+                    lvsdb_cache_key = LVSDBCacheKey(
+                        gds_path=args.gds_path,  # NOTE: an exported cell layout has a new timestamp each run
+                        cell_name=args.effective_cell_name,
+                        schematic_path=args.effective_schematic_path,
+                        lvs_script_path=args.lvs_script_path,
+                        pdk=args.pdk,
+                        tool_version=f"kpex {__version__}, {LVSRunner.klayout_version(args.klayout_exe_path)}"
+                    )
+                    if lvsdb_cache.lookup(lvsdb_cache_key, dest_path=lvsdb_path):
                         warning(f"Cache hit: Reusing cached LVSDB")
-                        subproc(lvsdb_cache_path)
+                        subproc(lvsdb_cache.entry_path(lvsdb_cache_key))
                         lvs_needed = False
+                    else:
+                        info(f"Cache miss: no extracted LVSDB for key {lvsdb_cache_key.digest}")
 
                 if lvs_needed:
                     lvs_runner = LVSRunner()
-                    lvs_runner.run_klayout_lvs(exe_path=args.klayout_exe_path,
-                                               lvs_script=args.lvs_script_path,
-                                               gds_path=args.effective_gds_path,
-                                               schematic_path=args.effective_schematic_path,
-                                               log_path=lvs_log_path,
-                                               lvsdb_path=lvsdb_path,
-                                               verbose=args.klayout_lvs_verbose)
-                    if args.cache_lvs:
-                        cache_dir_path = os.path.dirname(lvsdb_cache_path)
-                        if not os.path.exists(cache_dir_path):
-                            os.makedirs(cache_dir_path, exist_ok=True)
-                        shutil.copy(lvsdb_path, lvsdb_cache_path)
+                    returncode = lvs_runner.run_klayout_lvs(exe_path=args.klayout_exe_path,
+                                                            lvs_script=args.lvs_script_path,
+                                                            gds_path=args.effective_gds_path,
+                                                            schematic_path=args.effective_schematic_path,
+                                                            log_path=lvs_log_path,
+                                                            lvsdb_path=lvsdb_path,
+                                                            verbose=args.klayout_lvs_verbose)
+                    if args.cache_lvs and returncode == 0:
+                        lvsdb_cache.store(lvsdb_cache_key, lvsdb_path)
 
                 lvsdb.read(lvsdb_path)
         return lvsdb
 
+    def create_extraction_context(self,
+                                  args: argparse.Namespace,
+                                  lvsdb: kdb.LayoutVsSchematic,
+                                  tech_info: TechInfo) -> KLayoutExtractionContext:
+        if not args.cache_context:
+            return KLayoutExtractionContext.prepare_extraction(top_cell=args.effective_cell_name,
+                                                               lvsdb=lvsdb,
+                                                               tech=tech_info,
+                                                               blackbox_devices=args.blackbox_devices)
+
+        context_cache = ExtractionContextCache(cache_dir_path=os.path.join(args.cache_dir_path, 'context'),
+                                               max_size_bytes=int(args.cache_max_size_mb * 1024 * 1024))
+        context_cache_key = ExtractionContextCacheKey(
+            lvsdb_path=args.effective_lvsdb_path,
+            tech_pbjson_path=args.tech_pbjson_path,
+            top_cell=args.effective_cell_name,
+            blackbox_devices=args.blackbox_devices,
+            tool_version=f"kpex {__version__}, KLayout {importlib.metadata.version('klayout')}"
+        )
+        pex_context = context_cache.lookup(key=context_cache_key,
+                                           lvsdb=lvsdb,
+                                           tech=tech_info,
+                                           blackbox_devices=args.blackbox_devices)
+        if pex_context is not None:
+            warning(f"Cache hit: Reusing cached extraction context")
+            subproc(context_cache.entry_path(context_cache_key))
+            return pex_context
+
+        info(f"Cache miss: no extraction context for key {context_cache_key.digest}")
+        pex_context = KLayoutExtractionContext.prepare_extraction(top_cell=args.effective_cell_name,
+                                                                  lvsdb=lvsdb,
+                                                                  tech=tech_info,
+                                                                  blackbox_devices=args.blackbox_devices)
+        context_cache.store(key=context_cache_key, pex_context=pex_context)
+        return pex_context
+
+    @staticmethod
+    def record_geometry_volume(pex_context: KLayoutExtractionContext):
+        for layer_info in pex_context.extracted_layers.values():
+            for source_layer in layer_info.source_layers:
+                region = source_layer.region
+                name = source_layer.lvs_layer_name
+                record_metric('polygons by layer', name, region.count())
+                # NOTE: the edges of the merged polygons (as seen by the 2.5D edge neighborhoods)
+                record_metric('edges by layer', name, region.edges().count())
+                record_metric('vertices by layer', name, sum(p.num_points() for p in region.each()))
+
+    def write_artifacts(self,
+                        args: argparse.Namespace,
+                        pex_context: KLayoutExtractionContext,
+                        artifact_writer: ArtifactWriter):
+        if args.artifact_policy.includes(ArtifactPolicy.MINIMAL):
+            gds_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_l2n_extracted.oas")
+            artifact_writer.write(description=gds_path,
+                                 write=lambda: pex_context.annotated_layout.write(gds_path))
+
+        if not args.artifact_policy.includes(ArtifactPolicy.DEBUG):
+            return
+
+        internal_gds_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_l2n_internal.oas")
+        artifact_writer.write(description=internal_gds_path,
+                             write=lambda: pex_context.lvsdb.internal_layout().write(internal_gds_path))
+
+        def dump_layers(cell: str,
+                        layers: List[KLayoutExtractedLayerInfo],
+                        layout_dump_path: str):
+            layout = kdb.Layout()
+            layout.dbu = pex_context.lvsdb.internal_layout().dbu
+
+            top_cell = layout.create_cell(cell)
+            for ulyr in layers:
+                li = kdb.LayerInfo(*ulyr.gds_pair)
+                li.name = ulyr.lvs_layer_name
+                layer = layout.insert_layer(li)
+                layout.insert(top_cell.cell_index(), layer, ulyr.region.dup())
+
+            artifact_writer.write(description=layout_dump_path,
+                                 write=lambda: layout.write(layout_dump_path))
+
+        if len(pex_context.unnamed_layers) >= 1:
+            layout_dump_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_unnamed_LVS_layers.gds.gz")
+            dump_layers(cell=args.effective_cell_name,
+                        layers=pex_context.unnamed_layers,
+                        layout_dump_path=layout_dump_path)
+
+        if len(pex_context.extracted_layers) >= 1:
+            layout_dump_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_nonempty_LVS_layers.gds.gz")
+            nonempty_layers = [l \
+                               for layers in pex_context.extracted_layers.values() \
+                               for l in layers.source_layers]
+            dump_layers(cell=args.effective_cell_name,
+                        layers=nonempty_layers,
+                        layout_dump_path=layout_dump_path)
+
     def main(self, argv: List[str]):
         if '-v' not in argv and \
            '--version' not in argv and \
@@ -851,83 +1064,102 @@ class KpexCLI:
         os.makedirs(args.output_dir_base_path, exist_ok=True)
         self.setup_logging(args)
 
+        timer = StageTimer(profile=args.profile)
+        previous_timer = set_stage_timer(timer)
+        try:
+            self.run_engines(args)
+        finally:
+            set_stage_timer(previous_timer)
+            self.write_timings_and_metrics(args=args, timer=timer)
+
+    def write_timings_and_metrics(self,
+                                  args: argparse.Namespace,
+                                  timer: StageTimer):
+        timer.log_summary()
+        timer.log_metrics_summary()
+
+        os.makedirs(args.output_dir_path, exist_ok=True)
+        timings_path = os.path.join(args.output_dir_path, 'timings.json')
+        timer.write_json(timings_path)
+        info(f"Wrote stage timings to: {timings_path}")
+
+        metrics_path = os.path.join(args.output_dir_path, 'metrics.json')
+        timer.write_metrics_json(metrics_path)
+        info(f"Wrote run metrics to: {metrics_path}")
+
+        if args.profile:
+            profile_dir_path = os.path.join(args.output_dir_path, 'profiles')
+            profile_paths = timer.write_profiles(profile_dir_path)
+            info(f"Wrote {len(profile_paths)} stage profiles (.pstats) to: {profile_dir_path}")
+
+    def run_engines(self, args: argparse.Namespace):
         tech_info = TechInfo.from_json(args.tech_pbjson_path,
                                        dielectric_filter=args.dielectric_filter)
 
         if args.halo is not None:
             tech_info.tech.process_parasitics.side_halo = args.halo
 
+        engines: List[EngineSpec] = []
+        if args.run_magic:
+            engines.append(EngineSpec(name='MAGIC', max_threads=1))
+        if args.run_fastercap:
+            engines.append(EngineSpec(name='FasterCap'))
+        if args.run_fastcap:
+            engines.append(EngineSpec(name='FastCap2', max_threads=1))
+        if args.run_2_5D:
+            engines.append(EngineSpec(name='kpex/2.5D', max_threads=None if args.rcx25d_parallel else 1))
+        scheduler = EngineScheduler(engines=engines,
+                                    num_threads=args.num_threads,
+                                    concurrent=args.concurrent_engines and len(engines) >= 2)
+
+        def engine_log_path(engine_id: str) -> str:
+            return os.path.join(args.output_dir_path, f"{args.effective_cell_name}_{engine_id}_engine.log")
+
+        def start_engine(name: str,
+                         engine_id: str,
+                         run: Callable[[int], None]):
+            def run_stage(num_threads: int):
+                with stage(engine_id):
+                    run(num_threads)
+
+            scheduler.start(name=name, run=run_stage, log_path=engine_log_path(engine_id))
+
         if args.run_magic:
             rule('MAGIC')
-            self.run_magic_extraction(args)
+            start_engine(name='MAGIC',
+                         engine_id='MAGIC',
+                         run=lambda num_threads: self.run_magic_extraction(args))
 
         # no need to run LVS etc if only running magic engine
         if not (args.run_fastcap or args.run_fastercap or args.run_2_5D):
+            scheduler.wait()
             return
 
         rule('Prepare LVSDB')
-        lvsdb = self.create_lvsdb(args)
+        with stage('LVS'):
+            lvsdb = self.create_lvsdb(args)
 
-        pex_context = KLayoutExtractionContext.prepare_extraction(top_cell=args.effective_cell_name,
-                                                                  lvsdb=lvsdb,
-                                                                  tech=tech_info,
-                                                                  blackbox_devices=args.blackbox_devices)
+        with stage('extraction context'):
+            pex_context = self.create_extraction_context(args=args, lvsdb=lvsdb, tech_info=tech_info)
         rule('Non-empty layers in LVS database')
         for gds_pair, layer_info in pex_context.extracted_layers.items():
             names = [l.lvs_layer_name for l in layer_info.source_layers]
             info(f"{gds_pair} -> ({' '.join(names)})")
 
-        gds_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_l2n_extracted.oas")
-        pex_context.annotated_layout.write(gds_path)
-
-        gds_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_l2n_internal.oas")
-        pex_context.lvsdb.internal_layout().write(gds_path)
+        with stage('geometry volume'):
+            self.record_geometry_volume(pex_context)
 
-        def dump_layers(cell: str,
-                        layers: List[KLayoutExtractedLayerInfo],
-                        layout_dump_path: str):
-            layout = kdb.Layout()
-            layout.dbu = lvsdb.internal_layout().dbu
+        artifact_writer = ArtifactWriter()
+        with stage('layer dumps'):
+            self.write_artifacts(args=args, pex_context=pex_context, artifact_writer=artifact_writer)
 
-            top_cell = layout.create_cell(cell)
-            for ulyr in layers:
-                li = kdb.LayerInfo(*ulyr.gds_pair)
-                li.name = ulyr.lvs_layer_name
-                layer = layout.insert_layer(li)
-                layout.insert(top_cell.cell_index(), layer, ulyr.region.dup())
-
-            layout.write(layout_dump_path)
-
-        if len(pex_context.unnamed_layers) >= 1:
-            layout_dump_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_unnamed_LVS_layers.gds.gz")
-            dump_layers(cell=args.effective_cell_name,
-                        layers=pex_context.unnamed_layers,
-                        layout_dump_path=layout_dump_path)
-
-        if len(pex_context.extracted_layers) >= 1:
-            layout_dump_path = os.path.join(args.output_dir_path, f"{args.effective_cell_name}_nonempty_LVS_layers.gds.gz")
-            nonempty_layers = [l \
-                               for layers in pex_context.extracted_layers.values() \
-                               for l in layers.source_layers]
-            dump_layers(cell=args.effective_cell_name,
-                        layers=nonempty_layers,
-                        layout_dump_path=layout_dump_path)
-        else:
+        if len(pex_context.extracted_layers) == 0:
             error("No extracted layers found")
             sys.exit(1)
 
-        if args.run_fastcap or args.run_fastercap:
-            lst_file = self.build_fastercap_input(args=args,
-                                                  pex_context=pex_context,
-                                                  tech_info=tech_info)
-            if args.run_fastercap:
-                self.run_fastercap_extraction(args=args,
-                                              pex_context=pex_context,
-                                              lst_file=lst_file)
-            if args.run_fastcap:
-                self.run_fastcap_extraction(args=args,
-                                            pex_context=pex_context,
-                                            lst_file=lst_file)
+        if scheduler.concurrent:
+            with stage('warm caches'):
+                pex_context.warm_caches()
 
         if args.run_2_5D:
             rule("kpex/2.5D PEX Engine")
@@ -936,17 +1168,46 @@ class KpexCLI:
                                                             f"{args.effective_cell_name}_k25d_pex_netlist.csv"))
             netlist_spice_path = os.path.abspath(os.path.join(args.output_dir_path,
                                                               f"{args.effective_cell_name}_k25d_pex_netlist.spice"))
+            pex_result_path = os.path.abspath(os.path.join(args.output_dir_path,
+                                                           f"{args.effective_cell_name}_k25d_pex_result.pb"))
+
+            def run_2_5d(num_threads: int):
+                self._rcx25_extraction_results = self.run_kpex_2_5d_engine(  # NOTE: store for test case
+                    args=args,
+                    pex_context=pex_context,
+                    tech_info=tech_info,
+                    report_path=report_path,
+                    netlist_csv_path=netlist_csv_path,
+                    expanded_netlist_path=netlist_spice_path,
+                    pex_result_path=pex_result_path,
+                    num_threads=num_threads
+                )
+                self._rcx25_extracted_csv_path = netlist_csv_path
+                self._rcx25_pex_result_path = pex_result_path
 
-            self._rcx25_extraction_results = self.run_kpex_2_5d_engine(  # NOTE: store for test case
-                args=args,
-                pex_context=pex_context,
-                tech_info=tech_info,
-                report_path=report_path,
-                netlist_csv_path=netlist_csv_path,
-                expanded_netlist_path=netlist_spice_path
-            )
+            start_engine(name='kpex/2.5D', engine_id='k25d', run=run_2_5d)
+
+        if args.run_fastcap or args.run_fastercap:
+            with stage('FasterCap input'):
+                lst_file = self.build_fastercap_input(args=args,
+                                                      pex_context=pex_context,
+                                                      tech_info=tech_info,
+                                                      artifact_writer=artifact_writer)
+            if args.run_fastercap:
+                start_engine(name='FasterCap',
+                             engine_id='FasterCap',
+                             run=lambda num_threads: self.run_fastercap_extraction(args=args,
+                                                                                   pex_context=pex_context,
+                                                                                   lst_file=lst_file,
+                                                                                   num_threads=num_threads))
+            if args.run_fastcap:
+                start_engine(name='FastCap2',
+                             engine_id='FastCap2',
+                             run=lambda num_threads: self.run_fastcap_extraction(args=args,
+                                                                                 pex_context=pex_context,
+                                                                                 lst_file=lst_file))
 
-            self._rcx25_extracted_csv_path = netlist_csv_path
+        scheduler.wait()
 
     @property
     def rcx25_extraction_results(self) -> ExtractionResults:
@@ -960,6 +1221,12 @@ class KpexCLI:
             raise Exception('rcx25_extracted_csv_path is not initialized, was run_kpex_2_5d_engine called?')
         return self._rcx25_extracted_csv_path
 
+    @property
+    def rcx25_pex_result_path(self) -> str:
+        if not hasattr(self, '_rcx25_pex_result_path'):
+            raise Exception('rcx25_pex_result_path is not initialized, was run_kpex_2_5d_engine called?')
+        return self._rcx25_pex_result_path
+
     @property
     def fastercap_extracted_csv_path(self) -> str:
         if not hasattr(self, '_fastercap_extracted_csv_path'):
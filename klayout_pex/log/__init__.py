@@ -41,5 +41,8 @@ from .logger import (
     subproc,
     info,
     warning,
-    error
+    error,
+    log_enabled,
+    RateLimitedLogger,
+    log_rate_limit_summaries
 )
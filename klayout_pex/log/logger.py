@@ -184,4 +184,70 @@ def error(*args, **kwargs):
     __logger.error(*args, **kwargs)
 
 
+def log_enabled(level: LogLevel) -> bool:
+    return __logger.isEnabledFor(level)
+
+
+def _log(level: LogLevel, msg: str, *args, stacklevel: int):
+    __logger.log(level, msg, *args, stacklevel=stacklevel + 1)
+
+
+_rate_limited_loggers: List[RateLimitedLogger] = []
+
+
+class RateLimitedLogger:
+    """
+    Logger for the messages of a category in the hot paths
+    (e.g. the capacitance contributions found by the extraction visitors):
+
+        - the level is checked first, so hidden messages cost next to nothing
+        - the message is only formatted (printf-style, from the args) if it is logged
+        - only the first max_messages messages are logged (unless the level is DEBUG),
+          the others are counted and summarized (see log_rate_limit_summaries)
+    """
+
+    DEFAULT_MAX_MESSAGES = 1000
+
+    def __init__(self,
+                 category: str,
+                 level: LogLevel = LogLevel.INFO,
+                 max_messages: Optional[int] = DEFAULT_MAX_MESSAGES):
+        self.category = category
+        self.level = level
+        self.max_messages = max_messages
+        self.logged_count = 0
+        self.suppressed_count = 0
+        _rate_limited_loggers.append(self)
+
+    def enabled(self) -> bool:
+        return log_enabled(self.level)
+
+    def __call__(self, msg: str, *args):
+        if not log_enabled(self.level):
+            return
+        if self.max_messages is not None and \
+           self.logged_count >= self.max_messages and \
+           not log_enabled(LogLevel.DEBUG):
+            self.suppressed_count += 1
+            return
+        self.logged_count += 1
+        _log(self.level, msg, *args, stacklevel=2)
+
+    def log_summary(self):
+        if self.suppressed_count > 0:
+            _log(self.level, "%s %s suppressed (only the first %s are logged)",
+                 f"{self.suppressed_count:,}", self.category, f"{self.max_messages:,}",
+                 stacklevel=2)
+        self.logged_count = 0
+        self.suppressed_count = 0
+
+
+def log_rate_limit_summaries():
+    """
+    Logs the number of suppressed messages of each category, and resets the counters
+    """
+    for rate_limited_logger in _rate_limited_loggers:
+        rate_limited_logger.log_summary()
+
+
 configure_logger()
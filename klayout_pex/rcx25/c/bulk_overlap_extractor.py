@@ -0,0 +1,250 @@
+#! /usr/bin/env python3
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from collections import defaultdict
+from enum import StrEnum
+import itertools
+
+import klayout.db as kdb
+import numpy as np
+
+from klayout_pex.log import (
+    warning,
+    LogLevel,
+    RateLimitedLogger,
+)
+from klayout_pex.tech_info import TechInfo
+
+from klayout_pex.rcx25.c.compiled_tech import CompiledTech
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.hierarchy import INSTANCE_PROPERTY, is_extracted_elsewhere
+from klayout_pex.rcx25.tiling import clip_region
+
+
+overlap_log = RateLimitedLogger('overlap contributions', level=LogLevel.DEBUG)
+
+
+class OverlapEngine(StrEnum):
+    VISITOR = 'visitor'  # OverlapExtractor, visiting each polygon and its neighborhood
+    BULK = 'bulk'        # BulkOverlapExtractor, boolean operations on whole layers
+    DEFAULT = 'visitor'
+
+
+class BulkOverlapExtractor:
+    """
+    Overlap capacitance extraction on whole layers at once.
+
+    For each bottom layer, the layers above are processed in stack order:
+        - the bottom shapes (carrying their net names) are ANDed with the whole top layer,
+          the overlap shapes carry the nets of both sides (see overlap_region)
+        - the overlap areas are accumulated per (top net, bottom net) and multiplied with the
+          area capacitance only once
+        - afterwards the top layer is subtracted from the bottom shapes,
+          as it shields the bottom shapes from all layers further above
+
+    NOTE: like in the OverlapExtractor, shapes of the same net as the bottom shape don't shield it
+    """
+
+    def __init__(self,
+                 all_layer_names: List[LayerName],
+                 layer_regions_by_name: Dict[LayerName, kdb.Region],
+                 dbu: float,
+                 tech_info: TechInfo,
+                 results: CellExtractionResults,
+                 report: ExtractionReporter,
+                 tile: Optional[kdb.Box] = None,
+                 compiled_tech: Optional[CompiledTech] = None):
+        if tile is not None:
+            # NOTE: overlap areas are additive, so clipping all layers to the tile
+            #       attributes each overlap to the tile owning that part of the bottom shapes
+            layer_regions_by_name = {ln: clip_region(r, tile) for ln, r in layer_regions_by_name.items()}
+
+        self.all_layer_names = all_layer_names
+        self.layer_regions_by_name = layer_regions_by_name
+        self.dbu = dbu
+        self.tech_info = tech_info
+        self.results = results
+        self.report = report
+        self.compiled_tech = compiled_tech or CompiledTech(tech_info=tech_info, all_layer_names=all_layer_names)
+
+        # NOTE: in hierarchical mode, the shapes also carry the instance (see INSTANCE_PROPERTY)
+        self.has_instances = any(INSTANCE_PROPERTY in p.properties()
+                                 for r in layer_regions_by_name.values()
+                                 for p in itertools.islice(r.each(), 1))
+
+        self._merged_regions_by_layer_name: Dict[LayerName, kdb.Region] = {}
+        self._net_regions_by_layer_name: Dict[LayerName, kdb.Region] = {}
+
+    def extract(self):
+        for idx in range(len(self.all_layer_names)):
+            self.extract_layer(inside_layer_index=idx)
+
+    def merged_region(self, layer_name: LayerName) -> kdb.Region:
+        """
+        Shapes of a layer, merged per net
+        (the boolean operations with properties don't merge the polygons of the second operand)
+        """
+        region = self._merged_regions_by_layer_name.get(layer_name, None)
+        if region is None:
+            region = self.layer_regions_by_name[layer_name].merged()
+            self._merged_regions_by_layer_name[layer_name] = region
+        return region
+
+    def net_region(self, layer_name: LayerName) -> kdb.Region:
+        """
+        Shapes of a layer, merged per net, carrying only the net names
+        """
+        region = self._net_regions_by_layer_name.get(layer_name, None)
+        if region is None:
+            region = self.merged_region(layer_name).dup()
+            region.map_properties({'net': 'net'})
+            region.merge()
+            self._net_regions_by_layer_name[layer_name] = region
+        return region
+
+    def shield(self,
+               unshielded_bottom_region: kdb.Region,
+               top_layer_name: LayerName) -> kdb.Region:
+        """
+        Subtracts the shapes of the top layer from the bottom shapes, except for shapes of the same net
+        """
+        if not self.has_instances:
+            return unshielded_bottom_region.not_(self.merged_region(top_layer_name),
+                                                 kdb.PropertyConstraint.DifferentPropertiesConstraint)
+
+        # NOTE: shapes of the same net in different instances don't shield each other either,
+        #       so the shielding is determined by the net names only,
+        #       and the remaining parts of the bottom shapes keep their instances
+        bottom_nets = unshielded_bottom_region.dup()
+        bottom_nets.map_properties({'net': 'net'})
+        remaining = bottom_nets.not_(self.net_region(top_layer_name),
+                                     kdb.PropertyConstraint.DifferentPropertiesConstraint)
+        remaining.remove_properties()
+        remaining.merge()
+        return unshielded_bottom_region.and_(remaining, kdb.PropertyConstraint.NoPropertyConstraint)
+
+    def extract_layer(self, inside_layer_index: int):
+        bot_layer_name = self.all_layer_names[inside_layer_index]
+        is_substrate = bot_layer_name == self.tech_info.internal_substrate_layer_name
+
+        # NOTE: the part of the bottom shapes not yet shielded by the layers in between,
+        #       keeping the net names of the bottom shapes
+        #       (merged per net, so overlapping shapes of a net are counted once)
+        unshielded_bottom_region = self.merged_region(bot_layer_name)
+
+        for top_layer_index in range(inside_layer_index + 1, len(self.all_layer_names)):
+            if unshielded_bottom_region.is_empty():
+                break
+
+            top_layer_name = self.all_layer_names[top_layer_index]
+            if self.layer_regions_by_name[top_layer_name].is_empty():
+                continue
+
+            overlap_cap_spec = self.compiled_tech.overlap_spec(top_layer_index, inside_layer_index)
+            if not overlap_cap_spec:
+                warning(f"No overlap cap specified for layer top={top_layer_name}, bottom={bot_layer_name}")
+            else:
+                self.extract_layer_pair(top_layer_name=top_layer_name,
+                                        bot_layer_name=bot_layer_name,
+                                        unshielded_bottom_region=unshielded_bottom_region,
+                                        is_substrate=is_substrate,
+                                        overlap_cap_spec=overlap_cap_spec)
+
+            unshielded_bottom_region = self.shield(unshielded_bottom_region, top_layer_name)
+
+    def overlap_region(self,
+                       top_layer_name: LayerName,
+                       unshielded_bottom_region: kdb.Region) -> kdb.Region:
+        """
+        Overlap of the bottom shapes with the top layer, as shapes carrying the properties of both sides
+        (net_bot, inst_bot, net_top, inst_top)
+        """
+        top_region = self.merged_region(top_layer_name)
+
+        # NOTE: a boolean operation only keeps the properties of the first operand,
+        #       so the overlap is built from both sides and joined by merging
+        bottom_parts = unshielded_bottom_region.and_(top_region, kdb.PropertyConstraint.DifferentPropertiesConstraint)
+        # NOTE: the top side is intersected with the small overlap parts instead of the unshielded region,
+        #       which may be a single polygon with many holes (e.g. the substrate)
+        top_parts = top_region.and_(bottom_parts, kdb.PropertyConstraint.DifferentPropertiesConstraint)
+        bottom_parts.map_properties({'net': 'net_bot', INSTANCE_PROPERTY: 'inst_bot'})
+        top_parts.map_properties({'net': 'net_top', INSTANCE_PROPERTY: 'inst_top'})
+
+        # NOTE: parts of different net pairs never touch, as this would short the nets on one of the layers
+        overlap_parts = bottom_parts + top_parts
+        overlap_parts.join_properties_on_merge = True
+        return overlap_parts.merged()
+
+    def extract_layer_pair(self,
+                           top_layer_name: LayerName,
+                           bot_layer_name: LayerName,
+                           unshielded_bottom_region: kdb.Region,
+                           is_substrate: bool,
+                           overlap_cap_spec: process_parasitics_pb2.CapacitanceInfo.OverlapCapacitance):
+        area_by_nets: Dict[Tuple[NetName, NetName], int] = defaultdict(int)
+        overlap_regions_by_nets: Dict[Tuple[NetName, NetName], kdb.Region] = defaultdict(kdb.Region)
+
+        for p in self.overlap_region(top_layer_name, unshielded_bottom_region).each():
+            properties = p.properties()
+            net_top = properties.get('net_top', None)
+            net_bot = self.tech_info.internal_substrate_layer_name if is_substrate else properties.get('net_bot', None)
+            if net_bot == net_top:
+                continue
+            if is_extracted_elsewhere(properties.get('inst_bot', None), properties.get('inst_top', None)):
+                continue  # extracted for the cell or on the parent level (hierarchical mode)
+            area_by_nets[net_top, net_bot] += p.area()
+            overlap_regions_by_nets[net_top, net_bot].insert(p.downcast())
+
+        if not area_by_nets:
+            return
+
+        # NOTE: the area capacitance is applied once per layer pair
+        nets = list(area_by_nets.keys())
+        overlap_areas_um2 = np.fromiter(area_by_nets.values(), dtype=np.float64, count=len(nets)) * self.dbu ** 2
+        caps_femto = overlap_areas_um2 * overlap_cap_spec.capacitance / 1000.0
+
+        for (net_top, net_bot), overlap_area_um2, cap_femto in zip(nets, overlap_areas_um2, caps_femto):
+            cap_femto = float(cap_femto)
+            overlap_log("(Overlap): %s(%s)-%s(%s): cap: %.2f fF, area: %s µm^2",
+                        top_layer_name, net_top, bot_layer_name, net_bot,
+                        cap_femto, float(overlap_area_um2))
+
+            if cap_femto > 0.0:
+                ovk = OverlapKey(layer_top=top_layer_name,
+                                 net_top=net_top,
+                                 layer_bot=bot_layer_name,
+                                 net_bot=net_bot)
+                cap = OverlapCap(key=ovk,
+                                 cap_value=cap_femto,
+                                 shielded_area=0.0,  # TODO shielded_area_um2,
+                                 unshielded_area=0.0,  # TODO unshielded_area_um2,
+                                 tech_spec=overlap_cap_spec)
+
+                self.results.add_overlap_cap(cap)
+
+                self.report.output_overlap(overlap_cap=cap,
+                                           bottom_polygon=None,
+                                           top_polygon=None,
+                                           overlap_area=overlap_regions_by_nets[net_top, net_bot])
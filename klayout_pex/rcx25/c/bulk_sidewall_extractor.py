@@ -0,0 +1,302 @@
+#! /usr/bin/env python3
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from enum import StrEnum
+from functools import cached_property
+import math
+
+import klayout.db as kdb
+import numpy as np
+
+from klayout_pex.log import (
+    warning,
+    RateLimitedLogger,
+)
+from klayout_pex.tech_info import TechInfo
+
+from klayout_pex.rcx25.c.compiled_tech import CompiledTech
+from klayout_pex.rcx25.c.interval_shielding import merge_intervals, unshielded_intervals
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.hierarchy import INSTANCE_PROPERTY, is_extracted_elsewhere
+from klayout_pex.rcx25.tiling import clip_region, owned_edge_interval
+from klayout_pex.rcx25.types import EdgeInterval
+
+
+sidewall_log = RateLimitedLogger('sidewall contributions')
+
+
+class SidewallEngine(StrEnum):
+    VISITOR = 'visitor'  # SidewallAndFringeExtractor, visiting each edge and its neighborhood
+    BULK = 'bulk'        # BulkSidewallExtractor, space checks on whole layers (fringe still uses the visitor)
+    DEFAULT = 'visitor'
+
+
+EdgePairGeometry = Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]
+
+
+def edge_pair_geometry(edge_pair: kdb.EdgePair) -> EdgePairGeometry:
+    """
+    Orientation independent identity of an edge pair
+    """
+    def edge_geometry(e: kdb.Edge) -> Tuple[int, int, int, int]:
+        return min((e.p1.x, e.p1.y, e.p2.x, e.p2.y), (e.p2.x, e.p2.y, e.p1.x, e.p1.y))
+    g1 = edge_geometry(edge_pair.first)
+    g2 = edge_geometry(edge_pair.second)
+    return (g1, g2) if g1 <= g2 else (g2, g1)
+
+
+def lies_on_boundary(edge: kdb.Edge, polygon: kdb.Polygon) -> bool:
+    """
+    :return: True if the edge is part of an edge of the polygon
+             (with a tolerance of 1 dbu, as the projected edges of edge pairs may be off-grid)
+    """
+    for polygon_edge in polygon.each_edge():
+        bbox = polygon_edge.bbox().enlarged(1, 1)
+        if bbox.contains(edge.p1) and bbox.contains(edge.p2) and \
+           polygon_edge.distance_abs(edge.p1) <= 1 and polygon_edge.distance_abs(edge.p2) <= 1:
+            return True
+    return False
+
+
+def gap_pieces(gap: kdb.Polygon, polygon: kdb.Polygon) -> List[kdb.Polygon]:
+    """
+    :return: the parts of the polygon within the gap between the edges of an edge pair
+    """
+    # NOTE: usually both are boxes, so we can avoid the region booleans
+    if gap.is_box() and polygon.is_box():
+        piece = gap.bbox() & polygon.bbox()
+        if piece.empty() or piece.width() == 0 or piece.height() == 0:
+            return []
+        return [kdb.Polygon(piece)]
+    return list((kdb.Region(gap) & kdb.Region(polygon)).each())
+
+
+def projected_interval(edge: kdb.Edge, polygon: kdb.Polygon) -> Optional[EdgeInterval]:
+    """
+    :return: the shadow of the polygon on the edge, as distances from edge.p1
+             (like owned_edge_interval), or None if the shadow misses the edge
+    """
+    length = math.hypot(edge.dx(), edge.dy())
+    ux = edge.dx() / length
+    uy = edge.dy() / length
+    distances = [(p.x - edge.p1.x) * ux + (p.y - edge.p1.y) * uy for p in polygon.each_point_hull()]
+    t_min = max(min(distances), 0.0)
+    t_max = min(max(distances), length)
+    if t_max <= t_min:
+        return None
+    return t_min, t_max
+
+
+class BulkSidewallExtractor:
+    """
+    Sidewall capacitance extraction on whole layers at once.
+
+    A single space check per layer (with the side halo as distance and projection metrics)
+    finds the facing edges of shapes with different properties (i.e. different nets).
+
+    Like the SidewallAndFringeExtractor, each side of an edge pair counts half of the capacitance,
+    and only where it is not shielded, i.e. where no other polygon (of any net) lies in between.
+    The polygon of the side itself does not shield (the visitor only looks at foreign polygons).
+
+    Lengths and distances are collected into arrays, the capacitances are computed
+    and summed per net pair with vectorized NumPy operations.
+    """
+
+    def __init__(self,
+                 all_layer_names: List[LayerName],
+                 layer_regions_by_name: Dict[LayerName, kdb.Region],
+                 dbu: float,
+                 tech_info: TechInfo,
+                 results: CellExtractionResults,
+                 report: ExtractionReporter,
+                 tile: Optional[kdb.Box] = None,
+                 compiled_tech: Optional[CompiledTech] = None):
+        self.all_layer_names = all_layer_names
+        self.layer_regions_by_name = layer_regions_by_name
+        self.dbu = dbu
+        self.tech_info = tech_info
+        self.results = results
+        self.report = report
+        self.tile = tile
+        self.compiled_tech = compiled_tech or CompiledTech(tech_info=tech_info, all_layer_names=all_layer_names)
+
+        if tile is not None:
+            # NOTE: like the SidewallAndFringeExtractor, the neighborhood of the tile's edges lies
+            #       within the halo around the tile, only the parts of the edges owned by the tile are counted
+            window = tile.enlarged(self.side_halo_dbu + 1)
+            self.layer_regions_by_name = {ln: clip_region(r, window) for ln, r in layer_regions_by_name.items()}
+
+    @cached_property
+    def side_halo_dbu(self) -> int:
+        side_halo_um = self.tech_info.tech.process_parasitics.side_halo
+        return int(side_halo_um / self.dbu) + 1  # add 1 nm to halo
+
+    def extract(self):
+        for idx in range(len(self.all_layer_names)):
+            self.extract_layer(inside_layer_index=idx)
+
+    def unshielded_length(self,
+                          edge: kdb.Edge,
+                          shields: List[kdb.Polygon]) -> float:
+        """
+        :return: the length of the edge not shadowed by the shields
+                 (in tiled mode, only the part owned by the tile)
+        """
+        shadow = merge_intervals(interval
+                                 for shield in shields
+                                 if (interval := projected_interval(edge, shield)) is not None)
+        y_near, y_far = 0.0, math.hypot(edge.dx(), edge.dy())
+        if self.tile is not None:
+            owned_interval = owned_edge_interval(edge, self.tile)
+            if owned_interval is None:
+                return 0.0  # handled by another tile
+            y_near, y_far = owned_interval
+        return sum(y2 - y1 for y1, y2 in unshielded_intervals(y_near, y_far, shadow))
+
+    def extract_layer(self, inside_layer_index: int):
+        layer_name = self.all_layer_names[inside_layer_index]
+        if layer_name == self.tech_info.internal_substrate_layer_name:
+            return
+
+        layer_region = self.layer_regions_by_name[layer_name]
+        if layer_region.is_empty():
+            return
+
+        sidewall_cap_spec = self.compiled_tech.sidewall_spec(inside_layer_index)
+        if not sidewall_cap_spec:
+            warning(f"No sidewall cap specified for layer {layer_name}")
+            return
+
+        # NOTE: the shielding of the space check is not used, as it only drops completely shielded
+        #       edge pairs and it also shields by the polygons of the edge pair itself,
+        #       so the shielding is applied for each side below
+        edge_pairs = layer_region.space_check(self.side_halo_dbu,
+                                              whole_edges=False,
+                                              metrics=kdb.Metrics.Projection,
+                                              shielded=False,
+                                              property_constraint=kdb.PropertyConstraint.DifferentPropertiesConstraint)
+
+        # NOTE: the check reports each edge pair once per participating net
+        edge_pairs_by_geometry: Dict[EdgePairGeometry, kdb.EdgePair] = {}
+        for ep in edge_pairs.each():
+            edge_pairs_by_geometry.setdefault(edge_pair_geometry(ep), ep)
+
+        # NOTE: spatial index of the (per net) merged polygons, to find the polygons around an edge pair
+        polygons = kdb.Shapes()
+        polygons.insert(layer_region.merged())
+
+        group_index_by_nets: Dict[Tuple[NetName, NetName], int] = {}
+        group_indices: List[int] = []
+        lengths: List[float] = []
+        distances: List[int] = []
+        reported_edges: List[Tuple[kdb.Edge, kdb.Edge]] = []
+
+        for ep in edge_pairs_by_geometry.values():
+            gap = ep.polygon(0)
+            nearby = [(shape.polygon, shape.properties()) for shape in polygons.each_touching(gap.bbox())]
+            first_index = next((i for i, (p, _) in enumerate(nearby) if lies_on_boundary(ep.first, p)), None)
+            second_index = next((i for i, (p, _) in enumerate(nearby)
+                                 if i != first_index and lies_on_boundary(ep.second, p)), None)
+            if first_index is None or second_index is None:
+                warning(f"Sidewall on layer {layer_name}: no polygon found for edge pair {ep}, skipping…")
+                continue
+
+            props1 = nearby[first_index][1]
+            props2 = nearby[second_index][1]
+            net1 = props1.get('net', None)
+            net2 = props2.get('net', None)
+            if net1 == net2:
+                continue  # e.g. same net in different instances (hierarchical mode)
+            if is_extracted_elsewhere(props1.get(INSTANCE_PROPERTY, None), props2.get(INSTANCE_PROPERTY, None)):
+                continue  # extracted for the cell or on the parent level (hierarchical mode)
+
+            pieces_by_index = {i: pieces
+                               for i, (p, _) in enumerate(nearby)
+                               if (pieces := gap_pieces(gap, p))}
+
+            nets = (net1, net2) if str(net1) <= str(net2) else (net2, net1)
+            for edge, other_edge, own_index in ((ep.first, ep.second, first_index),
+                                                (ep.second, ep.first, second_index)):
+                shields = [piece
+                           for i, pieces in pieces_by_index.items() if i != own_index
+                           for piece in pieces]
+                length = self.unshielded_length(edge, shields)
+                if length <= 0:
+                    continue
+
+                group_index = group_index_by_nets.setdefault(nets, len(group_index_by_nets))
+                group_indices.append(group_index)
+                lengths.append(length)
+                distances.append(ep.distance())
+                reported_edges.append((edge, other_edge))
+
+        if not group_indices:
+            return
+
+        # C = Csidewall * l / (s + offset)
+        # NOTE: like in the SidewallAndFringeExtractor, each side counts half
+        lengths_um = np.asarray(lengths, dtype=np.float64) * self.dbu
+        distances_um = np.asarray(distances, dtype=np.float64) * self.dbu
+        caps_femto = (lengths_um * self.compiled_tech.sidewall_caps[inside_layer_index]
+                      / (distances_um + self.compiled_tech.sidewall_offsets[inside_layer_index])
+                      / 2.0  # non-bidirectional (half)
+                      / 1000.0)  # aF -> fF
+
+        groups = np.asarray(group_indices, dtype=np.int64)
+        num_groups = len(group_index_by_nets)
+        cap_by_group = np.bincount(groups, weights=caps_femto, minlength=num_groups)
+        length_by_group = np.bincount(groups, weights=lengths_um, minlength=num_groups) / 2.0
+        weighted_distance_by_group = np.bincount(groups, weights=distances_um * lengths_um,
+                                                 minlength=num_groups) / 2.0
+
+        caps_by_group: List[SidewallCap] = []
+        for (net1, net2), group_index in group_index_by_nets.items():
+            cap_femto = float(cap_by_group[group_index])
+            length_um = float(length_by_group[group_index])
+            distance_um = float(weighted_distance_by_group[group_index]) / length_um if length_um > 0 else 0.0
+
+            sidewall_log("(Sidewall) layer %s: Nets %s <-> %s: %.5f fF",
+                         layer_name, net1, net2, cap_femto)
+
+            swk = SidewallKey(layer=layer_name, net1=net1, net2=net2)
+            sw_cap = SidewallCap(key=swk,
+                                 cap_value=cap_femto,
+                                 distance=distance_um,  # length weighted average
+                                 length=length_um,  # NOTE: average of both sides
+                                 tech_spec=sidewall_cap_spec)
+            self.results.add_sidewall_cap(sw_cap)
+            caps_by_group.append(sw_cap)
+
+        for idx, (inside_edge, outside_edge) in enumerate(reported_edges):
+            group_cap = caps_by_group[group_indices[idx]]
+            self.report.output_sidewall(
+                sidewall_cap=SidewallCap(key=group_cap.key,
+                                         cap_value=float(caps_femto[idx]),
+                                         distance=float(distances_um[idx]),
+                                         length=float(lengths_um[idx]),
+                                         tech_spec=sidewall_cap_spec),
+                inside_edge=inside_edge,
+                outside_edge=outside_edge
+            )
@@ -0,0 +1,131 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from typing import *
+
+import numpy as np
+
+from klayout_pex.tech_info import TechInfo
+
+from klayout_pex.rcx25.types import LayerName
+from klayout_pex_protobuf.kpex.tech.process_parasitics_pb2 import CapacitanceInfo
+
+
+class CompiledTech:
+    """
+    Dense capacitance coefficient tables, indexed by the layer indices of the extraction
+    (i.e. the index within all_layer_names), so the hot loops of the 2.5D extractors
+    don't need the nested dict lookups on the protobuf messages of TechInfo.
+
+    Built once per run (see CapacitancePassContext), missing coefficients are NaN (specs are None).
+    """
+
+    def __init__(self,
+                 tech_info: TechInfo,
+                 all_layer_names: List[LayerName]):
+        self.all_layer_names = all_layer_names
+        self.layer_index_by_name: Dict[LayerName, int] = {ln: idx for idx, ln in enumerate(all_layer_names)}
+
+        num_layers = len(all_layer_names)
+
+        # usage: [top_layer_index][bottom_layer_index]
+        self.overlap_specs: List[List[Optional[CapacitanceInfo.OverlapCapacitance]]] = \
+            [[None] * num_layers for _ in range(num_layers)]
+        self.overlap_caps = np.full((num_layers, num_layers), np.nan)  # aF/µm^2
+
+        # usage: [in_layer_index][out_layer_index]
+        self.side_overlap_caps = np.full((num_layers, num_layers), np.nan)  # aF/µm
+
+        self.sidewall_specs: List[Optional[CapacitanceInfo.SidewallCapacitance]] = [None] * num_layers
+        self.sidewall_caps = np.full(num_layers, np.nan)  # aF/µm
+        self.sidewall_offsets = np.full(num_layers, np.nan)  # µm
+
+        for top_layer_name, overlap_specs in tech_info.overlap_cap_by_layer_names.items():
+            top_idx = self.layer_index_by_name.get(top_layer_name, None)
+            if top_idx is None:
+                continue
+            for bot_layer_name, overlap_spec in overlap_specs.items():
+                bot_idx = self.layer_index_by_name.get(bot_layer_name, None)
+                if bot_idx is None:
+                    continue
+                self.overlap_specs[top_idx][bot_idx] = overlap_spec
+                self.overlap_caps[top_idx, bot_idx] = overlap_spec.capacitance
+
+        for in_layer_name, side_overlap_specs in tech_info.side_overlap_cap_by_layer_names.items():
+            in_idx = self.layer_index_by_name.get(in_layer_name, None)
+            if in_idx is None:
+                continue
+            for out_layer_name, side_overlap_spec in side_overlap_specs.items():
+                out_idx = self.layer_index_by_name.get(out_layer_name, None)
+                if out_idx is None:
+                    continue
+                self.side_overlap_caps[in_idx, out_idx] = side_overlap_spec.capacitance
+
+        for layer_name, sidewall_spec in tech_info.sidewall_cap_by_layer_name.items():
+            idx = self.layer_index_by_name.get(layer_name, None)
+            if idx is None:
+                continue
+            self.sidewall_specs[idx] = sidewall_spec
+            self.sidewall_caps[idx] = sidewall_spec.capacitance
+            self.sidewall_offsets[idx] = sidewall_spec.offset
+
+        # NOTE: overlap_caps is top/bot (not symmetric), the fringe uses either order
+        self.fringe_overlap_caps = np.where(np.isnan(self.overlap_caps), self.overlap_caps.T, self.overlap_caps)
+
+    def overlap_spec(self,
+                     top_layer_index: int,
+                     bottom_layer_index: int) -> Optional[CapacitanceInfo.OverlapCapacitance]:
+        return self.overlap_specs[top_layer_index][bottom_layer_index]
+
+    def sidewall_spec(self, layer_index: int) -> Optional[CapacitanceInfo.SidewallCapacitance]:
+        return self.sidewall_specs[layer_index]
+
+    def has_fringe_caps(self,
+                        inside_layer_index: int,
+                        outside_layer_index: int) -> bool:
+        return not (np.isnan(self.fringe_overlap_caps[inside_layer_index, outside_layer_index]) or
+                    np.isnan(self.side_overlap_caps[inside_layer_index, outside_layer_index]))
+
+    def overlap_child_layer_indices(self, inside_layer_index: int) -> List[int]:
+        """
+        The layers needed by the overlap pass of the (bottom) inside layer,
+        i.e. all layers above, as each of them is either coupled or shields the layers further above
+        """
+        return list(range(inside_layer_index + 1, len(self.all_layer_names)))
+
+    def fringe_child_layer_indices(self, inside_layer_index: int) -> List[int]:
+        """
+        The layers needed by the sidewall and fringe pass of the inside layer:
+            - the inside layer itself (sidewalls and lateral shielding)
+            - the layers with side overlap (fringe) coefficients
+            - the layers in between, shielding the fringe
+        """
+        coupled_layer_indices = [idx for idx in range(len(self.all_layer_names))
+                                 if idx != inside_layer_index and self.has_fringe_caps(inside_layer_index, idx)]
+        if not coupled_layer_indices:
+            return [inside_layer_index]
+        lowest_layer_index = min(inside_layer_index, *coupled_layer_indices)
+        highest_layer_index = max(inside_layer_index, *coupled_layer_indices)
+        return list(range(lowest_layer_index, highest_layer_index + 1))
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import *
+
+import klayout.db as kdb
+
+from klayout_pex.rcx25.types import EdgeInterval, NetName
+
+
+# NOTE: within one edge interval of the edge neighborhood, all polygons are (usually) boxes
+#       spanning the whole interval, so the geometry is 1-D in y:
+#       shielding can be computed with interval arithmetic instead of 2-D region booleans
+
+YInterval = Tuple[int, int]  # (y_near, y_far)
+NetYInterval = Tuple[int, int, NetName]  # (y_near, y_far, net)
+
+
+def interval_polygons_by_layer(edge_interval: EdgeInterval,
+                               polygons_by_layer: Dict[int, List[kdb.PolygonWithProperties]]) \
+        -> Optional[Dict[int, List[NetYInterval]]]:
+    """
+    :return: the sorted (y_near, y_far, net) intervals per layer,
+             or None if any polygon is not a box spanning the whole edge interval
+             (then the 2-D region path has to be used)
+    """
+    x1, x2 = edge_interval
+    intervals_by_layer: Dict[int, List[NetYInterval]] = {}
+    for layer_index, polygons in polygons_by_layer.items():
+        intervals = []
+        for p in polygons:
+            if not p.is_box():
+                return None
+            bbox = p.bbox()
+            if bbox.left > x1 or bbox.right < x2:
+                return None
+            intervals.append((bbox.bottom, bbox.top, p.property('net')))
+        intervals.sort(key=lambda i: (i[0], i[1]))
+        intervals_by_layer[layer_index] = intervals
+    return intervals_by_layer
+
+
+def merge_intervals(intervals: Iterable[YInterval]) -> List[YInterval]:
+    """
+    :return: the union of the intervals, as sorted disjoint intervals
+             (touching intervals are joined)
+    """
+    merged: List[List[int]] = []
+    for y_near, y_far in sorted(intervals):
+        if merged and y_near <= merged[-1][1]:
+            if y_far > merged[-1][1]:
+                merged[-1][1] = y_far
+        else:
+            merged.append([y_near, y_far])
+    return [(y_near, y_far) for y_near, y_far in merged]
+
+
+def unshielded_intervals(y_near: int,
+                         y_far: int,
+                         shield: List[YInterval]) -> List[YInterval]:
+    """
+    :param shield: merged shield intervals (see merge_intervals)
+    :return: the parts of [y_near, y_far] not covered by the shield, sorted by y
+    """
+    segments = []
+    # NOTE: skip the shield intervals entirely below y_near
+    idx = max(bisect_right(shield, (y_near, y_near)) - 1, 0)
+    y = y_near
+    for shield_near, shield_far in shield[idx:]:
+        if shield_near >= y_far:
+            break
+        if shield_far <= y:
+            continue
+        if shield_near > y:
+            segments.append((y, shield_near))
+        y = max(y, shield_far)
+        if y >= y_far:
+            break
+    if y < y_far:
+        segments.append((y, y_far))
+    return segments
@@ -26,14 +26,21 @@
 import klayout.db as kdb
 
 from klayout_pex.log import (
-    info,
     warning,
+    RateLimitedLogger,
 )
 from klayout_pex.tech_info import TechInfo
+from klayout_pex.util.stage_timer import count_metric
 
+from klayout_pex.rcx25.c.compiled_tech import CompiledTech
 from klayout_pex.rcx25.types import PolygonNeighborhood
 from klayout_pex.rcx25.extraction_results import *
 from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.hierarchy import CONTEXT_INSTANCE, INSTANCE_PROPERTY, is_extracted_elsewhere
+from klayout_pex.rcx25.tiling import clip_region
+
+
+overlap_log = RateLimitedLogger('overlap contributions')
 
 
 class OverlapExtractor:
@@ -43,56 +50,89 @@ class OverlapExtractor:
                  dbu: float,
                  tech_info: TechInfo,
                  results: CellExtractionResults,
-                 report: ExtractionReporter):
+                 report: ExtractionReporter,
+                 tile: Optional[kdb.Box] = None,
+                 compiled_tech: Optional[CompiledTech] = None):
+        if tile is not None:
+            # NOTE: overlap areas are additive, so clipping all layers to the tile
+            #       attributes each overlap to the tile owning that part of the bottom polygon
+            layer_regions_by_name = {ln: clip_region(r, tile) for ln, r in layer_regions_by_name.items()}
+
         self.all_layer_names = all_layer_names
         self.layer_regions_by_name = layer_regions_by_name
         self.dbu = dbu
         self.tech_info = tech_info
         self.results = results
         self.report = report
+        self.compiled_tech = compiled_tech or CompiledTech(tech_info=tech_info, all_layer_names=all_layer_names)
 
     def extract(self):
-        for idx, (layer_name, layer_region) in enumerate(self.layer_regions_by_name.items()):
-            ovl_visitor = self.PEXPolygonNeighborhoodVisitor(
-                layer_names=self.all_layer_names,
-                inside_layer_index=idx,
-                dbu=self.dbu,
-                tech_info=self.tech_info,
-                results=self.results,
-                report=self.report
-            )
-
-            # See comment above: as we use the layers in the stack order,
-            # the input index is also the metal layer index
-            ovl_children = [kdb.CompoundRegionOperationNode.new_secondary(r)
-                            for r in self.layer_regions_by_name.values()]
-
-            # We don't use a distance - hence only true overlaps will be considered
-            ovl_node = kdb.CompoundRegionOperationNode.new_polygon_neighborhood(ovl_children, ovl_visitor)
-
-            layer_region.complex_op(ovl_node)
+        for idx in range(len(self.all_layer_names)):
+            self.extract_layer(inside_layer_index=idx)
+
+    def extract_layer(self, inside_layer_index: int):
+        layer_name = self.all_layer_names[inside_layer_index]
+        layer_region = self.layer_regions_by_name[layer_name]
+
+        # NOTE: only the layers needed for the inside layer are neighborhood inputs
+        child_layer_indices = self.compiled_tech.overlap_child_layer_indices(inside_layer_index)
+        if not child_layer_indices or layer_region.is_empty():
+            return
+
+        ovl_visitor = self.PEXPolygonNeighborhoodVisitor(
+            layer_names=self.all_layer_names,
+            inside_layer_index=inside_layer_index,
+            child_layer_indices=child_layer_indices,
+            dbu=self.dbu,
+            tech_info=self.tech_info,
+            compiled_tech=self.compiled_tech,
+            results=self.results,
+            report=self.report
+        )
+
+        ovl_children = [kdb.CompoundRegionOperationNode.new_secondary(
+                            self.layer_regions_by_name[self.all_layer_names[idx]]
+                        )
+                        for idx in child_layer_indices]
+
+        # We don't use a distance - hence only true overlaps will be considered
+        ovl_node = kdb.CompoundRegionOperationNode.new_polygon_neighborhood(ovl_children, ovl_visitor)
+
+        layer_region.complex_op(ovl_node)
+        count_metric('polygon neighborhood callbacks by layer', layer_name, ovl_visitor.callback_count)
 
     class PEXPolygonNeighborhoodVisitor(kdb.PolygonNeighborhoodVisitor):
         def __init__(self,
                      layer_names: List[LayerName],
                      inside_layer_index: int,
+                     child_layer_indices: List[int],
                      dbu: float,
                      tech_info: TechInfo,
+                     compiled_tech: CompiledTech,
                      results: CellExtractionResults,
                      report: ExtractionReporter):
             super().__init__()
             self.layer_names = layer_names
             self.inside_layer_index = inside_layer_index
+            self.child_index_by_layer_index = {layer_index: child_index
+                                               for child_index, layer_index in enumerate(child_layer_indices)}
             self.dbu = dbu
             self.tech_info = tech_info
+            self.compiled_tech = compiled_tech
             self.results = results
             self.report = report
+            self.callback_count = 0
 
         def neighbors(self,
                       layout: kdb.Layout,
                       cell: kdb.Cell,
                       polygon: kdb.PolygonWithProperties,
                       neighborhood: PolygonNeighborhood):
+            self.callback_count += 1
+
+            if polygon.property(INSTANCE_PROPERTY) == CONTEXT_INSTANCE:
+                return  # only shielding, extracted on the parent level (hierarchical mode)
+
             # We just look "upwards", as we don't want to count areas twice
 
             shielded_region = kdb.Region()
@@ -103,7 +143,7 @@ class OverlapExtractor:
                 else polygon.property('net')
 
             for other_layer_index in range(self.inside_layer_index + 1, len(self.layer_names)):
-                polygons_above = neighborhood.get(other_layer_index, None)
+                polygons_above = neighborhood.get(self.child_index_by_layer_index[other_layer_index], None)
                 if polygons_above is None:
                     continue
 
@@ -113,15 +153,17 @@ class OverlapExtractor:
                     if net_top == net_bot:
                         continue
 
+                    if is_extracted_elsewhere(polygon.property(INSTANCE_PROPERTY),
+                                              polygon_above.property(INSTANCE_PROPERTY)):
+                        # NOTE: extracted for the cell or on the parent level (hierarchical mode), but still shielding
+                        shielded_region.insert(polygon_above)
+                        continue
+
                     top_layer_name = self.layer_names[other_layer_index]
 
-                    top_overlap_specs = self.tech_info.overlap_cap_by_layer_names.get(top_layer_name, None)
-                    if not top_overlap_specs:
-                        warning(f"No overlap cap specified for layer top={top_layer_name}")
-                        return
-                    overlap_cap_spec = top_overlap_specs.get(bot_layer_name, None)
+                    overlap_cap_spec = self.compiled_tech.overlap_spec(other_layer_index, self.inside_layer_index)
                     if not overlap_cap_spec:
-                        warning(f"No overlap cap specified for layer bottom={bot_layer_name}")
+                        warning(f"No overlap cap specified for layer top={top_layer_name}, bottom={bot_layer_name}")
                         return
 
                     top_region = kdb.Region(polygon_above)
@@ -130,9 +172,9 @@ class OverlapExtractor:
 
                     overlap_area_um2 = overlap_area.area() * self.dbu ** 2
                     cap_femto = overlap_area_um2 * overlap_cap_spec.capacitance / 1000.0
-                    info(f"(Overlap): {top_layer_name}({net_top})-{bot_layer_name}({net_bot}): "
-                         f"cap: {round(cap_femto, 2)} fF, "
-                         f"area: {overlap_area_um2} µm^2")
+                    overlap_log("(Overlap): %s(%s)-%s(%s): cap: %.2f fF, area: %s µm^2",
+                                top_layer_name, net_top, bot_layer_name, net_bot,
+                                cap_femto, overlap_area_um2)
 
                     if cap_femto > 0.0:
                         ovk = OverlapKey(layer_top=top_layer_name,
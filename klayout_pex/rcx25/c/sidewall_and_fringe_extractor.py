@@ -23,25 +23,93 @@
 # --------------------------------------------------------------------------------
 #
 
+import array
+from dataclasses import dataclass, field
 from functools import cached_property
 import math
 
 import klayout.db as kdb
+import numpy as np
 
 from klayout_pex.log import (
-    info,
     warning,
     get_log_level,
-    LogLevel
+    LogLevel,
+    RateLimitedLogger,
 )
 from klayout_pex.tech_info import TechInfo
+from klayout_pex.util.stage_timer import count_metric
 
+from klayout_pex.rcx25.c.compiled_tech import CompiledTech
 from klayout_pex.rcx25.c.geometry_restorer import GeometryRestorer
+from klayout_pex.rcx25.c.interval_shielding import (
+    YInterval,
+    interval_polygons_by_layer,
+    merge_intervals,
+    unshielded_intervals,
+)
 from klayout_pex.rcx25.extraction_results import *
-from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter, ReportLevel
 from klayout_pex.rcx25.c.polygon_utils import find_polygon_with_nearest_edge, nearest_edge
+from klayout_pex.rcx25.hierarchy import CONTEXT_INSTANCE, INSTANCE_PROPERTY, is_extracted_elsewhere
+from klayout_pex.rcx25.tiling import clip_region, owned_edge_interval
 from klayout_pex.rcx25.types import EdgeInterval, EdgeNeighborhood
-from klayout_pex_protobuf.kpex.tech.process_parasitics_pb2 import CapacitanceInfo
+
+
+def fringe_caps(edge_interval_lengths_um: np.ndarray,
+                distances_near_um: np.ndarray,
+                distances_far_um: np.ndarray,
+                alpha_c: Union[float, np.ndarray],
+                full_halo_ratio: Optional[Union[float, np.ndarray]],
+                sideoverlap_capacitance: Union[float, np.ndarray]) -> np.ndarray:
+    """
+    Vectorized side overlap (fringe) capacitance (in fF),
+    the coefficients are either scalars or given per contribution
+
+    :param alpha_c: scaled overlap capacitance of the layer pair
+    :param full_halo_ratio: ratio of the halo distance (to normalize the near/far ratios), None to keep them
+    """
+    # see Magic ExtCouple.c L1164
+    cnear = (2.0 / math.pi) * np.arctan(alpha_c * distances_near_um)
+    cfar = (2.0 / math.pi) * np.arctan(alpha_c * distances_far_um)
+
+    if full_halo_ratio is not None:
+        cnear /= full_halo_ratio
+        cfar /= full_halo_ratio
+
+    # "cfrac" is the fractional portion of the fringe cap seen
+    # by tile tp along its length.  This is independent of the
+    # portion of the boundary length that tile tp occupies.
+    cfrac = cfar - cnear
+
+    return cfrac * edge_interval_lengths_um * sideoverlap_capacitance / 1000.0
+
+
+sidewall_log = RateLimitedLogger('sidewall contributions')
+side_overlap_log = RateLimitedLogger('side overlap contributions')
+
+
+@dataclass
+class FringeRecords:
+    """
+    Side overlap (fringe) contributions collected by the visitor,
+    the capacitances are evaluated in batches (see PEXEdgeNeighborhoodVisitor.flush_fringes)
+    """
+    outside_layer_indices: array.array = field(default_factory=lambda: array.array('q'))
+    net_pair_indices: array.array = field(default_factory=lambda: array.array('q'))
+    distances_near: array.array = field(default_factory=lambda: array.array('d'))  # dbu
+    distances_far: array.array = field(default_factory=lambda: array.array('d'))  # dbu
+    edge_interval_lengths: array.array = field(default_factory=lambda: array.array('d'))  # dbu
+    counted_interval_lengths: array.array = field(default_factory=lambda: array.array('d'))  # dbu
+
+    # NOTE: only kept for the full report, the geometry is only restored for the reported contributions
+    report_infos: List[Tuple[GeometryRestorer,
+                             EdgeInterval,
+                             kdb.PolygonWithProperties,
+                             Optional[kdb.Polygon]]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.net_pair_indices)
 
 
 class SidewallAndFringeExtractor:
@@ -52,7 +120,10 @@ class SidewallAndFringeExtractor:
                  scale_ratio_to_fit_halo: bool,
                  tech_info: TechInfo,
                  results: CellExtractionResults,
-                 report: ExtractionReporter):
+                 report: ExtractionReporter,
+                 tile: Optional[kdb.Box] = None,
+                 emit_sidewalls: bool = True,
+                 compiled_tech: Optional[CompiledTech] = None):
         self.all_layer_names = all_layer_names
         self.layer_regions_by_name = layer_regions_by_name
         self.dbu = dbu
@@ -60,44 +131,72 @@ class SidewallAndFringeExtractor:
         self.tech_info = tech_info
         self.results = results
         self.report = report
+        self.tile = tile
+        self.emit_sidewalls = emit_sidewalls  # False: sidewalls are extracted by the BulkSidewallExtractor
+        self.compiled_tech = compiled_tech or CompiledTech(tech_info=tech_info, all_layer_names=all_layer_names)
 
-        self.all_layer_regions = layer_regions_by_name.values()
+        if tile is not None:
+            # NOTE: the neighborhood of the tile's edges lies within the halo around the tile,
+            #       the visitor then only considers the parts of the edges owned by the tile
+            window = tile.enlarged(self.side_halo_dbu + 1)
+            self.layer_regions_by_name = {ln: clip_region(r, window) for ln, r in layer_regions_by_name.items()}
 
-    def extract(self):
-        for idx, (layer_name, layer_region) in enumerate(self.layer_regions_by_name.items()):
-            other_layer_regions = [
-                r for ln, r in self.layer_regions_by_name.items()
-                if ln != layer_name
-            ]
+        self.all_layer_regions = [self.layer_regions_by_name[ln] for ln in all_layer_names]
 
-            en_visitor = self.PEXEdgeNeighborhoodVisitor(
-                all_layer_names=self.all_layer_names,
-                inside_layer_index=idx,
-                dbu=self.dbu,
-                scale_ratio_to_fit_halo=self.scale_ratio_to_fit_halo,
-                tech_info=self.tech_info,
-                results=self.results,
-                report=self.report
-            )
+    @cached_property
+    def side_halo_dbu(self) -> int:
+        side_halo_um = self.tech_info.tech.process_parasitics.side_halo
+        return int(side_halo_um / self.dbu) + 1  # add 1 nm to halo
 
-            en_children = [kdb.CompoundRegionOperationNode.new_secondary(r)
-                           for r in self.all_layer_regions]
-            en_children[idx] = kdb.CompoundRegionOperationNode.new_foreign()  # sidewall of other nets on the same layer
-            en_children.append(kdb.CompoundRegionOperationNode.new_primary()) # opposing structures of the same polygon
-
-            side_halo_um = self.tech_info.tech.process_parasitics.side_halo
-            side_halo_dbu = int(side_halo_um / self.dbu) + 1  # add 1 nm to halo
-
-            en_node = kdb.CompoundRegionOperationNode.new_edge_neighborhood(
-                children=en_children,
-                visitor=en_visitor,
-                bext=-1, # NOTE: -1 dbu, suppresses quasi-empty contributions (will also suppress 90° edges)
-                eext=-1, # NOTE: -1 dbu, suppresses quasi-empty contributions (will also suppress 90° edges)
-                din=-1,  # NOTE: -1 dbu, suppresses the edge itself appearing as a pseudo-polygon in new_primary()
-                dout=side_halo_dbu # dout
-            )
-
-            layer_region.complex_op(en_node)
+    def extract(self):
+        for idx in range(len(self.all_layer_names)):
+            self.extract_layer(inside_layer_index=idx)
+
+    def extract_layer(self, inside_layer_index: int):
+        idx = inside_layer_index
+        layer_name = self.all_layer_names[idx]
+        layer_region = self.layer_regions_by_name[layer_name]
+        if layer_region.is_empty():
+            return
+
+        # NOTE: only the layers needed for the inside layer are neighborhood inputs
+        child_layer_indices = self.compiled_tech.fringe_child_layer_indices(idx)
+        if child_layer_indices == [idx] and \
+           (not self.emit_sidewalls or self.compiled_tech.sidewall_spec(idx) is None):
+            return  # neither fringe nor sidewall capacitances
+
+        en_visitor = self.PEXEdgeNeighborhoodVisitor(
+            all_layer_names=self.all_layer_names,
+            inside_layer_index=idx,
+            child_layer_indices=child_layer_indices,
+            dbu=self.dbu,
+            scale_ratio_to_fit_halo=self.scale_ratio_to_fit_halo,
+            tech_info=self.tech_info,
+            compiled_tech=self.compiled_tech,
+            results=self.results,
+            report=self.report,
+            tile=self.tile,
+            emit_sidewalls=self.emit_sidewalls
+        )
+
+        en_children = [kdb.CompoundRegionOperationNode.new_foreign()  # sidewall of other nets on the same layer
+                       if child_layer_index == idx else
+                       kdb.CompoundRegionOperationNode.new_secondary(self.all_layer_regions[child_layer_index])
+                       for child_layer_index in child_layer_indices]
+        en_children.append(kdb.CompoundRegionOperationNode.new_primary()) # opposing structures of the same polygon
+
+        en_node = kdb.CompoundRegionOperationNode.new_edge_neighborhood(
+            children=en_children,
+            visitor=en_visitor,
+            bext=-1, # NOTE: -1 dbu, suppresses quasi-empty contributions (will also suppress 90° edges)
+            eext=-1, # NOTE: -1 dbu, suppresses quasi-empty contributions (will also suppress 90° edges)
+            din=-1,  # NOTE: -1 dbu, suppresses the edge itself appearing as a pseudo-polygon in new_primary()
+            dout=self.side_halo_dbu # dout
+        )
+
+        layer_region.complex_op(en_node)
+        en_visitor.flush_fringes()
+        count_metric('edge neighborhood callbacks by layer', layer_name, en_visitor.callback_count)
 
     # ------------------------------------------------------------------------
 
@@ -105,20 +204,41 @@ class SidewallAndFringeExtractor:
         def __init__(self,
                      all_layer_names: List[LayerName],
                      inside_layer_index: int,
+                     child_layer_indices: List[int],
                      dbu: float,
                      tech_info: TechInfo,
+                     compiled_tech: CompiledTech,
                      scale_ratio_to_fit_halo: bool,
                      results: CellExtractionResults,
-                     report: ExtractionReporter):
+                     report: ExtractionReporter,
+                     tile: Optional[kdb.Box] = None,
+                     emit_sidewalls: bool = True):
             super().__init__()
 
             self.all_layer_names = all_layer_names
             self.inside_layer_index = inside_layer_index
+            # NOTE: maps the neighborhood child index to the layer index,
+            #       the primary (last child) is mapped to len(all_layer_names)
+            self.layer_index_by_child_index = [*child_layer_indices, len(all_layer_names)]
             self.dbu = dbu
             self.tech_info = tech_info
+            self.compiled_tech = compiled_tech
             self.scale_ratio_to_fit_halo = scale_ratio_to_fit_halo
             self.results = results
             self.report = report
+            self.tile = tile
+            self.emit_sidewalls = emit_sidewalls
+            self.callback_count = 0
+
+            # NOTE: only the full report contains shapes, otherwise the geometry is not restored
+            self.report_shapes = report.level == ReportLevel.FULL
+
+            self.sidewall_cap_spec = compiled_tech.sidewall_spec(inside_layer_index)
+
+            self.fringe_records = FringeRecords()
+            self.fringe_caps_available = [compiled_tech.has_fringe_caps(inside_layer_index, idx)
+                                          for idx in range(len(all_layer_names))]
+            self.fringe_net_pair_index_by_names: Dict[Tuple[NetName, NetName], int] = {}
 
             # NOTE: prepare layers below and layers above the "inside" layer,
             #       each prepared for iteration that allows iterativly growing a shield region
@@ -148,24 +268,43 @@ class SidewallAndFringeExtractor:
                     cell: kdb.Cell,
                     edge: kdb.EdgeWithProperties,
                     neighborhood: EdgeNeighborhood):
+            self.callback_count += 1
+
+            if edge.property(INSTANCE_PROPERTY) == CONTEXT_INSTANCE:
+                return  # only shielding, extracted on the parent level (hierarchical mode)
+
             #
             # NOTE: this complex operation will automatically rotate every edge to be on the x-axis
             #       going from 0 to edge.length
             #       so we only have to consider the y-axis to get the near and far distances
             #
+            owned_interval: Optional[EdgeInterval] = None
+            if self.tile is not None:
+                owned_interval = owned_edge_interval(edge, self.tile)
+                if owned_interval is None:
+                    return  # handled by another tile
+
             geometry_restorer = GeometryRestorer(self.to_original_trans(edge))
 
             if get_log_level() == LogLevel.DEBUG:
                 self.report.output_edge_neighborhood(inside_layer=self.inside_layer_name,
                                                      all_layer_names=self.all_layer_names,
                                                      edge=edge,
-                                                     neighborhood=neighborhood,
+                                                     neighborhood=[
+                                                         (edge_interval,
+                                                          {self.layer_index_by_child_index[child_index]: polygons
+                                                           for child_index, polygons in polygons_by_child.items()})
+                                                         for edge_interval, polygons_by_child in neighborhood
+                                                     ],
                                                      geometry_restorer=geometry_restorer)
 
             for edge_interval, polygons_by_child in neighborhood:
                 if not polygons_by_child:
                     continue
 
+                polygons_by_child = {self.layer_index_by_child_index[child_index]: polygons
+                                     for child_index, polygons in polygons_by_child.items()}
+
                 edge_interval_length = edge_interval[1] - edge_interval[0]
                 if edge_interval_length <= 1:
                     warning(f"Short edge interval {edge_interval} "
@@ -173,10 +312,24 @@ class SidewallAndFringeExtractor:
                             f"expected to be dropped due to bext/eext parameters, skipping…")
                     continue
 
-                layer_fringe_shields = [kdb.Region() for _ in self.all_layer_names]
-                for child_index, polygons in polygons_by_child.items():
-                    if child_index < len(self.all_layer_names):
-                        layer_fringe_shields[child_index].insert(polygons)
+                # NOTE: in tiled mode, only the part of the interval owned by the tile is counted
+                counted_interval = edge_interval
+                if owned_interval is not None:
+                    counted_interval = (max(edge_interval[0], owned_interval[0]),
+                                        min(edge_interval[1], owned_interval[1]))
+                    if counted_interval[1] <= counted_interval[0]:
+                        continue  # handled by another tile
+
+                # NOTE: usually all polygons are boxes spanning the whole interval,
+                #       so shielding is computed on 1-D intervals in y,
+                #       otherwise we fall back to 2-D region booleans
+                intervals_by_layer = interval_polygons_by_layer(edge_interval, polygons_by_child)
+                layer_fringe_shields: Optional[List[kdb.Region]] = None
+                if intervals_by_layer is None:
+                    layer_fringe_shields = [kdb.Region() for _ in self.all_layer_names]
+                    for child_index, polygons in polygons_by_child.items():
+                        if child_index < len(self.all_layer_names):
+                            layer_fringe_shields[child_index].insert(polygons)
 
                 # NOTE: lateral fringe shielding, can be caused by
                 #         - sidewall (other net)
@@ -206,13 +359,15 @@ class SidewallAndFringeExtractor:
                             nearest_distance = distance
                             nearest_lateral_edge = nearest_edge(nearby_polygon)
 
-                        self.emit_sidewall(
-                            layer_name=self.inside_layer_name,
-                            edge=edge,
-                            edge_interval=edge_interval,
-                            polygon=nearby_polygon,
-                            geometry_restorer=geometry_restorer
-                        )
+                        # NOTE: the nearest sidewall still laterally shields the fringe
+                        if self.emit_sidewalls:
+                            self.emit_sidewall(
+                                layer_name=self.inside_layer_name,
+                                edge=edge,
+                                edge_interval=counted_interval,
+                                polygon=nearby_polygon,
+                                geometry_restorer=geometry_restorer
+                            )
 
                 lateral_shield: Optional[kdb.Polygon] = None
                 if nearest_lateral_edge is not None:
@@ -227,16 +382,30 @@ class SidewallAndFringeExtractor:
                     if self.inside_layer_index == child_index:
                         continue  # already handled above
                     elif child_index < len(self.all_layer_names): # FRINGE!
-                        fringe_shield = kdb.Region()
-                        if lateral_shield is not None:
-                            fringe_shield.insert(lateral_shield)
+                        if not self.fringe_caps_available[child_index]:
+                            continue  # no side overlap coefficients, only shielding
+
                         if child_index < self.inside_layer_index:
-                            r = range(child_index + 1, self.inside_layer_index)
-                            for idx in r:
-                                fringe_shield += layer_fringe_shields[idx]
-                        elif self.inside_layer_index < child_index:
-                            r = range(self.inside_layer_index + 1, child_index)
-                            for idx in r:
+                            shielding_layer_indices = range(child_index + 1, self.inside_layer_index)
+                        else:
+                            shielding_layer_indices = range(self.inside_layer_index + 1, child_index)
+
+                        fringe_shield: Optional[kdb.Region] = None
+                        fringe_shield_intervals: Optional[List[YInterval]] = None
+                        if intervals_by_layer is not None:
+                            shield_intervals = []
+                            if lateral_shield is not None:
+                                lateral_shield_bbox = lateral_shield.bbox()
+                                shield_intervals.append((lateral_shield_bbox.bottom, lateral_shield_bbox.top))
+                            for idx in shielding_layer_indices:
+                                for y_near, y_far, _ in intervals_by_layer.get(idx, ()):
+                                    shield_intervals.append((y_near, y_far))
+                            fringe_shield_intervals = merge_intervals(shield_intervals)
+                        else:
+                            fringe_shield = kdb.Region()
+                            if lateral_shield is not None:
+                                fringe_shield.insert(lateral_shield)
+                            for idx in shielding_layer_indices:
                                 fringe_shield += layer_fringe_shields[idx]
 
                         # NOTE:
@@ -245,11 +414,13 @@ class SidewallAndFringeExtractor:
 
                         self.emit_fringe(
                             inside_layer_name=self.inside_layer_name,
-                            outside_layer_name=self.all_layer_names[child_index],
+                            outside_layer_index=child_index,
                             edge=edge,
                             edge_interval=edge_interval,
+                            counted_interval=counted_interval,
                             outside_polygons=polygons,
                             shield=fringe_shield,
+                            shield_intervals=fringe_shield_intervals,
                             lateral_shield=lateral_shield,
                             geometry_restorer=geometry_restorer)
 
@@ -265,7 +436,12 @@ class SidewallAndFringeExtractor:
             if net1 == net2:
                 return
 
-            sidewall_cap_spec = self.tech_info.sidewall_cap_by_layer_name[layer_name]
+            if is_extracted_elsewhere(edge.property(INSTANCE_PROPERTY), polygon.property(INSTANCE_PROPERTY)):
+                return  # extracted for the cell or on the parent level (hierarchical mode)
+
+            sidewall_cap_spec = self.sidewall_cap_spec
+            if not sidewall_cap_spec:
+                raise KeyError(f"No sidewall cap specified for layer {layer_name}")
 
             # TODO!
 
@@ -282,8 +458,6 @@ class SidewallAndFringeExtractor:
             avg_length = edge_interval[1] - edge_interval[0]
             avg_distance = min(polygon.bbox().p1.y, polygon.bbox().p2.y)
 
-            outside_edge = nearest_edge(polygon)
-
             length_um = avg_length * self.dbu
             distance_um = avg_distance * self.dbu
 
@@ -294,7 +468,8 @@ class SidewallAndFringeExtractor:
                          / 2.0  # non-bidirectional (half)
                          / 1000.0)  # aF -> fF
 
-            info(f"(Sidewall) layer {layer_name}: Nets {net1} <-> {net2}: {round(cap_femto, 5)} fF")
+            sidewall_log("(Sidewall) layer %s: Nets %s <-> %s: %.5f fF",
+                         layer_name, net1, net2, cap_femto)
 
             swk = SidewallKey(layer=layer_name, net1=net1, net2=net2)
             sw_cap = SidewallCap(key=swk,
@@ -304,57 +479,175 @@ class SidewallAndFringeExtractor:
                                  tech_spec=sidewall_cap_spec)
             self.results.add_sidewall_cap(sw_cap)
 
+            if self.report.level == ReportLevel.OFF:
+                return
+
+            inside_edge: Optional[kdb.Edge] = None
+            outside_edge: Optional[kdb.Edge] = None
+            if self.report_shapes:
+                inside_edge = geometry_restorer.restore_edge_interval(edge_interval)
+                outside_edge = geometry_restorer.restore_edge(nearest_edge(polygon))
             self.report.output_sidewall(
                 sidewall_cap=sw_cap,
-                inside_edge=geometry_restorer.restore_edge_interval(edge_interval),
-                outside_edge=geometry_restorer.restore_edge(outside_edge)
+                inside_edge=inside_edge,
+                outside_edge=outside_edge
             )
 
-        def fringe_cap(self,
-                       edge_interval_length: float,
-                       distance_near: float,
-                       distance_far: float,
-                       overlap_cap_spec: CapacitanceInfo.OverlapCapacitance,
-                       sideoverlap_cap_spec: CapacitanceInfo.SideOverlapCapacitance) -> float:
-            distance_near_um = distance_near * self.dbu
-            distance_far_um = distance_far * self.dbu
-            edge_interval_length_um = edge_interval_length * self.dbu
+        # NOTE: records are evaluated at the end of the layer, or once the batch is full
+        FRINGE_BATCH_SIZE = 1 << 16
+
+        def fringe_net_pair_index(self,
+                                  inside_net_name: NetName,
+                                  outside_net_name: NetName) -> int:
+            net_pair = (inside_net_name, outside_net_name)
+            net_pair_index = self.fringe_net_pair_index_by_names.get(net_pair, None)
+            if net_pair_index is None:
+                net_pair_index = len(self.fringe_net_pair_index_by_names)
+                self.fringe_net_pair_index_by_names[net_pair] = net_pair_index
+            return net_pair_index
+
+        def flush_fringes(self):
+            records = self.fringe_records
+            if len(records) == 0:
+                return
+            self.fringe_records = FringeRecords()
+
+            outside_layer_indices = np.frombuffer(records.outside_layer_indices, dtype=np.int64)
+            edge_interval_lengths = np.frombuffer(records.edge_interval_lengths, dtype=np.float64)
+            counted_interval_lengths = np.frombuffer(records.counted_interval_lengths, dtype=np.float64)
+            distances_near_um = np.frombuffer(records.distances_near, dtype=np.float64) * self.dbu
+            distances_far_um = np.frombuffer(records.distances_far, dtype=np.float64) * self.dbu
+            edge_interval_lengths_um = edge_interval_lengths * self.dbu
 
             # NOTE: overlap scaling is 1/50  (see MAGIC ExtTech)
             alpha_scale_factor = 0.02 * 0.01 * 0.5 * 200.0
-            alpha_c = overlap_cap_spec.capacitance * alpha_scale_factor
-
-            # see Magic ExtCouple.c L1164
-            cnear = (2.0 / math.pi) * math.atan(alpha_c * distance_near_um)
-            cfar = (2.0 / math.pi) * math.atan(alpha_c * distance_far_um)
+            alpha_c = self.compiled_tech.fringe_overlap_caps[self.inside_layer_index, outside_layer_indices] \
+                      * alpha_scale_factor
 
+            full_halo_ratio: Optional[np.ndarray] = None
             if self.scale_ratio_to_fit_halo:
-                full_halo_ratio = (2.0 / math.pi) * math.atan(alpha_c * self.side_halo)
+                full_halo_ratio = (2.0 / math.pi) * np.arctan(alpha_c * self.side_halo)
                 # NOTE: for a large enough halo, full_halo would be 1,
                 #       but it is smaller, so we compensate
-                if full_halo_ratio < 1.0:
-                    cnear /= full_halo_ratio
-                    cfar /= full_halo_ratio
+                full_halo_ratio = np.where(full_halo_ratio < 1.0, full_halo_ratio, 1.0)
+
+            caps_femto = fringe_caps(
+                edge_interval_lengths_um=edge_interval_lengths_um,
+                distances_near_um=distances_near_um,
+                distances_far_um=distances_far_um,
+                alpha_c=alpha_c,
+                full_halo_ratio=full_halo_ratio,
+                sideoverlap_capacitance=self.compiled_tech.side_overlap_caps[self.inside_layer_index,
+                                                                             outside_layer_indices]
+            )
 
-            # "cfrac" is the fractional portion of the fringe cap seen
-            # by tile tp along its length.  This is independent of the
-            # portion of the boundary length that tile tp occupies.
-            cfrac = cfar - cnear
+            # TODO: configurable threshold, but keeping accumulation might also be nice
+            counted = caps_femto > 0.0001
 
-            cap_femto = (cfrac * edge_interval_length_um *
-                         sideoverlap_cap_spec.capacitance / 1000.0)
+            # NOTE: tiled extraction, the threshold applies to the whole interval
+            #       (like untiled), but only the part owned by the tile is counted
+            caps_femto = np.where(counted_interval_lengths != edge_interval_lengths,
+                                  caps_femto * counted_interval_lengths / edge_interval_lengths,
+                                  caps_femto)
+            counted_interval_lengths_um = counted_interval_lengths * self.dbu
 
-            return cap_femto
+            counted_indices = np.flatnonzero(counted)
+            if len(counted_indices) == 0:
+                return
+
+            # NOTE: like the BulkSidewallExtractor, the contributions are summed up
+            #       per (outside layer, net pair), instead of adding them one by one
+            net_pairs = list(self.fringe_net_pair_index_by_names.keys())
+            net_pair_indices = np.frombuffer(records.net_pair_indices, dtype=np.int64)
+            group_ids = outside_layer_indices[counted_indices] * len(net_pairs) + net_pair_indices[counted_indices]
+            group_ids, first_indices, groups = np.unique(group_ids, return_index=True, return_inverse=True)
+
+            # NOTE: order the groups by their first contribution, so the keys are added
+            #       in the same order as when adding the contributions one by one
+            order = np.argsort(first_indices)
+            group_ids = group_ids[order]
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            groups = rank[groups.reshape(-1)]
+
+            num_groups = len(group_ids)
+            counted_caps_femto = caps_femto[counted_indices]
+            cap_by_group = np.bincount(groups, weights=counted_caps_femto, minlength=num_groups)
+            count_by_group = np.bincount(groups, minlength=num_groups)
+            length_by_group = np.bincount(groups, weights=counted_interval_lengths_um[counted_indices],
+                                          minlength=num_groups)
+            min_by_group = np.full(num_groups, math.inf)
+            np.minimum.at(min_by_group, groups, counted_caps_femto)
+            max_by_group = np.full(num_groups, -math.inf)
+            np.maximum.at(max_by_group, groups, counted_caps_femto)
+
+            inside_layer_name = self.inside_layer_name
+            keys: List[SideOverlapKey] = []
+            for group_index, group_id in enumerate(group_ids.tolist()):
+                outside_layer_index, net_pair_index = divmod(group_id, len(net_pairs))
+                outside_layer_name = self.all_layer_names[outside_layer_index]
+                inside_net_name, outside_net_name = net_pairs[net_pair_index]
+                cap_femto = float(cap_by_group[group_index])
+                count = int(count_by_group[group_index])
+
+                side_overlap_log("(Side Overlap) %s(%s)-%s(%s): %.5f fF, edge interval length = %.2f µm",
+                                 inside_layer_name, inside_net_name, outside_layer_name, outside_net_name,
+                                 cap_femto, length_by_group[group_index])
+
+                sok = SideOverlapKey(layer_inside=inside_layer_name,
+                                     net_inside=inside_net_name,
+                                     layer_outside=outside_layer_name,
+                                     net_outside=outside_net_name)
+                keys.append(sok)
+
+                if not self.results.keep_details:
+                    self.results.add_sideoverlap_statistics(
+                        key=sok,
+                        statistics=CapacitanceStatistics(total=cap_femto,
+                                                         count=count,
+                                                         min=float(min_by_group[group_index]),
+                                                         max=float(max_by_group[group_index]))
+                    )
+
+                if self.report.level in (ReportLevel.NET_PAIRS, ReportLevel.LAYER_PAIRS):
+                    self.report.output_sideoverlap(sideoverlap_cap=SideOverlapCap(key=sok, cap_value=cap_femto),
+                                                   inside_edge=None,
+                                                   outside_polygon=None,
+                                                   lateral_shield=None,
+                                                   contribution_count=count)
+
+            # NOTE: single contributions are only needed for the details and the full report
+            if not (self.results.keep_details or self.report_shapes):
+                return
+
+            for group_index, idx in zip(groups.tolist(), counted_indices.tolist()):
+                soc = SideOverlapCap(key=keys[group_index], cap_value=float(caps_femto[idx]))
+                if self.results.keep_details:
+                    self.results.add_sideoverlap_cap(soc)
+
+                if self.report_shapes:
+                    geometry_restorer, counted_interval, p, lateral_shield = records.report_infos[idx]
+                    self.report.output_sideoverlap(
+                        sideoverlap_cap=soc,
+                        inside_edge=geometry_restorer.restore_edge_interval(counted_interval),
+                        outside_polygon=geometry_restorer.restore_polygon(p),
+                        lateral_shield=geometry_restorer.restore_polygon(lateral_shield) \
+                                       if lateral_shield is not None else None
+                    )
 
         def emit_fringe(self,
                         inside_layer_name: LayerName,
-                        outside_layer_name: LayerName,
+                        outside_layer_index: int,
                         edge: kdb.EdgeWithProperties,
                         edge_interval: EdgeInterval,
+                        counted_interval: EdgeInterval,
                         outside_polygons: List[kdb.PolygonWithProperties],
-                        shield: kdb.Region,
+                        shield: Optional[kdb.Region],
+                        shield_intervals: Optional[List[YInterval]],
                         lateral_shield: kdb.Polygon,
                         geometry_restorer: GeometryRestorer):
+            outside_layer_name = self.all_layer_names[outside_layer_index]
+
             inside_net_name = self.tech_info.internal_substrate_layer_name \
                 if inside_layer_name == self.tech_info.internal_substrate_layer_name \
                 else edge.property('net')
@@ -376,16 +669,6 @@ class SidewallAndFringeExtractor:
                 for outside_net_name in outside_net_names
             ]
 
-            # NOTE: overlap_cap_by_layer_names is top/bot (dict is not symmetric)
-            overlap_cap_spec = self.tech_info.overlap_cap_by_layer_names[inside_layer_name].get(outside_layer_name,
-                                                                                                None)
-            if not overlap_cap_spec:
-                overlap_cap_spec = self.tech_info.overlap_cap_by_layer_names[outside_layer_name][inside_layer_name]
-
-            substrate_cap_spec = self.tech_info.substrate_cap_by_layer_name[inside_layer_name]
-            sideoverlap_cap_spec = self.tech_info.side_overlap_cap_by_layer_names[inside_layer_name][
-                outside_layer_name]
-
             polygons_by_net: Dict[NetName, List[kdb.PolygonWithProperties]] = defaultdict(list)
 
             for idx, p in enumerate(outside_polygons):
@@ -396,7 +679,20 @@ class SidewallAndFringeExtractor:
                     # TODO: log?
                     continue
 
-                if shield.is_empty():
+                if is_extracted_elsewhere(edge.property(INSTANCE_PROPERTY), p.property(INSTANCE_PROPERTY)):
+                    continue  # extracted for the cell or on the parent level (hierarchical mode)
+
+                if shield_intervals is not None:  # 1-D shielding, p is a box spanning the edge interval
+                    if not shield_intervals:
+                        polygons_by_net[outside_net].append(p)
+                        continue
+
+                    bbox = p.bbox()
+                    for y_near, y_far in unshielded_intervals(bbox.bottom, bbox.top, shield_intervals):
+                        up = kdb.PolygonWithProperties(kdb.Polygon(kdb.Box(bbox.left, y_near, bbox.right, y_far)),
+                                                       {'net': outside_net})
+                        polygons_by_net[outside_net].append(up)
+                elif shield.is_empty():
                     polygons_by_net[outside_net].append(p)
                 else:
                     unshielded_region = kdb.Region(p)
@@ -435,32 +731,15 @@ class SidewallAndFringeExtractor:
                     if distance_far == distance_near:
                         return
 
-                    edge_interval_length = edge_interval[1] - edge_interval[0]
-                    edge_interval_length_um = edge_interval_length * self.dbu
-
-                    cap_femto = self.fringe_cap(edge_interval_length=edge_interval_length,
-                                                distance_near=distance_near,
-                                                distance_far=distance_far,
-                                                overlap_cap_spec=overlap_cap_spec,
-                                                sideoverlap_cap_spec=sideoverlap_cap_spec)
-
-                    if cap_femto > 0.0001:  # TODO: configurable threshold, but keeping accumulation might also be nice
-                        info(f"(Side Overlap) "
-                             f"{inside_layer_name}({inside_net_name})-{outside_layer_name}({outside_net_name}): "
-                             f"{round(cap_femto, 5)} fF, "
-                             f"edge interval length = {round(edge_interval_length_um, 2)} µm")
-
-                        sok = SideOverlapKey(layer_inside=inside_layer_name,
-                                             net_inside=inside_net_name,
-                                             layer_outside=outside_layer_name,
-                                             net_outside=outside_net_name)
-                        soc = SideOverlapCap(key=sok, cap_value=cap_femto)
-                        self.results.add_sideoverlap_cap(soc)
-
-                        self.report.output_sideoverlap(
-                            sideoverlap_cap=soc,
-                            inside_edge=geometry_restorer.restore_edge_interval(edge_interval),
-                            outside_polygon=geometry_restorer.restore_polygon(p),
-                            lateral_shield=geometry_restorer.restore_polygon(lateral_shield) \
-                                           if lateral_shield is not None else None
-                        )
+                    records = self.fringe_records
+                    records.outside_layer_indices.append(outside_layer_index)
+                    records.net_pair_indices.append(self.fringe_net_pair_index(inside_net_name, outside_net_name))
+                    records.distances_near.append(distance_near)
+                    records.distances_far.append(distance_far)
+                    records.edge_interval_lengths.append(edge_interval[1] - edge_interval[0])
+                    records.counted_interval_lengths.append(counted_interval[1] - counted_interval[0])
+                    if self.report_shapes:
+                        records.report_infos.append((geometry_restorer, counted_interval, p, lateral_shield))
+
+                    if len(records) >= self.FRINGE_BATCH_SIZE:
+                        self.flush_fringes()
@@ -22,12 +22,17 @@
 # --------------------------------------------------------------------------------
 #
 
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from enum import StrEnum
 from functools import cached_property
 
 import klayout.rdb as rdb
 import klayout.db as kdb
 
 from .extraction_results import *
+from .rdb_writer import StreamingReportDatabase
 from .types import EdgeNeighborhood, LayerName
 from klayout_pex.rcx25.c.geometry_restorer import GeometryRestorer
 from klayout_pex.klayout.shapes_pb2_converter import ShapesConverter
@@ -43,16 +48,85 @@ import klayout_pex_protobuf.kpex.result.pex_result_pb2 as pex_result_pb2
 
 VarShapes = kdb.Shapes | kdb.Region | List[kdb.Edge] | List[kdb.Polygon | kdb.Box]
 
+CategoryPath = Tuple[str, ...]  # names of the nested categories
+
+
+class ReportLevel(StrEnum):
+    """
+    Detail of the reported capacitance contributions
+    """
+    OFF = 'off'                  # no capacitance contributions
+    NET_PAIRS = 'net_pairs'      # totals per net pair
+    LAYER_PAIRS = 'layer_pairs'  # totals per layer pair and net pair
+    FULL = 'full'                # every single contribution, including its shapes
+    DEFAULT = FULL
+
+
+@dataclass
+class ReportTotals:
+    """
+    Totals which are written once the report is complete,
+    kept separately so that the totals of partial reports (e.g. of worker processes) can be merged
+    """
+    # NOTE: (total capacitance in fF, number of contributions) per summary category
+    capacitances: Dict[CategoryPath, List[float | int]] = field(default_factory=dict)
+    omitted_item_counts: Dict[CategoryPath, int] = field(default_factory=lambda: defaultdict(int))
+
+    def add_capacitance(self, category_path: CategoryPath, cap_value: float, count: int = 1):
+        total = self.capacitances.get(category_path, None)
+        if total is None:
+            self.capacitances[category_path] = [cap_value, count]
+        else:
+            total[0] += cap_value
+            total[1] += count
+
+    def merge(self, other: ReportTotals):
+        for category_path, (cap_value, count) in other.capacitances.items():
+            total = self.capacitances.get(category_path, None)
+            if total is None:
+                self.capacitances[category_path] = [cap_value, count]
+            else:
+                total[0] += cap_value
+                total[1] += count
+        for category_path, count in other.omitted_item_counts.items():
+            self.omitted_item_counts[category_path] += count
+
 
 class ExtractionReporter:
+    """
+    Report database (RDB) of the extraction, e.g. for the KLayout marker browser
+
+    The capacitance contributions are reported depending on the level (see ReportLevel).
+    At the full level, the number of items per category can be capped,
+    and the items can be deferred, i.e. buffered and only added to the RDB when saving,
+    so that the extraction callbacks are not slowed down by building the RDB.
+
+    When streaming, the items are written to a file as they are created,
+    instead of building the RDB in memory (see StreamingReportDatabase).
+    """
+
     def __init__(self,
                  cell_name: str,
-                 dbu: float):
-        self.report = rdb.ReportDatabase(f"PEX {cell_name}")
+                 dbu: float,
+                 level: ReportLevel = ReportLevel.DEFAULT,
+                 max_items_per_category: Optional[int] = None,
+                 deferred: bool = False,
+                 streaming: bool = False):
+        self.streaming = streaming
+        if streaming:
+            self.report = StreamingReportDatabase(f"PEX {cell_name}")
+        else:
+            self.report = rdb.ReportDatabase(f"PEX {cell_name}")
         self.cell = self.report.create_cell(cell_name)
         self.dbu = dbu
         self.dbu_trans = kdb.CplxTrans(mag=dbu)
+        self.level = level
+        self.max_items_per_category = max_items_per_category
+        self.deferred = deferred
         self.category_name_counter: Dict[str, int] = defaultdict(int)
+        self.item_counts: Dict[CategoryPath, int] = defaultdict(int)
+        self.deferred_outputs: List[Tuple[Callable[..., None], Tuple[Any, ...]]] = []
+        self.totals = ReportTotals()
         self.shapes_converter = ShapesConverter(dbu=dbu)
 
     @cached_property
@@ -123,9 +197,94 @@ class ExtractionReporter:
     def cat_edge_neighborhood(self) -> rdb.RdbCategory:
         return self.report.create_category("[C] Edge Neighborhood Visitor")
 
-    def save(self, path: str):
+    def save(self, path: str, with_totals: bool = True):
+        """
+        :param with_totals: False for partial reports, the totals are merged separately (see merge)
+        """
+        self.flush_deferred_outputs()
+        if with_totals:
+            self.output_totals()
         self.report.save(path)
 
+    def merge(self, path: str, totals: Optional[ReportTotals] = None):
+        """
+        Merges a report saved by another reporter of the same cell (e.g. of a worker process)
+        """
+        if self.streaming:
+            self.report.merge_file(path)
+        else:
+            other = rdb.ReportDatabase()
+            other.load(path)
+            self.report.merge(other)
+        if totals is not None:
+            self.totals.merge(totals)
+
+    def category(self, category_path: CategoryPath) -> rdb.RdbCategory:
+        category = None
+        for name in category_path:
+            category = self.report.create_category(name) if category is None \
+                       else self.report.create_category(category, name)
+        return category
+
+    def next_item_number(self, category_path: CategoryPath) -> Optional[int]:
+        """
+        :return: the number of the next item in the category,
+                 or None if the category is full (see max_items_per_category)
+        """
+        count = self.item_counts[category_path] + 1
+        if self.max_items_per_category is not None and count > self.max_items_per_category:
+            self.totals.omitted_item_counts[category_path] += 1
+            return None
+        self.item_counts[category_path] = count
+        return count
+
+    @classmethod
+    def detached(cls, value: Any) -> Any:
+        """
+        :return: a copy of the KLayout objects, as the objects passed to the
+                 neighborhood visitor callbacks are only valid during the callback
+        """
+        if isinstance(value, (list, tuple)):
+            return [cls.detached(v) for v in value]
+        if isinstance(value, dict):
+            return {k: cls.detached(v) for k, v in value.items()}
+        if hasattr(value, 'dup'):
+            return value.dup()
+        return value
+
+    def output_item(self, output: Callable[..., None], *args):
+        if self.deferred:
+            self.deferred_outputs.append((output, tuple(self.detached(a) for a in args)))
+        else:
+            output(*args)
+
+    def flush_deferred_outputs(self):
+        deferred_outputs = self.deferred_outputs
+        self.deferred_outputs = []
+        for output, args in deferred_outputs:
+            output(*args)
+
+    def output_totals(self):
+        for category_path, (cap_value, count) in sorted(self.totals.capacitances.items()):
+            self.category((*category_path[:-1],
+                           f"{category_path[-1]}: {round(cap_value, 3)} fF ({count} contributions)"))
+        for category_path, count in sorted(self.totals.omitted_item_counts.items()):
+            self.category((*category_path, f"… {count} more, omitted (limit {self.max_items_per_category})"))
+        self.totals = ReportTotals()
+
+    def capacitance_category_path(self,
+                                  category_name: str,
+                                  layer_names: CategoryPath,
+                                  net_pair_name: str) -> CategoryPath:
+        """
+        :return: the category of a capacitance contribution, depending on the level
+        """
+        match self.level:
+            case ReportLevel.NET_PAIRS:
+                return category_name, net_pair_name
+            case _:
+                return category_name, *layer_names, net_pair_name
+
     def output_shapes(self,
                       parent_category: rdb.RdbCategory,
                       category_name: str,
@@ -139,41 +298,84 @@ class ExtractionReporter:
 
     def output_overlap(self,
                        overlap_cap: OverlapCap,
-                       bottom_polygon: kdb.PolygonWithProperties,
-                       top_polygon: kdb.PolygonWithProperties,
+                       bottom_polygon: Optional[kdb.PolygonWithProperties],
+                       top_polygon: Optional[kdb.PolygonWithProperties],
                        overlap_area: kdb.Region):
-        cat_overlap_top_layer = self.report.create_category(self.cat_overlap,
-                                                            f"top_layer={overlap_cap.key.layer_top}")
-        cat_overlap_bot_layer = self.report.create_category(cat_overlap_top_layer,
-                                                            f'bot_layer={overlap_cap.key.layer_bot}')
-        cat_overlap_nets = self.report.create_category(cat_overlap_bot_layer,
-                                                       f'{overlap_cap.key.net_top} – {overlap_cap.key.net_bot}')
-        self.category_name_counter[cat_overlap_nets.path()] += 1
-        cat_overlap_cap = self.report.create_category(
-            cat_overlap_nets,
-            f"#{self.category_name_counter[cat_overlap_nets.path()]} "
-            f"{round(overlap_cap.cap_value, 3)} fF",
-        )
-
-        self.output_shapes(cat_overlap_cap, "Top Polygon", [top_polygon])
-        self.output_shapes(cat_overlap_cap, "Bottom Polygon", [bottom_polygon])
+        key = overlap_cap.key
+        match self.level:
+            case ReportLevel.OFF:
+                return
+            case ReportLevel.NET_PAIRS | ReportLevel.LAYER_PAIRS:
+                category_path = self.capacitance_category_path(
+                    category_name=self.cat_overlap.name(),
+                    layer_names=(f"top_layer={key.layer_top}", f'bot_layer={key.layer_bot}'),
+                    net_pair_name=f'{key.net_top} – {key.net_bot}'
+                )
+                self.totals.add_capacitance(category_path, overlap_cap.cap_value)
+                return
+
+        category_path = (self.cat_overlap.name(),
+                         f"top_layer={key.layer_top}",
+                         f'bot_layer={key.layer_bot}',
+                         f'{key.net_top} – {key.net_bot}')
+        item_number = self.next_item_number(category_path)
+        if item_number is None:
+            return
+        self.output_item(self._output_overlap, category_path, item_number,
+                         overlap_cap, bottom_polygon, top_polygon, overlap_area)
+
+    def _output_overlap(self,
+                        category_path: CategoryPath,
+                        item_number: int,
+                        overlap_cap: OverlapCap,
+                        bottom_polygon: Optional[kdb.PolygonWithProperties],
+                        top_polygon: Optional[kdb.PolygonWithProperties],
+                        overlap_area: kdb.Region):
+        cat_overlap_cap = self.category((*category_path, f"#{item_number} {round(overlap_cap.cap_value, 3)} fF"))
+
+        if top_polygon is not None:
+            self.output_shapes(cat_overlap_cap, "Top Polygon", [top_polygon])
+        if bottom_polygon is not None:
+            self.output_shapes(cat_overlap_cap, "Bottom Polygon", [bottom_polygon])
         self.output_shapes(cat_overlap_cap, "Overlap Area", overlap_area)
 
     def output_sidewall(self,
                         sidewall_cap: SidewallCap,
-                        inside_edge: kdb.Edge,
-                        outside_edge: kdb.Edge):
-        cat_sidewall_layer = self.report.create_category(self.cat_sidewall,
-                                                         f"layer={sidewall_cap.key.layer}")
-        cat_sidewall_net_inside = self.report.create_category(cat_sidewall_layer,
-                                                              f'inside={sidewall_cap.key.net1}')
-        cat_sidewall_net_outside = self.report.create_category(cat_sidewall_net_inside,
-                                                               f'outside={sidewall_cap.key.net2}')
-        self.category_name_counter[cat_sidewall_net_outside.path()] += 1
-
+                        inside_edge: Optional[kdb.Edge],
+                        outside_edge: Optional[kdb.Edge]):
+        """
+        NOTE: the shapes are only required at the full level
+        """
+        match self.level:
+            case ReportLevel.OFF:
+                return
+            case ReportLevel.NET_PAIRS | ReportLevel.LAYER_PAIRS:
+                category_path = self.capacitance_category_path(
+                    category_name=self.cat_sidewall.name(),
+                    layer_names=(f"layer={sidewall_cap.key.layer}",),
+                    net_pair_name=f'{sidewall_cap.key.net1} – {sidewall_cap.key.net2}'
+                )
+                self.totals.add_capacitance(category_path, sidewall_cap.cap_value)
+                return
+
+        category_path = (self.cat_sidewall.name(),
+                         f"layer={sidewall_cap.key.layer}",
+                         f'inside={sidewall_cap.key.net1}',
+                         f'outside={sidewall_cap.key.net2}')
+        item_number = self.next_item_number(category_path)
+        if item_number is None:
+            return
+        self.output_item(self._output_sidewall, category_path, item_number, sidewall_cap, inside_edge, outside_edge)
+
+    def _output_sidewall(self,
+                         category_path: CategoryPath,
+                         item_number: int,
+                         sidewall_cap: SidewallCap,
+                         inside_edge: kdb.Edge,
+                         outside_edge: kdb.Edge):
         self.output_shapes(
-            cat_sidewall_net_outside,
-            f"#{self.category_name_counter[cat_sidewall_net_outside.path()]}: "
+            self.category(category_path),
+            f"#{item_number}: "
             f"len {sidewall_cap.length} µm, "
             f"distance {sidewall_cap.distance} µm, "
             f"{round(sidewall_cap.cap_value, 3)} fF",
@@ -182,24 +384,52 @@ class ExtractionReporter:
 
     def output_sideoverlap(self,
                            sideoverlap_cap: SideOverlapCap,
-                           inside_edge: kdb.Edge,
-                           outside_polygon: kdb.Polygon,
-                           lateral_shield: Optional[kdb.Region]):
-        cat_sideoverlap_layer_inside = self.report.create_category(self.cat_fringe,
-                                                                   f"inside_layer={sideoverlap_cap.key.layer_inside}")
-        cat_sideoverlap_net_inside = self.report.create_category(cat_sideoverlap_layer_inside,
-                                                                 f'inside_net={sideoverlap_cap.key.net_inside}')
-        cat_sideoverlap_layer_outside = self.report.create_category(cat_sideoverlap_net_inside,
-                                                                    f'outside_layer={sideoverlap_cap.key.layer_outside}')
-        cat_sideoverlap_net_outside = self.report.create_category(cat_sideoverlap_layer_outside,
-                                                                  f'outside_net={sideoverlap_cap.key.net_outside}')
-        self.category_name_counter[cat_sideoverlap_net_outside.path()] += 1
-
-        cat_sideoverlap_cap = self.report.create_category(
-            cat_sideoverlap_net_outside,
-            f"#{self.category_name_counter[cat_sideoverlap_net_outside.path()]}: "
-            f"{round(sideoverlap_cap.cap_value, 3)} fF"
-        )
+                           inside_edge: Optional[kdb.Edge],
+                           outside_polygon: Optional[kdb.Polygon],
+                           lateral_shield: Optional[kdb.Region],
+                           contribution_count: int = 1):
+        """
+        NOTE: the shapes are only required at the full level
+
+        :param contribution_count: number of contributions summed up in sideoverlap_cap
+                                   (only allowed below the full level)
+        """
+        key = sideoverlap_cap.key
+        match self.level:
+            case ReportLevel.OFF:
+                return
+            case ReportLevel.NET_PAIRS | ReportLevel.LAYER_PAIRS:
+                category_path = self.capacitance_category_path(
+                    category_name=self.cat_fringe.name(),
+                    layer_names=(f"inside_layer={key.layer_inside}", f'outside_layer={key.layer_outside}'),
+                    net_pair_name=f'{key.net_inside} – {key.net_outside}'
+                )
+                self.totals.add_capacitance(category_path, sideoverlap_cap.cap_value, contribution_count)
+                return
+
+        if contribution_count != 1:
+            raise ValueError("The full report requires the single contributions")
+
+        category_path = (self.cat_fringe.name(),
+                         f"inside_layer={key.layer_inside}",
+                         f'inside_net={key.net_inside}',
+                         f'outside_layer={key.layer_outside}',
+                         f'outside_net={key.net_outside}')
+        item_number = self.next_item_number(category_path)
+        if item_number is None:
+            return
+        self.output_item(self._output_sideoverlap, category_path, item_number,
+                         sideoverlap_cap, inside_edge, outside_polygon, lateral_shield)
+
+    def _output_sideoverlap(self,
+                            category_path: CategoryPath,
+                            item_number: int,
+                            sideoverlap_cap: SideOverlapCap,
+                            inside_edge: kdb.Edge,
+                            outside_polygon: kdb.Polygon,
+                            lateral_shield: Optional[kdb.Region]):
+        cat_sideoverlap_cap = self.category((*category_path, f"#{item_number}: "
+                                                             f"{round(sideoverlap_cap.cap_value, 3)} fF"))
 
         self.output_shapes(cat_sideoverlap_cap, 'Inside Edge', inside_edge)
 
@@ -217,26 +447,38 @@ class ExtractionReporter:
                                  edge: kdb.EdgeWithProperties,
                                  neighborhood: EdgeNeighborhood,
                                  geometry_restorer: GeometryRestorer):
-        cat_en_layer_inside = self.report.create_category(self.cat_edge_neighborhood, f"inside_layer={inside_layer}")
-        inside_net = edge.property('net')
-        cat_en_net_inside = self.report.create_category(cat_en_layer_inside, f'inside_net={inside_net}')
+        if self.level != ReportLevel.FULL:
+            return
 
+        inside_net = edge.property('net')
         for edge_interval, polygons_by_child in neighborhood:
-            cat_en_edge_interval = self.report.create_category(cat_en_net_inside, f"Edge Interval: {edge_interval}")
-            self.category_name_counter[cat_en_edge_interval.path()] += 1
-            cat_en_edge = self.report.create_category(
-                cat_en_edge_interval,
-                f"#{self.category_name_counter[cat_en_edge_interval.path()]}"
+            category_path = (self.cat_edge_neighborhood.name(),
+                             f"inside_layer={inside_layer}",
+                             f'inside_net={inside_net}',
+                             f"Edge Interval: {edge_interval}")
+            item_number = self.next_item_number(category_path)
+            if item_number is None:
+                continue
+            self.output_item(self._output_edge_neighborhood_interval, category_path, item_number,
+                             all_layer_names, edge, polygons_by_child, geometry_restorer)
+
+    def _output_edge_neighborhood_interval(self,
+                                           category_path: CategoryPath,
+                                           item_number: int,
+                                           all_layer_names: List[LayerName],
+                                           edge: kdb.EdgeWithProperties,
+                                           polygons_by_child: Dict[int, List[kdb.PolygonWithProperties]],
+                                           geometry_restorer: GeometryRestorer):
+        cat_en_edge = self.category((*category_path, f"#{item_number}"))
+        self.output_shapes(cat_en_edge, "Edge", [edge])  # geometry_restorer.restore_edge(edge))
+
+        for child_index, polygons in polygons_by_child.items():
+            self.output_shapes(
+                cat_en_edge,
+                f"Child {child_index}: "
+                f"{child_index < len(all_layer_names) and all_layer_names[child_index] or 'None'}",
+                [geometry_restorer.restore_polygon(p) for p in polygons]
             )
-            self.output_shapes(cat_en_edge, "Edge", [edge])  # geometry_restorer.restore_edge(edge))
-
-            for child_index, polygons in polygons_by_child.items():
-                self.output_shapes(
-                    cat_en_edge,
-                    f"Child {child_index}: "
-                    f"{child_index < len(all_layer_names) and all_layer_names[child_index] or 'None'}",
-                    [geometry_restorer.restore_polygon(p) for p in polygons]
-                )
 
     def output_devices(self,
                        devices: List[device_pb2.Device]):
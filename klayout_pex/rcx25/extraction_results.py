@@ -22,14 +22,17 @@
 # --------------------------------------------------------------------------------
 #
 from __future__ import annotations
+import array
 from collections import defaultdict
 from dataclasses import dataclass, field
+from enum import StrEnum
+import math
+from types import MappingProxyType
 from typing import *
 
 from .types import NetName, LayerName, CellName
 from ..log import error
 
-import klayout_pex_protobuf.kpex.r.r_network_pb2 as r_network_pb2
 import klayout_pex_protobuf.kpex.result.pex_result_pb2 as pex_result_pb2
 import klayout_pex_protobuf.kpex.tech.process_parasitics_pb2 as process_parasitics_pb2
 
@@ -136,8 +139,8 @@ class NetCoupleKey:
 
 @dataclass
 class ExtractionSummary:
-    capacitances: Dict[NetCoupleKey, float]
-    resistances: Dict[NetCoupleKey, float]
+    capacitances: Mapping[NetCoupleKey, float]
+    resistances: Mapping[NetCoupleKey, float]
 
     @classmethod
     def merged(cls, summaries: List[ExtractionSummary]) -> ExtractionSummary:
@@ -152,65 +155,314 @@ class ExtractionSummary:
                                  resistances=merged_resistances)
 
 
+class NameTable:
+    """
+    Interned names (e.g. net or layer names), each name is assigned a small integer ID
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.id_by_name: Dict[str, int] = {}
+
+    def id(self, name: str) -> int:
+        name_id = self.id_by_name.get(name, None)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self.id_by_name[name] = name_id
+        return name_id
+
+    def __getitem__(self, name_id: int) -> str:
+        return self.names[name_id]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+KeyIDs = Tuple[int, ...]  # key of interned IDs (see NameTable)
+
+
+@dataclass
+class CapacitanceStatistics:
+    total: float = 0.0  # femto farad
+    count: int = 0
+    min: float = math.inf  # femto farad
+    max: float = -math.inf  # femto farad
+
+
+class CapacitanceAccumulator:
+    """
+    Array-backed sum and count (and optionally min/max) of the capacitance contributions per key,
+    the memory grows with the number of keys, not with the number of contributions
+    """
+
+    def __init__(self, track_min_max: bool = True):
+        self.track_min_max = track_min_max
+        self.row_by_key: Dict[KeyIDs, int] = {}
+        self.totals = array.array('d')
+        self.counts = array.array('q')
+        self.mins = array.array('d')
+        self.maxs = array.array('d')
+
+    def __len__(self) -> int:
+        return len(self.row_by_key)
+
+    def row(self, key: KeyIDs) -> int:
+        row = self.row_by_key.get(key, None)
+        if row is None:
+            row = len(self.row_by_key)
+            self.row_by_key[key] = row
+            self.totals.append(0.0)
+            self.counts.append(0)
+            if self.track_min_max:
+                self.mins.append(math.inf)
+                self.maxs.append(-math.inf)
+        return row
+
+    def add(self, key: KeyIDs, cap_value: float):
+        row = self.row(key)
+        self.totals[row] += cap_value
+        self.counts[row] += 1
+        if self.track_min_max:
+            if cap_value < self.mins[row]:
+                self.mins[row] = cap_value
+            if cap_value > self.maxs[row]:
+                self.maxs[row] = cap_value
+
+    def add_statistics(self, key: KeyIDs, statistics: CapacitanceStatistics):
+        row = self.row(key)
+        self.totals[row] += statistics.total
+        self.counts[row] += statistics.count
+        if self.track_min_max:
+            self.mins[row] = min(self.mins[row], statistics.min)
+            self.maxs[row] = max(self.maxs[row], statistics.max)
+
+    def statistics(self, row: int) -> CapacitanceStatistics:
+        if self.track_min_max:
+            return CapacitanceStatistics(total=self.totals[row], count=self.counts[row],
+                                         min=self.mins[row], max=self.maxs[row])
+        return CapacitanceStatistics(total=self.totals[row], count=self.counts[row])
+
+    def items(self) -> Iterator[Tuple[KeyIDs, CapacitanceStatistics]]:
+        for key, row in self.row_by_key.items():
+            yield key, self.statistics(row)
+
+
+class ResultsMode(StrEnum):
+    """
+    What is kept of the capacitance contributions
+    """
+    DETAILS = 'details'        # each contribution (and the accumulated statistics per net/layer key)
+    STATISTICS = 'statistics'  # the accumulated statistics per net/layer key
+    SUMMARY = 'summary'        # only the totals per net pair (i.e. what goes into the netlist)
+    DEFAULT = DETAILS
+
+
 @dataclass
 class CellExtractionResults:
+    """
+    Capacitance contributions of a cell.
+
+    Depending on the mode, the contributions are
+        - DETAILS: kept (*_table) and accumulated per key (interned net and layer IDs)
+        - STATISTICS: accumulated per key (interned net and layer IDs)
+        - SUMMARY: only accumulated per normalized net pair
+
+    In all modes, the totals per normalized net pair (net_couple_totals, net_couple_resistances)
+    are maintained while adding the contributions, so summarize() is cheap.
+    """
     cell_name: CellName
+    mode: ResultsMode = ResultsMode.DEFAULT
 
     overlap_table: Dict[OverlapKey, List[OverlapCap]] = field(default_factory=lambda: defaultdict(list))
     sidewall_table: Dict[SidewallKey, List[SidewallCap]] = field(default_factory=lambda: defaultdict(list))
     sideoverlap_table: Dict[SideOverlapKey, List[SideOverlapCap]] = field(default_factory=lambda: defaultdict(list))
 
+    net_names: NameTable = field(default_factory=NameTable)
+    layer_names: NameTable = field(default_factory=NameTable)
+
+    # key: layer_top, net_top, layer_bot, net_bot
+    overlap_accumulator: CapacitanceAccumulator = field(default_factory=CapacitanceAccumulator)
+    # key: layer, net1, net2
+    sidewall_accumulator: CapacitanceAccumulator = field(default_factory=CapacitanceAccumulator)
+    # key: layer_inside, net_inside, layer_outside, net_outside
+    sideoverlap_accumulator: CapacitanceAccumulator = field(default_factory=CapacitanceAccumulator)
+
+    net_couple_totals: Dict[NetCoupleKey, float] = field(default_factory=lambda: defaultdict(float))
+    net_couple_resistances: Dict[NetCoupleKey, float] = field(default_factory=lambda: defaultdict(float))
+
+    # NOTE: use set_r_extraction_result(), which also sums up the resistances per net pair
     r_extraction_result: pex_result_pb2.RExtractionResult = field(default_factory=lambda: pex_result_pb2.RExtractionResult())
 
+    _net_couple_keys: Dict[Tuple[NetName, NetName], NetCoupleKey] = field(default_factory=dict,
+                                                                           repr=False, compare=False)
+
+    @property
+    def keep_details(self) -> bool:
+        return self.mode == ResultsMode.DETAILS
+
+    @property
+    def summary_only(self) -> bool:
+        return self.mode == ResultsMode.SUMMARY
+
+    def overlap_key_ids(self, key: OverlapKey) -> KeyIDs:
+        return (self.layer_names.id(key.layer_top), self.net_names.id(key.net_top),
+                self.layer_names.id(key.layer_bot), self.net_names.id(key.net_bot))
+
+    def sidewall_key_ids(self, key: SidewallKey) -> KeyIDs:
+        return self.layer_names.id(key.layer), self.net_names.id(key.net1), self.net_names.id(key.net2)
+
+    def sideoverlap_key_ids(self, key: SideOverlapKey) -> KeyIDs:
+        return (self.layer_names.id(key.layer_inside), self.net_names.id(key.net_inside),
+                self.layer_names.id(key.layer_outside), self.net_names.id(key.net_outside))
+
+    def net_couple_key(self, net1: NetName, net2: NetName) -> NetCoupleKey:
+        """
+        :return: the normalized net pair key (cached)
+        """
+        key = self._net_couple_keys.get((net1, net2), None)
+        if key is None:
+            key = NetCoupleKey(net1, net2).normed()
+            self._net_couple_keys[net1, net2] = key
+        return key
+
+    def add_net_couple_cap(self, key: NetCoupleKey, cap_value: float):
+        """
+        Adds to the total of the net pair (SUMMARY mode only)
+        """
+        if not self.summary_only:
+            raise ValueError("Net pair totals can only be added to summary-only results")
+        self.net_couple_totals[self.net_couple_key(key.net1, key.net2)] += cap_value
+
     def add_overlap_cap(self, cap: OverlapCap):
-        self.overlap_table[cap.key].append(cap)
+        self.net_couple_totals[self.net_couple_key(cap.key.net_bot, cap.key.net_top)] += cap.cap_value
+        if self.summary_only:
+            return
+        self.overlap_accumulator.add(self.overlap_key_ids(cap.key), cap.cap_value)
+        if self.keep_details:
+            self.overlap_table[cap.key].append(cap)
 
     def add_sidewall_cap(self, cap: SidewallCap):
-        self.sidewall_table[cap.key].append(cap)
+        self.net_couple_totals[self.net_couple_key(cap.key.net1, cap.key.net2)] += cap.cap_value
+        if self.summary_only:
+            return
+        self.sidewall_accumulator.add(self.sidewall_key_ids(cap.key), cap.cap_value)
+        if self.keep_details:
+            self.sidewall_table[cap.key].append(cap)
 
     def add_sideoverlap_cap(self, cap: SideOverlapCap):
-        self.sideoverlap_table[cap.key].append(cap)
-
-    def summarize(self) -> ExtractionSummary:
-        normalized_overlap_table: Dict[NetCoupleKey, float] = defaultdict(float)
-        for key, entries in self.overlap_table.items():
-            normalized_key = NetCoupleKey(key.net_bot, key.net_top).normed()
-            normalized_overlap_table[normalized_key] += sum((e.cap_value for e in entries))
-        overlap_summary = ExtractionSummary(capacitances=normalized_overlap_table,
-                                            resistances={})
-
-        normalized_sidewall_table: Dict[NetCoupleKey, float] = defaultdict(float)
-        for key, entries in self.sidewall_table.items():
-            normalized_key = NetCoupleKey(key.net1, key.net2).normed()
-            normalized_sidewall_table[normalized_key] += sum((e.cap_value for e in entries))
-        sidewall_summary = ExtractionSummary(capacitances=normalized_sidewall_table,
-                                             resistances={})
-
-        normalized_sideoverlap_table: Dict[NetCoupleKey, float] = defaultdict(float)
-        for key, entries in self.sideoverlap_table.items():
-            normalized_key = NetCoupleKey(key.net_inside, key.net_outside).normed()
-            normalized_sideoverlap_table[normalized_key] += sum((e.cap_value for e in entries))
-        sideoverlap_summary = ExtractionSummary(capacitances=normalized_sideoverlap_table,
-                                                resistances={})
-
-        normalized_resistance_table: Dict[NetCoupleKey, float] = defaultdict(float)
-
-        for network in self.r_extraction_result.networks:
-            node_by_id: Dict[int, r_network_pb2.RNode] = {n.node_id: n for n in network.nodes}
+        self.net_couple_totals[self.net_couple_key(cap.key.net_inside, cap.key.net_outside)] += cap.cap_value
+        if self.summary_only:
+            return
+        self.sideoverlap_accumulator.add(self.sideoverlap_key_ids(cap.key), cap.cap_value)
+        if self.keep_details:
+            self.sideoverlap_table[cap.key].append(cap)
+
+    def add_overlap_statistics(self, key: OverlapKey, statistics: CapacitanceStatistics):
+        """
+        Adds accumulated contributions (only allowed without details)
+        """
+        if self.keep_details:
+            raise ValueError("Accumulated contributions can only be added to results without details")
+        self.net_couple_totals[self.net_couple_key(key.net_bot, key.net_top)] += statistics.total
+        if self.summary_only:
+            return
+        self.overlap_accumulator.add_statistics(self.overlap_key_ids(key), statistics)
+
+    def add_sidewall_statistics(self, key: SidewallKey, statistics: CapacitanceStatistics):
+        if self.keep_details:
+            raise ValueError("Accumulated contributions can only be added to results without details")
+        self.net_couple_totals[self.net_couple_key(key.net1, key.net2)] += statistics.total
+        if self.summary_only:
+            return
+        self.sidewall_accumulator.add_statistics(self.sidewall_key_ids(key), statistics)
+
+    def add_sideoverlap_statistics(self, key: SideOverlapKey, statistics: CapacitanceStatistics):
+        if self.keep_details:
+            raise ValueError("Accumulated contributions can only be added to results without details")
+        self.net_couple_totals[self.net_couple_key(key.net_inside, key.net_outside)] += statistics.total
+        if self.summary_only:
+            return
+        self.sideoverlap_accumulator.add_statistics(self.sideoverlap_key_ids(key), statistics)
+
+    def set_r_extraction_result(self, result: pex_result_pb2.RExtractionResult):
+        self.r_extraction_result = result
+        self.net_couple_resistances.clear()
+        for network in result.networks:
+            net_name_by_node_id = {n.node_id: n.net_name for n in network.nodes}
             for element in network.elements:
-                node_a = node_by_id[element.node_a.node_id]
-                node_b = node_by_id[element.node_b.node_id]
-                resistance = element.resistance
-                normalized_key = NetCoupleKey(node_a.net_name, node_b.net_name).normed()
-                normalized_resistance_table[normalized_key] += resistance
-                
-        resistance_summary = ExtractionSummary(capacitances={},
-                                               resistances=normalized_resistance_table)
+                key = self.net_couple_key(net_name_by_node_id[element.node_a.node_id],
+                                          net_name_by_node_id[element.node_b.node_id])
+                self.net_couple_resistances[key] += element.resistance
+
+    def overlap_statistics(self) -> Dict[OverlapKey, CapacitanceStatistics]:
+        return {
+            OverlapKey(layer_top=self.layer_names[layer_top], net_top=self.net_names[net_top],
+                       layer_bot=self.layer_names[layer_bot], net_bot=self.net_names[net_bot]): statistics
+            for (layer_top, net_top, layer_bot, net_bot), statistics in self.overlap_accumulator.items()
+        }
+
+    def sidewall_statistics(self) -> Dict[SidewallKey, CapacitanceStatistics]:
+        return {
+            SidewallKey(layer=self.layer_names[layer],
+                        net1=self.net_names[net1], net2=self.net_names[net2]): statistics
+            for (layer, net1, net2), statistics in self.sidewall_accumulator.items()
+        }
+
+    def sideoverlap_statistics(self) -> Dict[SideOverlapKey, CapacitanceStatistics]:
+        return {
+            SideOverlapKey(layer_inside=self.layer_names[layer_inside], net_inside=self.net_names[net_inside],
+                           layer_outside=self.layer_names[layer_outside],
+                           net_outside=self.net_names[net_outside]): statistics
+            for (layer_inside, net_inside, layer_outside, net_outside), statistics
+            in self.sideoverlap_accumulator.items()
+        }
+
+    def merge(self, other: CellExtractionResults):
+        """
+        Appends the capacitance entries of a partial result (e.g. of a single layer pass).
+
+        Merging partial results in the order of the passes yields the same tables
+        (including key and entry order) as running all passes on a single result.
+
+        NOTE: the net pair totals of the partial results are added up,
+              so they may differ from the serial ones in the last digits (rounding)
+        """
+        if self.mode != other.mode:
+            raise ValueError(f"Can't merge results of different modes ({self.mode}, {other.mode})")
+
+        match self.mode:
+            case ResultsMode.DETAILS:
+                for key, entries in other.overlap_table.items():
+                    self.overlap_table[key].extend(entries)
+                    for e in entries:
+                        self.overlap_accumulator.add(self.overlap_key_ids(key), e.cap_value)
+                for key, entries in other.sidewall_table.items():
+                    self.sidewall_table[key].extend(entries)
+                    for e in entries:
+                        self.sidewall_accumulator.add(self.sidewall_key_ids(key), e.cap_value)
+                for key, entries in other.sideoverlap_table.items():
+                    self.sideoverlap_table[key].extend(entries)
+                    for e in entries:
+                        self.sideoverlap_accumulator.add(self.sideoverlap_key_ids(key), e.cap_value)
+            case ResultsMode.STATISTICS:
+                for key, statistics in other.overlap_statistics().items():
+                    self.overlap_accumulator.add_statistics(self.overlap_key_ids(key), statistics)
+                for key, statistics in other.sidewall_statistics().items():
+                    self.sidewall_accumulator.add_statistics(self.sidewall_key_ids(key), statistics)
+                for key, statistics in other.sideoverlap_statistics().items():
+                    self.sideoverlap_accumulator.add_statistics(self.sideoverlap_key_ids(key), statistics)
+
+        for key, total in other.net_couple_totals.items():
+            self.net_couple_totals[key] += total
 
-        return ExtractionSummary.merged([
-            overlap_summary, sidewall_summary, sideoverlap_summary,
-            resistance_summary
-        ])
+    def summarize(self) -> ExtractionSummary:
+        """
+        :return: the totals per normalized net pair
+                 (NOTE: read-only views, not copies, the summary reflects later additions)
+        """
+        return ExtractionSummary(capacitances=MappingProxyType(self.net_couple_totals),
+                                 resistances=MappingProxyType(self.net_couple_resistances))
 
 
 @dataclass
@@ -219,4 +471,6 @@ class ExtractionResults:
 
     def summarize(self) -> ExtractionSummary:
         subsummaries = [s.summarize() for s in self.cell_extraction_results.values()]
+        if len(subsummaries) == 1:
+            return subsummaries[0]  # NOTE: already normalized
         return ExtractionSummary.merged(subsummaries)
@@ -22,8 +22,15 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 # --------------------------------------------------------------------------------
 #
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+import multiprocessing
+import os
+import tempfile
 
 import klayout.db as kdb
+import klayout.rdb as rdb
 
 from ..klayout.lvsdb_extractor import KLayoutExtractionContext, GDSPair
 from ..log import (
@@ -32,12 +39,19 @@ from ..log import (
     error,
     info,
     subproc,
-    rule
+    rule,
+    log_rate_limit_summaries
 )
 from ..tech_info import TechInfo
+from ..util.stage_timer import StageTimer, StageTimerExport, stage, stage_timer, set_stage_timer
 from .extraction_results import *
-from .extraction_reporter import ExtractionReporter
+from .extraction_reporter import ExtractionReporter, ReportLevel, ReportTotals
+from .hierarchy import HierarchicalGeometry, add_instance_results, layer_shapes
 from .pex_mode import PEXMode
+from .tiling import make_tiles
+from klayout_pex.rcx25.c.bulk_overlap_extractor import BulkOverlapExtractor, OverlapEngine
+from klayout_pex.rcx25.c.bulk_sidewall_extractor import BulkSidewallExtractor, SidewallEngine
+from klayout_pex.rcx25.c.compiled_tech import CompiledTech
 from klayout_pex.rcx25.c.overlap_extractor import OverlapExtractor
 from klayout_pex.rcx25.c.sidewall_and_fringe_extractor import SidewallAndFringeExtractor
 from klayout_pex.rcx25.r.r_extractor import RExtractor
@@ -50,6 +64,128 @@ import klayout_pex_protobuf.kpex.klayout.r_extractor_tech_pb2 as rex_tech_pb2
 from klayout_pex_protobuf.kpex.klayout.r_extractor_tech_pb2 import RExtractorTech as pb_RExtractorTech
 
 
+@dataclass
+class CapacitancePassContext:
+    """
+    Everything the capacitance extraction passes need.
+
+    NOTE: KLayout regions can't be pickled, so the context is handed over
+          to the worker processes by forking (see RCX25Extractor.run_capacitance_passes_parallel)
+    """
+    cell_name: str
+    all_layer_names: List[LayerName]
+    layer_regions_by_name: Dict[LayerName, kdb.Region]
+    dbu: float
+    scale_ratio_to_fit_halo: bool
+    tech_info: TechInfo
+    compiled_tech: CompiledTech  # coefficient tables for all_layer_names
+    overlap_engine: OverlapEngine = OverlapEngine.DEFAULT
+    sidewall_engine: SidewallEngine = SidewallEngine.DEFAULT
+    results_mode: ResultsMode = ResultsMode.DEFAULT
+    report_level: ReportLevel = ReportLevel.DEFAULT
+    report_max_items_per_category: Optional[int] = None
+    report_deferred: bool = False
+    report_streaming: bool = False
+    report_dir: Optional[str] = None  # only used by worker processes
+
+
+@dataclass(frozen=True)
+class CapacitancePass:
+    kind: str  # 'overlap', 'sidewall' (bulk sidewall engine only) or 'sidewall_and_fringe'
+    inside_layer_indices: Tuple[int, ...]
+    tile: Optional[Tuple[int, int, int, int]] = None  # left, bottom, right, top (in dbu), None if untiled
+
+
+def run_capacitance_pass(context: CapacitancePassContext,
+                         capacitance_pass: CapacitancePass,
+                         results: CellExtractionResults,
+                         report: ExtractionReporter):
+    tile = None if capacitance_pass.tile is None else kdb.Box(*capacitance_pass.tile)
+
+    match capacitance_pass.kind:
+        case 'overlap':
+            match context.overlap_engine:
+                case OverlapEngine.BULK:
+                    overlap_extractor_class = BulkOverlapExtractor
+                case _:
+                    overlap_extractor_class = OverlapExtractor
+            extractor = overlap_extractor_class(
+                all_layer_names=context.all_layer_names,
+                layer_regions_by_name=context.layer_regions_by_name,
+                dbu=context.dbu,
+                tech_info=context.tech_info,
+                results=results,
+                report=report,
+                tile=tile,
+                compiled_tech=context.compiled_tech
+            )
+        case 'sidewall_and_fringe':
+            extractor = SidewallAndFringeExtractor(
+                all_layer_names=context.all_layer_names,
+                layer_regions_by_name=context.layer_regions_by_name,
+                dbu=context.dbu,
+                scale_ratio_to_fit_halo=context.scale_ratio_to_fit_halo,
+                tech_info=context.tech_info,
+                results=results,
+                report=report,
+                tile=tile,
+                emit_sidewalls=context.sidewall_engine != SidewallEngine.BULK,
+                compiled_tech=context.compiled_tech
+            )
+        case 'sidewall':
+            extractor = BulkSidewallExtractor(
+                all_layer_names=context.all_layer_names,
+                layer_regions_by_name=context.layer_regions_by_name,
+                dbu=context.dbu,
+                tech_info=context.tech_info,
+                results=results,
+                report=report,
+                tile=tile,
+                compiled_tech=context.compiled_tech
+            )
+        case _:
+            raise NotImplementedError(f"Unknown capacitance pass kind {capacitance_pass.kind}")
+
+    with stage(capacitance_pass.kind):
+        for idx in capacitance_pass.inside_layer_indices:
+            extractor.extract_layer(inside_layer_index=idx)
+
+
+_worker_context: Optional[CapacitancePassContext] = None
+
+
+def run_capacitance_pass_in_worker(numbered_pass: Tuple[int, CapacitancePass]) \
+        -> Tuple[CellExtractionResults, str, ReportTotals, Optional[StageTimerExport]]:
+    """
+    Runs a single capacitance pass in a worker process
+
+    :return: the partial extraction results, the path of the partial report and its totals,
+             and the stage timings of the pass (if timed)
+    """
+    pass_number, capacitance_pass = numbered_pass
+    context = _worker_context
+    results = CellExtractionResults(cell_name=context.cell_name, mode=context.results_mode)
+    report = ExtractionReporter(cell_name=context.cell_name,
+                                dbu=context.dbu,
+                                level=context.report_level,
+                                max_items_per_category=context.report_max_items_per_category,
+                                deferred=context.report_deferred,
+                                streaming=context.report_streaming)
+
+    # NOTE: the stages timed by the copy of the parent's timer (forked) would not be seen by the parent
+    timer = None if stage_timer() is None else StageTimer(profile=stage_timer().profile)
+    previous_timer = set_stage_timer(timer)
+    try:
+        run_capacitance_pass(context=context, capacitance_pass=capacitance_pass, results=results, report=report)
+    finally:
+        set_stage_timer(previous_timer)
+    log_rate_limit_summaries()  # the counters of the worker process are not seen by the parent
+
+    report_path = os.path.join(context.report_dir, f"pass_{pass_number}.rdb")
+    report.save(report_path, with_totals=False)
+    return results, report_path, report.totals, None if timer is None else timer.export()
+
+
 class RCX25Extractor:
     def __init__(self,
                  pex_context: KLayoutExtractionContext,
@@ -58,7 +194,17 @@ class RCX25Extractor:
                  delaunay_amax: float,
                  delaunay_b: float,
                  tech_info: TechInfo,
-                 report_path: str):
+                 report_path: str,
+                 num_processes: int = 1,
+                 tile_size: Optional[float] = None,
+                 hierarchical: bool = False,
+                 overlap_engine: OverlapEngine = OverlapEngine.DEFAULT,
+                 sidewall_engine: SidewallEngine = SidewallEngine.DEFAULT,
+                 results_mode: ResultsMode = ResultsMode.DEFAULT,
+                 report_level: ReportLevel = ReportLevel.DEFAULT,
+                 report_max_items_per_category: Optional[int] = None,
+                 report_deferred: bool = False,
+                 report_streaming: bool = False):
         self.pex_context = pex_context
         self.pex_mode = pex_mode
         self.scale_ratio_to_fit_halo = scale_ratio_to_fit_halo
@@ -66,6 +212,16 @@ class RCX25Extractor:
         self.delaunay_b = delaunay_b
         self.tech_info = tech_info
         self.report_path = report_path
+        self.num_processes = num_processes
+        self.tile_size = tile_size
+        self.hierarchical = hierarchical
+        self.overlap_engine = overlap_engine
+        self.sidewall_engine = sidewall_engine
+        self.results_mode = results_mode
+        self.report_level = report_level
+        self.report_max_items_per_category = report_max_items_per_category
+        self.report_deferred = report_deferred
+        self.report_streaming = report_streaming
 
         if "PolygonWithProperties" not in kdb.__all__:
             raise Exception("KLayout version does not support properties (needs 0.30 at least)")
@@ -88,11 +244,16 @@ class RCX25Extractor:
     def extract(self) -> ExtractionResults:
         extraction_results = ExtractionResults()
 
-        # TODO: for now, we always flatten and have only 1 cell
+        # NOTE: the results are always reported for the top cell (with flat net names),
+        #       also in hierarchical mode, see extract_capacitances_hierarchically()
         cell_name = self.pex_context.annotated_top_cell.name
         extraction_report = ExtractionReporter(cell_name=cell_name,
-                                               dbu=self.pex_context.dbu)
-        cell_extraction_results = CellExtractionResults(cell_name=cell_name)
+                                               dbu=self.pex_context.dbu,
+                                               level=self.report_level,
+                                               max_items_per_category=self.report_max_items_per_category,
+                                               deferred=self.report_deferred,
+                                               streaming=self.report_streaming)
+        cell_extraction_results = CellExtractionResults(cell_name=cell_name, mode=self.results_mode)
 
         # Explicitly log the stacktrace here, because otherwise Exceptions 
         # raised in the callbacks of *NeighborhoodVisitors can cause RuntimeErrors
@@ -106,9 +267,12 @@ class RCX25Extractor:
             traceback.print_exc()
             raise
 
+        log_rate_limit_summaries()
+
         extraction_results.cell_extraction_results[cell_name] = cell_extraction_results
 
-        extraction_report.save(self.report_path)
+        with stage('report'):
+            extraction_report.save(self.report_path)
 
         return extraction_results
 
@@ -169,26 +333,30 @@ class RCX25Extractor:
 
         # ------------------------------------------------------------------------
         if self.pex_mode.need_capacitance():
-            overlap_extractor = OverlapExtractor(
-                all_layer_names=all_layer_names,
-                layer_regions_by_name=layer_regions_by_name,
-                dbu=dbu,
-                tech_info=self.tech_info,
-                results=results,
-                report=report
-            )
-            overlap_extractor.extract()
-
-            sidewall_and_fringe_extractor = SidewallAndFringeExtractor(
-                all_layer_names=all_layer_names,
-                layer_regions_by_name=layer_regions_by_name,
-                dbu=dbu,
-                scale_ratio_to_fit_halo=self.scale_ratio_to_fit_halo,
-                tech_info=self.tech_info,
-                results=results,
-                report=report
-            )
-            sidewall_and_fringe_extractor.extract()
+            with stage('capacitances'):
+                if self.hierarchical:
+                    self.extract_capacitances_hierarchically(results=results, report=report)
+                else:
+                    context = CapacitancePassContext(
+                        cell_name=results.cell_name,
+                        all_layer_names=all_layer_names,
+                        layer_regions_by_name=layer_regions_by_name,
+                        dbu=dbu,
+                        scale_ratio_to_fit_halo=self.scale_ratio_to_fit_halo,
+                        tech_info=self.tech_info,
+                        compiled_tech=CompiledTech(tech_info=self.tech_info, all_layer_names=all_layer_names),
+                        overlap_engine=self.overlap_engine,
+                        sidewall_engine=self.sidewall_engine,
+                        results_mode=self.results_mode,
+                        report_level=self.report_level,
+                        report_max_items_per_category=self.report_max_items_per_category,
+                        report_deferred=self.report_deferred,
+                        report_streaming=self.report_streaming
+                    )
+                    self.extract_capacitances(context=context,
+                                              substrate_bbox=substrate_region.bbox(),
+                                              results=results,
+                                              report=report)
 
         # ------------------------------------------------------------------------
         if self.pex_mode.need_resistance():
@@ -206,11 +374,12 @@ class RCX25Extractor:
                                      delaunay_amax = self.delaunay_amax,
                                      via_merge_distance = 0,
                                      skip_simplify = True)
-            rex_request = r_extractor.prepare_request()
-            report.output_rex_request(request=rex_request)
+            with stage('resistances'):
+                rex_request = r_extractor.prepare_request()
+                report.output_rex_request(request=rex_request)
 
-            rex_result = r_extractor.extract(rex_request)
-            report.output_rex_result(result=rex_result)
+                rex_result = r_extractor.extract(rex_request)
+                report.output_rex_result(result=rex_result)
 
             #
             # node_by_id: Dict[int, r_network_pb2.RNode] = {}
@@ -242,6 +411,235 @@ class RCX25Extractor:
             #             f"↔︎ {node_b.node_name} (port net '{node_b.net_name}') "
             #             f"{round(element.resistance, 3)} Ω")
 
-            results.r_extraction_result = rex_result
+            results.set_r_extraction_result(rex_result)
 
         return results
+
+    def extract_capacitances(self,
+                             context: CapacitancePassContext,
+                             substrate_bbox: kdb.Box,
+                             results: CellExtractionResults,
+                             report: ExtractionReporter):
+        tiles: Optional[List[kdb.Box]] = None
+        if self.tile_size is not None:
+            tiles = make_tiles(bbox=substrate_bbox, tile_size=round(self.tile_size / context.dbu))
+            info(f"Splitting the capacitance extraction into {len(tiles)} tiles "
+                 f"of {self.tile_size} µm × {self.tile_size} µm")
+            side_halo_um = self.tech_info.tech.process_parasitics.side_halo
+            if self.tile_size < 2 * side_halo_um:
+                warning(f"Tile size {self.tile_size} µm is small compared to the side halo "
+                        f"of {side_halo_um} µm, the overlapping tile halos will dominate the run time")
+
+        capacitance_passes = self.capacitance_passes(kinds=self.capacitance_pass_kinds,
+                                                     num_layers=len(context.all_layer_names),
+                                                     tiles=tiles)
+
+        parallel = self.num_processes > 1
+        if parallel and 'fork' not in multiprocessing.get_all_start_methods():
+            warning("Parallel 2.5D extraction requires the 'fork' start method, "
+                    "falling back to serial extraction")
+            parallel = False
+        if parallel and not hasattr(rdb.ReportDatabase, 'merge'):
+            warning("Parallel 2.5D extraction requires KLayout 0.30.7 at least (merging reports), "
+                    "falling back to serial extraction")
+            parallel = False
+
+        if parallel:
+            self.run_capacitance_passes_parallel(context=context,
+                                                 capacitance_passes=capacitance_passes,
+                                                 results=results,
+                                                 report=report)
+        else:
+            for capacitance_pass in capacitance_passes:
+                run_capacitance_pass(context=context,
+                                     capacitance_pass=capacitance_pass,
+                                     results=results,
+                                     report=report)
+
+    def extract_capacitances_hierarchically(self,
+                                            results: CellExtractionResults,
+                                            report: ExtractionReporter):
+        """
+        Extracts the capacitances within each unique (leaf) cell only once,
+        and reuses them for all instances of the cell.
+        The parent level then only extracts the contributions between different instances,
+        the top level shapes and the substrate (see is_extracted_elsewhere).
+
+        NOTE: the cells of instances near other shapes are extracted in their context,
+              i.e. with the surrounding shapes clipped to the halo around the cell,
+              which shield the couplings within the cell (see HierarchicalGeometry.context_layer_regions)
+        """
+        dbu = self.pex_context.dbu
+        side_halo_um = self.tech_info.tech.process_parasitics.side_halo
+        substrate_layer_name = self.tech_info.internal_substrate_layer_name
+
+        gds_pairs_by_layer_name: Dict[LayerName, List[GDSPair]] = defaultdict(list)
+        for metal_layer in self.tech_info.process_metal_layers:
+            gds_pair = self.gds_pair(metal_layer.name)
+            if gds_pair not in self.pex_context.extracted_layers:
+                continue
+            canonical_layer_name = self.tech_info.canonical_layer_name_by_gds_pair[gds_pair]
+            gds_pairs_by_layer_name[canonical_layer_name].append(gds_pair)
+
+        geometry = HierarchicalGeometry.build(pex_context=self.pex_context,
+                                              gds_pairs_by_layer_name=gds_pairs_by_layer_name,
+                                              global_net_names=frozenset({substrate_layer_name}))
+        info(f"Hierarchical extraction: {len(geometry.instances)} instances "
+             f"of {len(geometry.cells)} unique cells")
+
+        all_layer_names = [substrate_layer_name, *geometry.all_layer_names]
+        compiled_tech = CompiledTech(tech_info=self.tech_info, all_layer_names=all_layer_names)
+
+        def new_context(cell_name: CellName,
+                        layer_regions_by_name: Dict[LayerName, kdb.Region],
+                        bbox: kdb.Box) -> CapacitancePassContext:
+            substrate_region = kdb.Region()
+            substrate_region.enable_properties()
+            substrate_region.insert(bbox.enlarged(side_halo_um / dbu))
+            return CapacitancePassContext(
+                cell_name=cell_name,
+                all_layer_names=all_layer_names,
+                layer_regions_by_name={substrate_layer_name: substrate_region, **layer_regions_by_name},
+                dbu=dbu,
+                scale_ratio_to_fit_halo=self.scale_ratio_to_fit_halo,
+                tech_info=self.tech_info,
+                compiled_tech=compiled_tech,
+                overlap_engine=self.overlap_engine,
+                sidewall_engine=self.sidewall_engine,
+                results_mode=self.results_mode,
+                report_level=self.report_level,
+                report_max_items_per_category=self.report_max_items_per_category,
+                report_deferred=self.report_deferred,
+                report_streaming=self.report_streaming
+            )
+
+        # NOTE: shapes of an instance which are farther away from all other shapes
+        #       than twice the halo neither couple to them nor shield them
+        side_halo = int(side_halo_um / dbu) + 1
+        near_instance_ids = geometry.near_instance_ids(near_distance=2 * side_halo)
+        info(f"{len(near_instance_ids)} instances are near other instances or top level shapes")
+
+        parent_layer_regions = geometry.parent_layer_regions(near_instance_ids)
+        parent_layer_shapes = layer_shapes(parent_layer_regions)
+
+        def extract_cell(cell_name: CellName,
+                         layer_regions_by_name: Dict[LayerName, kdb.Region],
+                         bbox: kdb.Box) -> CellExtractionResults:
+            context = new_context(cell_name=cell_name,
+                                  layer_regions_by_name=layer_regions_by_name,
+                                  bbox=bbox)
+            cell_results = CellExtractionResults(cell_name=cell_name, mode=self.results_mode)
+            # NOTE: the report is in top cell coordinates, so the contributions within the cells are not reported
+            cell_report = ExtractionReporter(cell_name=cell_name, dbu=dbu, level=ReportLevel.OFF)
+            for capacitance_pass in self.capacitance_passes(kinds=self.capacitance_pass_kinds,
+                                                                num_layers=len(all_layer_names),
+                                                                tiles=None):
+                run_capacitance_pass(context=context,
+                                     capacitance_pass=capacitance_pass,
+                                     results=cell_results,
+                                     report=cell_report)
+            return cell_results
+
+        # NOTE: a cell is extracted once in isolation (for the instances without shapes around them),
+        #       and once per distinct context of the near instances (e.g. the inner instances of an array)
+        cell_results_by_key: Dict[Tuple[CellName, ...], CellExtractionResults] = {}
+        for instance in geometry.instances:
+            cell = geometry.cells[instance.cell_name]
+            layer_regions_by_name = None
+            if instance.instance_id in near_instance_ids:
+                layer_regions_by_name = geometry.context_layer_regions(instance=instance,
+                                                                       parent_layer_shapes=parent_layer_shapes,
+                                                                       halo=side_halo)
+            if layer_regions_by_name is None:
+                key = (cell.cell_name,)
+                layer_regions_by_name = cell.layer_regions_by_name
+            else:
+                key = (cell.cell_name, *('\n'.join(sorted(str(p) for p in r.each()))
+                                         for r in layer_regions_by_name.values()))
+
+            cell_results = cell_results_by_key.get(key, None)
+            if cell_results is None:
+                debug(f"Extracting cell {cell.cell_name}"
+                      + ("" if len(key) == 1 else f" in the context of instance {instance.path}"))
+                cell_results = extract_cell(cell_name=cell.cell_name,
+                                            layer_regions_by_name=layer_regions_by_name,
+                                            bbox=cell.bbox)
+                cell_results_by_key[key] = cell_results
+
+            # NOTE: the substrate contributions of near instances are extracted on the parent level
+            add_instance_results(results=results,
+                                 cell_results=cell_results,
+                                 instance=instance,
+                                 skipped_net_name=substrate_layer_name
+                                                  if instance.instance_id in near_instance_ids else None)
+        info(f"Extracted the cells in {len(cell_results_by_key)} distinct contexts")
+
+        context = new_context(cell_name=results.cell_name,
+                              layer_regions_by_name=parent_layer_regions,
+                              bbox=self.pex_context.top_cell_bbox())
+        self.extract_capacitances(context=context,
+                                  substrate_bbox=context.layer_regions_by_name[substrate_layer_name].bbox(),
+                                  results=results,
+                                  report=report)
+
+    @property
+    def capacitance_pass_kinds(self) -> Tuple[str, ...]:
+        match self.sidewall_engine:
+            case SidewallEngine.BULK:
+                return 'overlap', 'sidewall', 'sidewall_and_fringe'
+            case _:
+                return 'overlap', 'sidewall_and_fringe'
+
+    @staticmethod
+    def capacitance_passes(kinds: Tuple[str, ...],
+                           num_layers: int,
+                           tiles: Optional[List[kdb.Box]]) -> List[CapacitancePass]:
+        """
+        Untiled, there is one pass per kind and layer.
+        Tiled, there is one pass per kind and tile (covering all layers),
+        so the layers are clipped to the tile only once.
+        """
+        if tiles is None:
+            return [CapacitancePass(kind=kind, inside_layer_indices=(idx,))
+                    for kind in kinds
+                    for idx in range(num_layers)]
+        all_layer_indices = tuple(range(num_layers))
+        return [CapacitancePass(kind=kind,
+                                inside_layer_indices=all_layer_indices,
+                                tile=(tile.left, tile.bottom, tile.right, tile.top))
+                for kind in kinds
+                for tile in tiles]
+
+    def run_capacitance_passes_parallel(self,
+                                        context: CapacitancePassContext,
+                                        capacitance_passes: List[CapacitancePass],
+                                        results: CellExtractionResults,
+                                        report: ExtractionReporter):
+        """
+        Runs the capacitance passes in a pool of worker processes.
+
+        The partial results are merged in the same order as the serial extraction
+        runs the passes, so the tables have the same keys and entries (in the same order).
+
+        NOTE: the totals are summed up per worker and then merged,
+              so they match the serial ones only within floating-point rounding
+              (see CellExtractionResults.merge)
+        """
+        global _worker_context
+
+        num_processes = min(self.num_processes, len(capacitance_passes))
+        info(f"Running {len(capacitance_passes)} capacitance passes using {num_processes} processes")
+
+        with tempfile.TemporaryDirectory(prefix='kpex_rcx25_') as report_dir:
+            _worker_context = replace(context, report_dir=report_dir)
+            try:
+                mp_context = multiprocessing.get_context('fork')
+                with mp_context.Pool(processes=num_processes) as pool:
+                    for partial_results, report_path, report_totals, timings in \
+                            pool.imap(run_capacitance_pass_in_worker, enumerate(capacitance_passes)):
+                        results.merge(partial_results)
+                        report.merge(report_path, totals=report_totals)
+                        if timings is not None:
+                            stage_timer().merge(timings)
+            finally:
+                _worker_context = None
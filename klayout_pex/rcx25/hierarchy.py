@@ -0,0 +1,461 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from typing import *
+
+import klayout.db as kdb
+
+from ..klayout.lvsdb_extractor import KLayoutExtractionContext, GDSPair
+from .extraction_results import CellExtractionResults, NetCoupleKey
+from .types import CellName, LayerName, NetName
+
+
+INSTANCE_PROPERTY = 'inst'
+TOP_LEVEL_INSTANCE = -1
+CONTEXT_INSTANCE = -2  # shapes around a cell, which only shield the shapes of the cell (see HierarchicalGeometry)
+CONTEXT_NET_NAME = '$context'  # context shapes of nets not connected to the cell
+
+
+def is_intra_instance(instance1: Optional[int], instance2: Optional[int]) -> bool:
+    """
+    Checks if a contribution between two shapes lies within a single cell instance.
+
+    In hierarchical mode, these contributions are extracted once per cell
+    (see HierarchicalGeometry), so the parent level has to skip them.
+
+    NOTE: contributions to the substrate are never intra instance,
+          as they depend on the shielding by the surrounding shapes (e.g. stacked via cells)
+
+    :param instance1: the instance property of the first shape,
+                      None for shapes without one (the substrate, or all shapes in flat mode)
+    :param instance2: the instance property of the second shape
+    """
+    if instance1 is None or instance1 == TOP_LEVEL_INSTANCE:
+        return False
+    return instance1 == instance2
+
+
+def is_extracted_elsewhere(instance1: Optional[int], instance2: Optional[int]) -> bool:
+    """
+    Checks if a contribution between two shapes is skipped, as it is extracted elsewhere:
+
+        - contributions within a single cell instance are extracted for the cell (see is_intra_instance)
+        - contributions of the context shapes around a cell (see CONTEXT_INSTANCE)
+          are extracted on the parent level
+
+    NOTE: the skipped shapes still shield the other contributions
+    """
+    if CONTEXT_INSTANCE in (instance1, instance2):
+        return True
+    return is_intra_instance(instance1, instance2)
+
+
+@dataclass
+class CellGeometry:
+    cell_name: CellName
+    layer_regions_by_name: Dict[LayerName, kdb.Region]  # in cell coordinates, with the local net names
+
+    @cached_property
+    def bbox(self) -> kdb.Box:
+        bbox = kdb.Box()
+        for r in self.layer_regions_by_name.values():
+            bbox += r.bbox()
+        return bbox
+
+    @cached_property
+    def footprint(self) -> kdb.Region:
+        footprint = kdb.Region()
+        for r in self.layer_regions_by_name.values():
+            for p in r.each():
+                footprint.insert(p.downcast())  # NOTE: without net names, so all nets get merged
+        footprint.merge()
+        return footprint
+
+
+def instance_net_name(instance_path: str, net_name: NetName) -> NetName:
+    """
+    Name of an internal net of a subcircuit instance,
+    like KLayout's Netlist.flatten_circuit names it (e.g. I0.n1, or X1.I0.n1 if nested)
+
+    :param instance_path: the expanded names of the subcircuits, separated by '.'
+    """
+    return f"{instance_path}.{net_name}"
+
+
+@dataclass
+class CellInstance:
+    instance_id: int
+    cell_name: CellName
+    path: str  # expanded names of the subcircuits from the top circuit, separated by '.' (e.g. X1.I0)
+    trans: kdb.ICplxTrans
+    net_name_map: Dict[NetName, NetName]  # maps local net names (connected to pins) to the parent net names
+    global_net_names: FrozenSet[NetName] = frozenset()  # nets which keep their names (e.g. the substrate)
+
+    def parent_net_name(self, net_name: NetName) -> NetName:
+        # NOTE: like in the flattened netlist, internal nets are prefixed with the instance path,
+        #       so the internal nets of different instances stay different nets
+        mapped_net_name = self.net_name_map.get(net_name, None)
+        if mapped_net_name is not None:
+            return mapped_net_name
+        if net_name in self.global_net_names:
+            return net_name
+        return instance_net_name(self.path, net_name)
+
+
+@dataclass
+class HierarchicalGeometry:
+    """
+    Splits the layout geometry along the netlist hierarchy
+
+        - leaf circuits (without subcircuits) become cells, which are extracted only once
+          (or once per distinct context, see context_layer_regions) and reused for each of their instances
+        - the shapes of all other circuits (including the top circuit) are top level shapes
+    """
+    all_layer_names: List[LayerName]
+    top_layer_regions_by_name: Dict[LayerName, kdb.Region]
+    cells: Dict[CellName, CellGeometry] = field(default_factory=dict)
+    instances: List[CellInstance] = field(default_factory=list)
+
+    @classmethod
+    def build(cls,
+              pex_context: KLayoutExtractionContext,
+              gds_pairs_by_layer_name: Dict[LayerName, List[GDSPair]],
+              global_net_names: FrozenSet[NetName] = frozenset()) -> HierarchicalGeometry:
+        lvsdb = pex_context.lvsdb
+        dbu = pex_context.dbu
+        lvsdb_layer_indexes = lvsdb.layer_indexes()
+
+        lvsdb_regions_by_layer_name: Dict[LayerName, List[kdb.Region]] = defaultdict(list)
+        for layer_name, gds_pairs in gds_pairs_by_layer_name.items():
+            for gds_pair in gds_pairs:
+                lyr = pex_context.extracted_layers.get(gds_pair, None)
+                if lyr is None:
+                    continue
+                for sl in lyr.source_layers:
+                    lvsdb_regions_by_layer_name[layer_name].append(lvsdb.layer_by_index(lvsdb_layer_indexes[sl.index]))
+
+        def new_region() -> kdb.Region:
+            r = kdb.Region()
+            r.enable_properties()
+            return r
+
+        def insert_net_shapes(layer_regions_by_name: Dict[LayerName, kdb.Region],
+                              circuit: kdb.Circuit,
+                              trans: kdb.ICplxTrans,
+                              net_name_by_net: Callable[[kdb.Net], NetName],
+                              properties: Dict[str, Any]):
+            for net in circuit.each_net():
+                net_properties = {'net': net_name_by_net(net), **properties}
+                for layer_name, lvsdb_regions in lvsdb_regions_by_layer_name.items():
+                    for lvsdb_region in lvsdb_regions:
+                        shapes = lvsdb.shapes_of_net(net, lvsdb_region, False)
+                        for p in shapes.each():
+                            layer_regions_by_name[layer_name].insert(
+                                kdb.PolygonWithProperties(trans * p, net_properties)
+                            )
+
+        all_layer_names = list(gds_pairs_by_layer_name.keys())
+        geometry = HierarchicalGeometry(all_layer_names=all_layer_names,
+                                        top_layer_regions_by_name={ln: new_region() for ln in all_layer_names})
+
+        def is_leaf(circuit: kdb.Circuit) -> bool:
+            return not any(True for _ in circuit.each_subcircuit())
+
+        def visit(circuit: kdb.Circuit,
+                  path: Optional[str],
+                  trans: kdb.ICplxTrans,
+                  net_name_by_net: Callable[[kdb.Net], NetName]):
+            insert_net_shapes(layer_regions_by_name=geometry.top_layer_regions_by_name,
+                              circuit=circuit,
+                              trans=trans,
+                              net_name_by_net=net_name_by_net,
+                              properties={INSTANCE_PROPERTY: TOP_LEVEL_INSTANCE})
+
+            for sc in circuit.each_subcircuit():
+                sc: kdb.SubCircuit
+                child: kdb.Circuit = sc.circuit_ref()
+                child_trans = trans * sc.trans.to_itrans(dbu)
+                child_path = sc.expanded_name() if path is None else f"{path}.{sc.expanded_name()}"
+
+                # nets connected to pins take the name of the outside net
+                parent_net_names: Dict[NetName, NetName] = {}
+                for net in child.each_net():
+                    for pin_ref in net.each_pin():
+                        outside_net = sc.net_for_pin(pin_ref.pin_id())
+                        if outside_net is not None:
+                            parent_net_names[net.expanded_name()] = net_name_by_net(outside_net)
+                            break
+
+                if not is_leaf(child):
+                    def child_net_name(n: kdb.Net,
+                                       m: Dict[NetName, NetName] = parent_net_names,
+                                       p: str = child_path) -> NetName:
+                        net_name = n.expanded_name()
+                        return m[net_name] if net_name in m else instance_net_name(p, net_name)
+
+                    visit(circuit=child,
+                          path=child_path,
+                          trans=child_trans,
+                          net_name_by_net=child_net_name)
+                    continue
+
+                cell = geometry.cells.get(child.name, None)
+                if cell is None:
+                    cell = CellGeometry(cell_name=child.name,
+                                        layer_regions_by_name={ln: new_region() for ln in all_layer_names})
+                    insert_net_shapes(layer_regions_by_name=cell.layer_regions_by_name,
+                                      circuit=child,
+                                      trans=kdb.ICplxTrans(),
+                                      net_name_by_net=lambda n: n.expanded_name(),
+                                      properties={})
+                    geometry.cells[child.name] = cell
+                if cell.bbox.empty():
+                    continue
+
+                geometry.instances.append(CellInstance(instance_id=len(geometry.instances),
+                                                       cell_name=child.name,
+                                                       path=child_path,
+                                                       trans=child_trans,
+                                                       net_name_map=parent_net_names,
+                                                       global_net_names=global_net_names))
+
+        visit(circuit=lvsdb.netlist().top_circuit(),
+              path=None,
+              trans=kdb.ICplxTrans(),
+              net_name_by_net=lambda n: n.expanded_name())
+
+        return geometry
+
+    def near_instance_ids(self, near_distance: int) -> Set[int]:
+        """
+        Determines the instances that have shapes within near_distance of shapes
+        of other instances (or of the top level).
+        """
+        owner_region = kdb.Region()
+        owner_region.enable_properties()
+        for layer_region in self.top_layer_regions_by_name.values():
+            for p in layer_region.each():
+                owner_region.insert(kdb.PolygonWithProperties(p.downcast(), {INSTANCE_PROPERTY: TOP_LEVEL_INSTANCE}))
+        for inst in self.instances:
+            footprint = self.cells[inst.cell_name].footprint
+            for p in footprint.each():
+                owner_region.insert(kdb.PolygonWithProperties(inst.trans * p.downcast(),
+                                                              {INSTANCE_PROPERTY: inst.instance_id}))
+
+        # NOTE: parts of the shapes which are near shapes of another owner
+        near_region = owner_region.and_(owner_region.sized(near_distance),
+                                        kdb.PropertyConstraint.DifferentPropertiesConstraint)
+        return {p.property(INSTANCE_PROPERTY) for p in near_region.each()} - {TOP_LEVEL_INSTANCE}
+
+    def parent_layer_regions(self, near_instance_ids: Set[int]) -> Dict[LayerName, kdb.Region]:
+        """
+        Builds the geometry for the parent level extraction:
+        all top level shapes and the shapes of the given instances.
+
+        The shapes carry the (parent) net name and the instance ID (see INSTANCE_PROPERTY),
+        so the extractors can skip the intra instance contributions.
+
+        NOTE: the top level shapes are clipped where they overlap instance shapes of the same net
+              (e.g. wires landing on pins), so like in flat mode, the overlapping parts are counted only once
+        """
+        layer_regions_by_name: Dict[LayerName, kdb.Region] = {}
+        for layer_name in self.all_layer_names:
+            instance_region = kdb.Region()
+            instance_region.enable_properties()
+            for inst in self.instances:
+                if inst.instance_id not in near_instance_ids:
+                    continue
+                cell_region = self.cells[inst.cell_name].layer_regions_by_name[layer_name]
+                for p in cell_region.each():
+                    instance_region.insert(kdb.PolygonWithProperties(
+                        inst.trans * p.downcast(),
+                        {'net': inst.parent_net_name(p.property('net')), INSTANCE_PROPERTY: inst.instance_id}
+                    ))
+
+            instance_net_region = instance_region.dup()
+            instance_net_region.map_properties({'net': 'net'})
+            top_net_region = self.top_layer_regions_by_name[layer_name].dup()
+            top_net_region.map_properties({'net': 'net'})
+            top_net_region = top_net_region.not_(instance_net_region, kdb.PropertyConstraint.SamePropertiesConstraint)
+
+            layer_region = kdb.Region()
+            layer_region.enable_properties()
+            for p in top_net_region.each():
+                layer_region.insert(kdb.PolygonWithProperties(
+                    p.downcast(),
+                    {'net': p.property('net'), INSTANCE_PROPERTY: TOP_LEVEL_INSTANCE}
+                ))
+            layer_region += instance_region
+            layer_regions_by_name[layer_name] = layer_region
+        return layer_regions_by_name
+
+    def context_layer_regions(self,
+                              instance: CellInstance,
+                              parent_layer_shapes: Dict[LayerName, kdb.Shapes],
+                              halo: int) -> Optional[Dict[LayerName, kdb.Region]]:
+        """
+        Builds the geometry to extract the cell of an instance in its context:
+        the shapes of the cell, and the shapes of the parent level geometry
+        (the top level shapes and the shapes of the other instances) clipped to the halo box of the cell.
+
+        The geometry is in cell coordinates, so instances in the same context can share the extraction.
+        The context shapes carry the CONTEXT_INSTANCE, so they only shield the contributions within the cell.
+        Shapes of the nets connected to the cell take the local net names,
+        so like in flat mode, they don't shield shapes of their own net,
+        the other context shapes take the CONTEXT_NET_NAME.
+
+        :param parent_layer_shapes: the parent level geometry (see parent_layer_regions), for the lookup by area
+        :param halo: the halo around the cell bbox (in dbu)
+        :return: None, if there are no shapes around the cell
+        """
+        cell = self.cells[instance.cell_name]
+        halo_box = cell.bbox.enlarged(halo, halo)
+        parent_halo_box = halo_box.transformed(instance.trans)
+        to_cell_trans = instance.trans.inverted()
+
+        # NOTE: if pins are connected to the same net, the first local net name is taken
+        local_net_names: Dict[NetName, NetName] = {}
+        for local_net_name, parent_net_name in sorted(instance.net_name_map.items()):
+            local_net_names.setdefault(parent_net_name, local_net_name)
+
+        context_regions_by_name: Dict[LayerName, kdb.Region] = {}
+        for layer_name in self.all_layer_names:
+            context_region = kdb.Region()
+            context_region.enable_properties()
+            for shape in parent_layer_shapes[layer_name].each_overlapping(parent_halo_box):
+                if shape.property(INSTANCE_PROPERTY) == instance.instance_id:
+                    continue
+                net_name = local_net_names.get(shape.property('net'), CONTEXT_NET_NAME)
+                context_region.insert(kdb.PolygonWithProperties(to_cell_trans * shape.polygon,
+                                                                {'net': net_name, INSTANCE_PROPERTY: CONTEXT_INSTANCE}))
+            context_regions_by_name[layer_name] = context_region.and_(kdb.Region(halo_box),
+                                                                      kdb.PropertyConstraint.NoPropertyConstraint)
+
+        if all(r.is_empty() for r in context_regions_by_name.values()):
+            return None
+
+        # NOTE: the shapes of the cell are top level shapes of this extraction
+        layer_regions_by_name: Dict[LayerName, kdb.Region] = {}
+        for layer_name in self.all_layer_names:
+            layer_region = context_regions_by_name[layer_name]
+            for p in cell.layer_regions_by_name[layer_name].each():
+                layer_region.insert(kdb.PolygonWithProperties(
+                    p.downcast(),
+                    {'net': p.property('net'), INSTANCE_PROPERTY: TOP_LEVEL_INSTANCE}
+                ))
+            layer_regions_by_name[layer_name] = layer_region
+        return layer_regions_by_name
+
+
+def layer_shapes(layer_regions_by_name: Dict[LayerName, kdb.Region]) -> Dict[LayerName, kdb.Shapes]:
+    """
+    Copies the layer regions into shapes containers, which support the lookup by area
+    """
+    layer_shapes_by_name: Dict[LayerName, kdb.Shapes] = {}
+    for layer_name, layer_region in layer_regions_by_name.items():
+        shapes = kdb.Shapes()
+        for p in layer_region.each():
+            shapes.insert(p)
+        layer_shapes_by_name[layer_name] = shapes
+    return layer_shapes_by_name
+
+
+def add_instance_results(results: CellExtractionResults,
+                         cell_results: CellExtractionResults,
+                         instance: CellInstance,
+                         skipped_net_name: Optional[NetName] = None):
+    """
+    Adds the capacitances extracted within a cell for one of its instances,
+    with the net names of the parent.
+
+    :param skipped_net_name: contributions to this net are skipped
+                             (e.g. the substrate, if extracted on the parent level)
+
+    NOTE: without details (see CellExtractionResults.mode),
+          the accumulated contributions per key (or per net pair) are added
+    """
+    if cell_results.summary_only:
+        for key, total in cell_results.net_couple_totals.items():
+            key = NetCoupleKey(instance.parent_net_name(key.net1), instance.parent_net_name(key.net2))
+            if key.net1 == key.net2:
+                continue  # pins connected to the same net
+            if skipped_net_name in (key.net1, key.net2):
+                continue
+            results.add_net_couple_cap(key, total)
+        return
+
+    if cell_results.keep_details:
+        overlap_entries = cell_results.overlap_table.items()
+        sidewall_entries = cell_results.sidewall_table.items()
+        sideoverlap_entries = cell_results.sideoverlap_table.items()
+    else:
+        overlap_entries = cell_results.overlap_statistics().items()
+        sidewall_entries = cell_results.sidewall_statistics().items()
+        sideoverlap_entries = cell_results.sideoverlap_statistics().items()
+
+    for key, caps in overlap_entries:
+        key = replace(key,
+                      net_top=instance.parent_net_name(key.net_top),
+                      net_bot=instance.parent_net_name(key.net_bot))
+        if key.net_top == key.net_bot:
+            continue  # pins connected to the same net
+        if skipped_net_name in (key.net_top, key.net_bot):
+            continue
+        if not cell_results.keep_details:
+            results.add_overlap_statistics(key, caps)
+            continue
+        for cap in caps:
+            results.add_overlap_cap(replace(cap, key=key))
+
+    for key, caps in sidewall_entries:
+        key = replace(key,
+                      net1=instance.parent_net_name(key.net1),
+                      net2=instance.parent_net_name(key.net2))
+        if key.net1 == key.net2:
+            continue
+        if skipped_net_name in (key.net1, key.net2):
+            continue
+        if not cell_results.keep_details:
+            results.add_sidewall_statistics(key, caps)
+            continue
+        for cap in caps:
+            results.add_sidewall_cap(replace(cap, key=key))
+
+    for key, caps in sideoverlap_entries:
+        key = replace(key,
+                      net_inside=instance.parent_net_name(key.net_inside),
+                      net_outside=instance.parent_net_name(key.net_outside))
+        if key.net_inside == key.net_outside:
+            continue
+        if skipped_net_name in (key.net_inside, key.net_outside):
+            continue
+        if not cell_results.keep_details:
+            results.add_sideoverlap_statistics(key, caps)
+            continue
+        for cap in caps:
+            results.add_sideoverlap_cap(replace(cap, key=key))
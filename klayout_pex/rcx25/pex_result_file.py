@@ -0,0 +1,196 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from typing import *
+
+from .extraction_results import (
+    CapacitanceAccumulator,
+    CapacitanceStatistics,
+    CellExtractionResults,
+    ExtractionResults,
+    NameTable,
+    NetCoupleKey,
+    ResultsMode,
+)
+
+import klayout_pex_protobuf.kpex.result.pex_result_pb2 as pex_result_pb2
+
+
+# NOTE: the PEXResult file is length-delimited,
+#       i.e. each message is preceded by its size (as varint),
+#       like C++ SerializeDelimitedToOstream / Java writeDelimitedTo
+
+CKind = pex_result_pb2.CExtractionResult.Kind
+
+
+def _encode_varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        bits = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(bits | 0x80)
+        else:
+            encoded.append(bits)
+            return bytes(encoded)
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    :return: the decoded value and the position after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint in length-delimited protobuf data")
+        b = data[pos]
+        pos += 1
+        value |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+
+
+def c_extraction_result_pb(results: CellExtractionResults) -> pex_result_pb2.CExtractionResult:
+    """
+    Converts the capacitances of a cell, the net pair totals are always written,
+    the breakdown per layer/net key only if the results mode keeps it (i.e. not summary-only)
+    """
+    c_result = pex_result_pb2.CExtractionResult(cell_name=results.cell_name)
+
+    # NOTE: start with the interned names of the results, so the accumulator keys stay valid
+    net_names = NameTable()
+    for name in results.net_names.names:
+        net_names.id(name)
+
+    for key, cap_value in results.net_couple_totals.items():
+        c_result.net_couple_capacitances.add(net1=net_names.id(key.net1),
+                                             net2=net_names.id(key.net2),
+                                             capacitance=cap_value)
+
+    def add_layer_couples(kind: CKind, accumulator: CapacitanceAccumulator):
+        for key_ids, statistics in accumulator.items():
+            if kind == CKind.KIND_SIDEWALL:
+                layer, net1, net2 = key_ids
+                key_ids = (layer, net1, layer, net2)
+            layer1, net1, layer2, net2 = key_ids
+            c_result.layer_couple_capacitances.add(kind=kind,
+                                                   layer1=layer1, net1=net1,
+                                                   layer2=layer2, net2=net2,
+                                                   capacitance=statistics.total,
+                                                   count=statistics.count,
+                                                   min_capacitance=statistics.min,
+                                                   max_capacitance=statistics.max)
+
+    if not results.summary_only:
+        add_layer_couples(CKind.KIND_OVERLAP, results.overlap_accumulator)
+        add_layer_couples(CKind.KIND_SIDEWALL, results.sidewall_accumulator)
+        add_layer_couples(CKind.KIND_SIDEOVERLAP, results.sideoverlap_accumulator)
+
+    c_result.net_names.extend(net_names.names)
+    c_result.layer_names.extend(results.layer_names.names)
+    return c_result
+
+
+def pex_result_pb(results: CellExtractionResults) -> pex_result_pb2.PEXResult:
+    pex_result = pex_result_pb2.PEXResult()
+    cell_result = pex_result.top_cell_extraction_result
+    cell_result.c_result.CopyFrom(c_extraction_result_pb(results))
+    cell_result.r_result.CopyFrom(results.r_extraction_result)
+    return pex_result
+
+
+def cell_extraction_results(pex_result: pex_result_pb2.PEXResult) -> CellExtractionResults:
+    """
+    Restores the results of the top cell,
+    with the breakdown per layer/net key (STATISTICS mode) or otherwise summary-only
+    """
+    cell_result = pex_result.top_cell_extraction_result
+    c_result = cell_result.c_result
+
+    mode = ResultsMode.STATISTICS if len(c_result.layer_couple_capacitances) >= 1 else ResultsMode.SUMMARY
+    results = CellExtractionResults(cell_name=c_result.cell_name, mode=mode)
+    for name in c_result.net_names:
+        results.net_names.id(name)
+    for name in c_result.layer_names:
+        results.layer_names.id(name)
+
+    accumulator_by_kind = {
+        CKind.KIND_OVERLAP: results.overlap_accumulator,
+        CKind.KIND_SIDEWALL: results.sidewall_accumulator,
+        CKind.KIND_SIDEOVERLAP: results.sideoverlap_accumulator,
+    }
+    for lc in c_result.layer_couple_capacitances:
+        if lc.kind == CKind.KIND_SIDEWALL:
+            key_ids = (lc.layer1, lc.net1, lc.net2)
+        else:
+            key_ids = (lc.layer1, lc.net1, lc.layer2, lc.net2)
+        statistics = CapacitanceStatistics(total=lc.capacitance, count=lc.count,
+                                           min=lc.min_capacitance, max=lc.max_capacitance)
+        accumulator_by_kind[lc.kind].add_statistics(key_ids, statistics)
+
+    # NOTE: the totals are restored as written (instead of re-summing the breakdown)
+    for nc in c_result.net_couple_capacitances:
+        key = NetCoupleKey(results.net_names[nc.net1], results.net_names[nc.net2])
+        results.net_couple_totals[key] += nc.capacitance
+
+    results.set_r_extraction_result(cell_result.r_result)
+    return results
+
+
+def write_pex_result(path: str, results: ExtractionResults):
+    """
+    Writes the results of the top cell as length-delimited binary PEXResult
+    """
+    if len(results.cell_extraction_results) != 1:
+        raise ValueError(f"Expected the results of a single top cell, "
+                         f"got {len(results.cell_extraction_results)}")
+    data = pex_result_pb(next(iter(results.cell_extraction_results.values()))).SerializeToString()
+    with open(path, 'wb') as f:
+        f.write(_encode_varint(len(data)))
+        f.write(data)
+
+
+def read_pex_results(path: str) -> Iterator[pex_result_pb2.PEXResult]:
+    """
+    Reads the length-delimited binary PEXResult messages of a file
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 0
+    while pos < len(data):
+        size, pos = _decode_varint(data, pos)
+        if pos + size > len(data):
+            raise ValueError(f"Truncated PEXResult message in {path}")
+        yield pex_result_pb2.PEXResult.FromString(data[pos:pos + size])
+        pos += size
+
+
+def read_pex_result(path: str) -> pex_result_pb2.PEXResult:
+    results = list(read_pex_results(path))
+    if len(results) != 1:
+        raise ValueError(f"Expected a single PEXResult message in {path}, got {len(results)}")
+    return results[0]
@@ -0,0 +1,379 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import gzip
+import re
+import shutil
+import tempfile
+from typing import *
+import xml.etree.ElementTree as ET
+
+import klayout.db as kdb
+
+
+# NOTE: the RDB XML format, as written by KLayout's rdb.ReportDatabase.save()
+#       (the categories and cells come before the items,
+#        items reference their category by the quoted category path)
+
+_QUOTED_ESCAPES = {"'": "\\'", '\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+_QUOTED_ESCAPE_PATTERN = re.compile(r"[^\x20-\x7e]|['\\]")
+_WORD_PATTERN = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*\Z')
+_XML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;'}
+_XML_ESCAPE_PATTERN = re.compile(r'[&<>\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _quoted_escape(m: re.Match) -> str:
+    c = m.group(0)
+    escape = _QUOTED_ESCAPES.get(c, None)
+    return escape if escape is not None else f"\\{ord(c):03o}"
+
+
+def quoted_string(s: str) -> str:
+    """
+    Quoted string like KLayout's tl::to_quoted_string
+    (non-printable and non-ASCII bytes are escaped as octal)
+    """
+    # NOTE: latin-1 maps the UTF-8 bytes 1:1 to characters
+    return f"'{_QUOTED_ESCAPE_PATTERN.sub(_quoted_escape, s.encode('utf-8').decode('latin-1'))}'"
+
+
+def word_or_quoted_string(s: str) -> str:
+    """
+    Word or quoted string like KLayout's tl::to_word_or_quoted_string
+    """
+    if _WORD_PATTERN.match(s):
+        return s
+    return quoted_string(s)
+
+
+def _xml_escape(m: re.Match) -> str:
+    c = m.group(0)
+    escape = _XML_ESCAPES.get(c, None)
+    return escape if escape is not None else f"&#{ord(c)};"
+
+
+def xml_text(s: str) -> str:
+    return _XML_ESCAPE_PATTERN.sub(_xml_escape, s)
+
+
+def property_value_string(value: Any) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"float: {format(float(value), '.12g')}"
+    return f"text: {word_or_quoted_string(str(value))}"
+
+
+class StreamingCategory:
+    def __init__(self,
+                 rdb_id: int,
+                 name: str,
+                 parent: Optional[StreamingCategory]):
+        self._rdb_id = rdb_id
+        self._name = name
+        self.parent = parent
+        self.sub_categories: Dict[str, StreamingCategory] = {}
+        # NOTE: the quoted path, as referenced by the items
+        self._path = word_or_quoted_string(name) if parent is None \
+                     else f"{parent.path()}.{word_or_quoted_string(name)}"
+
+    def rdb_id(self) -> int:
+        return self._rdb_id
+
+    def name(self) -> str:
+        return self._name
+
+    def path(self) -> str:
+        return self._path
+
+
+class StreamingCell:
+    def __init__(self, rdb_id: int, name: str):
+        self._rdb_id = rdb_id
+        self._name = name
+
+    def rdb_id(self) -> int:
+        return self._rdb_id
+
+    def name(self) -> str:
+        return self._name
+
+
+class StreamingReportDatabase:
+    """
+    Writes RDB XML files (e.g. for the KLayout marker browser),
+    without building the klayout.rdb object model.
+
+    Provides the subset of the rdb.ReportDatabase API used by the ExtractionReporter.
+    Only the category tree (and the cells and tags) is kept in memory,
+    the items are streamed into a compressed temporary file as they are created.
+    As the categories precede the items in the file, the file is assembled when saving.
+    For gzip files, the compressed items are copied as they are (as a separate gzip member).
+
+    NOTE: for shapes with multiple properties, the order of the property values
+          might differ from KLayout's (which doesn't affect loading)
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.next_id = 1
+        self.categories: Dict[str, StreamingCategory] = {}
+        self.categories_by_id: Dict[int, StreamingCategory] = {}
+        self.cells_by_id: Dict[int, StreamingCell] = {}
+        self.tag_names: Dict[str, int] = {}  # NOTE: tag name -> tag index, in order of creation
+        self.item_count = 0
+        self.spool_file = tempfile.TemporaryFile(prefix='kpex_rdb_items_')
+        self.spool = gzip.GzipFile(fileobj=self.spool_file, mode='wb', compresslevel=6)
+
+    def _new_id(self) -> int:
+        rdb_id = self.next_id
+        self.next_id += 1
+        return rdb_id
+
+    def num_items(self) -> int:
+        return self.item_count
+
+    def create_cell(self, name: str) -> StreamingCell:
+        cell = StreamingCell(rdb_id=self._new_id(), name=name)
+        self.cells_by_id[cell.rdb_id()] = cell
+        return cell
+
+    def create_category(self, *args) -> StreamingCategory:
+        """
+        create_category(name) or create_category(parent, name),
+        returns the existing category if there is already one with the same name
+        """
+        match args:
+            case (str() as name,):
+                parent = None
+                siblings = self.categories
+            case (StreamingCategory() as parent, str() as name):
+                siblings = parent.sub_categories
+            case _:
+                raise TypeError(f"Unexpected arguments {args}")
+        category = siblings.get(name, None)
+        if category is None:
+            category = StreamingCategory(rdb_id=self._new_id(), name=name, parent=parent)
+            siblings[name] = category
+            self.categories_by_id[category.rdb_id()] = category
+        return category
+
+    def _register_tags(self, properties: Dict[Any, Any]) -> List[Tuple[str, Any]]:
+        named_values = []
+        for name, value in properties.items():
+            name = str(name)
+            if name not in self.tag_names:
+                self.tag_names[name] = len(self.tag_names)
+            named_values.append((name, value))
+        named_values.sort(key=lambda nv: self.tag_names[nv[0]])
+        return named_values
+
+    def _write_item(self,
+                    category_path: str,
+                    cell_name: str,
+                    values: Iterable[str]):
+        lines = ['  <item>\n',
+                 '   <tags/>\n',
+                 f"   <category>{xml_text(category_path)}</category>\n",
+                 f"   <cell>{xml_text(cell_name)}</cell>\n",
+                 '   <visited>false</visited>\n',
+                 '   <multiplicity>1</multiplicity>\n',
+                 '   <comment/>\n',
+                 '   <image/>\n',
+                 '   <values>\n']
+        lines.extend(f"    <value>{xml_text(v)}</value>\n" for v in values)
+        lines.append('   </values>\n'
+                     '  </item>\n')
+        self.spool.write(''.join(lines).encode('utf-8'))
+        self.item_count += 1
+
+    def _shape_value(self, trans: kdb.CplxTrans, shape: Any) -> str:
+        match shape:
+            case kdb.Polygon() | kdb.SimplePolygon():
+                return f"polygon: {kdb.DPolygon.to_s(trans * shape)}"
+            case kdb.Box():
+                return f"polygon: {kdb.DPolygon(trans * shape).to_s()}"
+            case kdb.Edge():
+                return f"edge: {kdb.DEdge.to_s(trans * shape)}"
+            case kdb.Path():
+                return f"path: {kdb.DPath.to_s(trans * shape)}"
+            case kdb.Text():
+                return f"label: {kdb.DText.to_s(trans * shape)}"
+            case kdb.Shape():
+                if shape.is_box() or shape.is_polygon() or shape.is_simple_polygon():
+                    return self._shape_value(trans, shape.polygon)
+                if shape.is_edge():
+                    return self._shape_value(trans, shape.edge)
+                if shape.is_path():
+                    return self._shape_value(trans, shape.path)
+                if shape.is_text():
+                    return self._shape_value(trans, shape.text)
+        raise NotImplementedError(f"Unsupported shape {shape!r}")
+
+    def create_items(self,
+                     cell_id: int,
+                     category_id: int,
+                     trans: kdb.CplxTrans,
+                     shapes: kdb.Shapes | kdb.Region | kdb.Edge | Sequence[Any]):
+        cell = self.cells_by_id[cell_id]
+        category = self.categories_by_id[category_id]
+
+        # NOTE: like KLayout, region items have no property values (but the tags are registered)
+        with_properties = not isinstance(shapes, kdb.Region)
+        if isinstance(shapes, kdb.Edge):
+            shapes = [shapes]
+        elif isinstance(shapes, kdb.Region):
+            shapes = shapes.each()
+        elif isinstance(shapes, kdb.Shapes):
+            shapes = shapes.each()
+
+        for shape in shapes:
+            values = [self._shape_value(trans, shape)]
+            properties = shape.properties() if hasattr(shape, 'properties') else {}
+            if properties:
+                named_values = self._register_tags(properties)
+                if with_properties:
+                    values.extend(f"[#{word_or_quoted_string(name)}] {property_value_string(value)}"
+                                  for name, value in named_values)
+            self._write_item(category_path=category.path(), cell_name=cell.name(), values=values)
+
+    def merge_file(self, path: str):
+        """
+        Merges a saved RDB file (e.g. of a worker process),
+        the categories are merged by name and the items are appended
+        """
+        cell_names = {c.name() for c in self.cells_by_id.values()}
+
+        def merge_categories(categories_element: ET.Element, parent: Optional[StreamingCategory]):
+            for category_element in categories_element.iterfind('category'):
+                name = category_element.findtext('name', default='')
+                category = self.create_category(name) if parent is None else self.create_category(parent, name)
+                sub_categories_element = category_element.find('categories')
+                if sub_categories_element is not None:
+                    merge_categories(sub_categories_element, category)
+
+        def merge_cell(name: str):
+            if name not in cell_names:
+                self.create_cell(name)
+                cell_names.add(name)
+
+        with (gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')) as f:
+            open_tags: List[str] = []
+            for event, element in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    open_tags.append(element.tag)
+                    continue
+                open_tags.pop()
+                if len(open_tags) != 2:
+                    if len(open_tags) == 1:  # NOTE: sections (tags, categories, cells, items) are done
+                        element.clear()
+                    continue
+                match open_tags[1], element.tag:
+                    case 'tags', 'tag':
+                        self._register_tags({element.findtext('name', default=''): None})
+                    case 'categories', 'category':
+                        wrapper = ET.Element('categories')
+                        wrapper.append(element)
+                        merge_categories(wrapper, None)
+                    case 'cells', 'cell':
+                        merge_cell(element.findtext('name', default=''))
+                    case 'items', 'item':
+                        cell_name = element.findtext('cell', default='')
+                        merge_cell(cell_name)
+                        self._write_item(category_path=element.findtext('category', default=''),
+                                         cell_name=cell_name,
+                                         values=[v.text or '' for v in element.iterfind('values/value')])
+                element.clear()
+
+    def _write_categories(self,
+                          f: IO[str],
+                          categories: Iterable[StreamingCategory],
+                          depth: int):
+        indent = ' ' * (2 * depth + 2)
+        for category in categories:
+            f.write(f"{indent}<category>\n"
+                    f"{indent} <name>{xml_text(category.name())}</name>\n"
+                    f"{indent} <description/>\n"
+                    f"{indent} <categories>\n")
+            self._write_categories(f, category.sub_categories.values(), depth + 1)
+            f.write(f"{indent} </categories>\n"
+                    f"{indent}</category>\n")
+
+    def _write_header(self, f: IO[str]):
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                '<report-database>\n'
+                ' <description/>\n'
+                ' <original-file/>\n'
+                ' <generator/>\n'
+                ' <top-cell/>\n'
+                ' <tags>\n')
+        for tag_name in self.tag_names.keys():
+            f.write('  <tag>\n'
+                    f"   <name>{xml_text(tag_name)}</name>\n"
+                    '   <description/>\n'
+                    '  </tag>\n')
+        f.write(' </tags>\n'
+                ' <categories>\n')
+        self._write_categories(f, self.categories.values(), depth=0)
+        f.write(' </categories>\n'
+                ' <cells>\n')
+        for cell in self.cells_by_id.values():
+            f.write('  <cell>\n'
+                    f"   <name>{xml_text(cell.name())}</name>\n"
+                    '   <variant/>\n'
+                    '   <layout-name/>\n'
+                    '   <references>\n'
+                    '   </references>\n'
+                    '  </cell>\n')
+        f.write(' </cells>\n'
+                ' <items>\n')
+
+    @staticmethod
+    def _write_footer(f: IO[str]):
+        f.write(' </items>\n'
+                '</report-database>\n')
+
+    def save(self, path: str):
+        """
+        Writes the RDB file (gzip compressed if the path ends with .gz),
+        can be called only once, as the streamed items are consumed
+        """
+        self.spool.close()  # NOTE: completes the gzip member of the items, keeps the temporary file open
+        self.spool_file.seek(0)
+
+        try:
+            if path.endswith('.gz'):
+                with open(path, 'wb') as f:
+                    with gzip.open(f, 'wt', encoding='utf-8', compresslevel=6) as header:
+                        self._write_header(header)
+                    shutil.copyfileobj(self.spool_file, f)
+                    with gzip.open(f, 'wt', encoding='utf-8', compresslevel=6) as footer:
+                        self._write_footer(footer)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    self._write_header(f)
+                    with gzip.open(self.spool_file, 'rt', encoding='utf-8') as items:
+                        shutil.copyfileobj(items, f)
+                    self._write_footer(f)
+        finally:
+            self.spool_file.close()
@@ -0,0 +1,94 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import math
+from typing import *
+
+import klayout.db as kdb
+
+from .types import EdgeInterval
+
+
+def make_tiles(bbox: kdb.Box, tile_size: int) -> List[kdb.Box]:
+    """
+    Splits the bounding box into a grid of tiles (in row-major order).
+
+    The grid slightly exceeds the bounding box, so that every point of the box
+    is owned by a tile (see owned_edge_interval).
+    """
+    if tile_size <= 0:
+        raise ValueError(f"Tile size must be positive, but is {tile_size}")
+    if bbox.empty():
+        return []
+
+    num_x = bbox.width() // tile_size + 1
+    num_y = bbox.height() // tile_size + 1
+
+    return [kdb.Box(bbox.left + ix * tile_size,
+                    bbox.bottom + iy * tile_size,
+                    bbox.left + (ix + 1) * tile_size,
+                    bbox.bottom + (iy + 1) * tile_size)
+            for iy in range(num_y)
+            for ix in range(num_x)]
+
+
+def clip_region(region: kdb.Region, box: kdb.Box) -> kdb.Region:
+    """
+    Clips the region to the box, keeping the polygon properties (i.e. the net names)
+    """
+    clipped_region = region.and_(kdb.Region(box), kdb.PropertyConstraint.NoPropertyConstraint)
+    clipped_region.enable_properties()
+    return clipped_region
+
+
+def owned_edge_interval(edge: kdb.Edge, tile: kdb.Box) -> Optional[EdgeInterval]:
+    """
+    Determines the part of the edge that is owned by the tile.
+
+    Tiles own their left and bottom border, but not their right and top border,
+    so each part of an edge is owned by exactly one tile of a grid
+    (also edges running along a tile border).
+
+    :return: the owned interval as distances from edge.p1 (like the intervals
+             of an EdgeNeighborhoodVisitor), or None if the tile owns nothing of the edge
+    """
+    t_min = 0.0
+    t_max = 1.0
+    for start, delta, low, high in ((edge.p1.x, edge.dx(), tile.left, tile.right),
+                                    (edge.p1.y, edge.dy(), tile.bottom, tile.top)):
+        if delta == 0:
+            if not low <= start < high:
+                return None
+        else:
+            t_low = (low - start) / delta
+            t_high = (high - start) / delta
+            t_min = max(t_min, min(t_low, t_high))
+            t_max = min(t_max, max(t_low, t_high))
+
+    if t_max <= t_min:
+        return None
+
+    length = math.hypot(edge.dx(), edge.dy())
+    return t_min * length, t_max * length
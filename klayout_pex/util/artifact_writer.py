@@ -0,0 +1,72 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from enum import StrEnum
+import time
+from typing import *
+
+from ..log import (
+    debug,
+    warning,
+)
+
+
+class ArtifactPolicy(StrEnum):
+    """
+    Which of the (debugging) artifacts are written to the output directory,
+    each level includes the artifacts of the previous levels
+    """
+    NONE = 'none'        # only the results of the engines
+    MINIMAL = 'minimal'  # + the annotated layout (*_l2n_extracted.oas)
+    DEBUG = 'debug'      # + the LVS internal layout and the LVS layer dumps
+    ALL = 'all'          # + the STL geometries of the FasterCap/FastCap2 input
+    DEFAULT = ALL
+
+    def includes(self, policy: ArtifactPolicy) -> bool:
+        levels = [ArtifactPolicy.NONE, ArtifactPolicy.MINIMAL, ArtifactPolicy.DEBUG, ArtifactPolicy.ALL]
+        return levels.index(self) >= levels.index(policy)
+
+
+class ArtifactWriter:
+    """
+    Writes the (debugging) artifacts, a failing write is logged as a warning
+    and recorded, instead of aborting the extraction.
+
+    NOTE: the writes happen synchronously, as KLayout holds the GIL while writing a layout,
+          a background thread would not overlap with the extraction anyway
+    """
+
+    def __init__(self):
+        self.failures: List[Tuple[str, BaseException]] = []
+
+    def write(self, description: str, write: Callable[[], None]):
+        start = time.time()
+        try:
+            write()
+        except Exception as e:
+            warning(f"Failed to write artifact {description}: {e}")
+            self.failures.append((description, e))
+            return
+        debug(f"Wrote artifact {description} after {'%.4g' % (time.time() - start)}s")
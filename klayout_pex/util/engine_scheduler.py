@@ -0,0 +1,176 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+import threading
+import time
+from typing import *
+
+from ..log import (
+    LogLevel,
+    register_additional_handler,
+    deregister_additional_handler,
+    info,
+    error,
+    rule,
+)
+
+
+EngineName = str
+
+
+@dataclass
+class EngineSpec:
+    name: EngineName
+    max_threads: Optional[int] = None  # None: can make use of any number of threads
+
+
+@dataclass
+class EngineTiming:
+    name: EngineName
+    num_threads: int
+    duration: Optional[float] = None  # None: still running
+    exception: Optional[BaseException] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.duration is not None and self.exception is None
+
+
+class ThreadNameFilter(logging.Filter):
+    def __init__(self, thread_name: str):
+        super().__init__()
+        self.thread_name = thread_name
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.threadName == self.thread_name
+
+
+class EngineScheduler:
+    """
+    Runs the selected PEX engines concurrently, each within its own thread.
+
+    As the engines only share read-only inputs, they can run side by side,
+    the engines themselves mostly wait for their subprocesses (FasterCap, FastCap2, MAGIC)
+    or worker processes (kpex/2.5D).
+
+    The thread budget (--threads) is split between the engines up front,
+    single-threaded engines get 1 thread, the rest is evenly distributed.
+
+    If concurrent is False, the engines run synchronously within start().
+    """
+
+    def __init__(self,
+                 engines: List[EngineSpec],
+                 num_threads: int,
+                 concurrent: bool):
+        self.engines = engines
+        self.num_threads = num_threads
+        self.concurrent = concurrent
+        self.threads: Dict[EngineName, threading.Thread] = {}
+        self.timings: Dict[EngineName, EngineTiming] = {}
+
+    @property
+    def thread_budgets(self) -> Dict[EngineName, int]:
+        if not self.concurrent:
+            return {e.name: self.num_threads if e.max_threads is None else min(e.max_threads, self.num_threads)
+                    for e in self.engines}
+
+        budgets: Dict[EngineName, int] = {}
+        remaining = self.num_threads
+        unbounded = []
+        for e in self.engines:
+            if e.max_threads is None:
+                unbounded.append(e)
+            else:
+                budgets[e.name] = e.max_threads
+                remaining -= e.max_threads
+        for idx, e in enumerate(unbounded):
+            share = remaining // len(unbounded) + (1 if idx < remaining % len(unbounded) else 0)
+            budgets[e.name] = max(1, share)
+        return budgets
+
+    def start(self,
+              name: EngineName,
+              run: Callable[[int], None],
+              log_path: Optional[str] = None):
+        """
+        Starts an engine
+
+        :param name: the name of the engine (as passed to the constructor)
+        :param run: the engine function, called with its thread budget
+        :param log_path: optional log file, receiving the log messages of this engine only
+        """
+        num_threads = self.thread_budgets[name]
+        timing = EngineTiming(name=name, num_threads=num_threads)
+        self.timings[name] = timing
+
+        def run_engine():
+            handler: Optional[logging.Handler] = None
+            if log_path is not None:
+                handler = logging.FileHandler(log_path)
+                handler.setLevel(LogLevel.SUBPROCESS)
+                handler.setFormatter(logging.Formatter('[%(asctime)s] [%(levelname)s]    %(message)s'))
+                handler.addFilter(ThreadNameFilter(threading.current_thread().name))
+                register_additional_handler(handler)
+
+            start = time.time()
+            try:
+                run(num_threads)
+            except BaseException as e:
+                timing.exception = e
+                error(f"Engine {name} failed: {e}")
+            finally:
+                timing.duration = time.time() - start
+                if handler is not None:
+                    deregister_additional_handler(handler)
+                    handler.close()
+
+        if self.concurrent:
+            info(f"Starting engine {name} with {num_threads} thread(s)")
+            thread = threading.Thread(target=run_engine, name=f"kpex-engine-{name}")
+            self.threads[name] = thread
+            thread.start()
+        else:
+            run_engine()
+
+    def wait(self):
+        """
+        Waits for all started engines, logs the timing summary,
+        and re-raises the first engine failure (if any)
+        """
+        for thread in self.threads.values():
+            thread.join()
+
+        rule('Engine timing summary')
+        for timing in self.timings.values():
+            status = 'succeeded' if timing.succeeded else 'failed'
+            info(f"{timing.name}: {status} after {'%.4g' % timing.duration}s "
+                 f"({timing.num_threads} thread(s))")
+
+        for timing in self.timings.values():
+            if timing.exception is not None:
+                raise timing.exception
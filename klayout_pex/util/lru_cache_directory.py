@@ -0,0 +1,124 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from contextlib import contextmanager
+import json
+import os
+import tempfile
+from typing import *
+
+try:
+    import fcntl
+except ImportError:  # NOTE: Windows, the index updates are still atomic, but not serialized
+    fcntl = None
+
+from ..log import (
+    warning,
+)
+
+
+CacheIndex = Dict[str, Dict[str, Any]]  # digest -> entry infos (at least 'size' and 'last_used')
+
+
+class LRUCacheDirectory:
+    """
+    Base of the on-disk caches with a size limit.
+
+    An index file keeps track of the entry sizes and their last usage, so the least recently used
+    entries can be evicted once the size limit is exceeded.
+
+    The index updates are serialized by a lock file, so parallel kpex runs can share a cache directory.
+    """
+
+    INDEX_FILE_NAME = 'index.json'
+    LOCK_FILE_NAME = 'index.lock'
+
+    def __init__(self,
+                 cache_dir_path: str,
+                 max_size_bytes: int):
+        self.cache_dir_path = cache_dir_path
+        self.max_size_bytes = max_size_bytes
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.cache_dir_path, self.INDEX_FILE_NAME)
+
+    def remove_entry(self, digest: str, entry: Dict[str, Any]):
+        raise NotImplementedError()
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[CacheIndex]:
+        os.makedirs(self.cache_dir_path, exist_ok=True)
+        with open(os.path.join(self.cache_dir_path, self.LOCK_FILE_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                self._write_index(index)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self) -> CacheIndex:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            warning(f"Ignoring corrupt cache index {self.index_path}: {e}")
+            return {}
+
+    def _write_index(self, index: CacheIndex):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir_path, prefix='.index_', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            self._remove_temp_file(tmp_path)
+            raise
+
+    @staticmethod
+    def _remove_temp_file(tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, index: CacheIndex, keep_digest: str):
+        total_size = sum(e['size'] for e in index.values())
+        for digest, entry in sorted(index.items(), key=lambda i: i[1]['last_used']):
+            if total_size <= self.max_size_bytes:
+                break
+            if digest == keep_digest:
+                continue
+            try:
+                self.remove_entry(digest, entry)
+            except FileNotFoundError:
+                pass
+            del index[digest]
+            total_size -= entry['size']
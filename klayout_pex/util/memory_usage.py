@@ -0,0 +1,79 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import os
+import sys
+from typing import *
+
+try:
+    import resource
+except ImportError:  # NOTE: windows
+    resource = None
+
+
+def _max_rss_bytes(who: int) -> Optional[int]:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(who).ru_maxrss
+    # NOTE: kilobytes on linux, bytes on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def current_rss() -> Optional[int]:
+    """
+    :return: the current resident set size of this process in bytes (None: unknown on this platform)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """
+    :return: the peak resident set size of this process in bytes (None: unknown on this platform)
+    """
+    return None if resource is None else _max_rss_bytes(resource.RUSAGE_SELF)
+
+
+def peak_children_rss() -> Optional[int]:
+    """
+    :return: the peak resident set size of the largest terminated child process
+             (e.g. FasterCap) in bytes (None: unknown on this platform)
+    """
+    return None if resource is None else _max_rss_bytes(resource.RUSAGE_CHILDREN)
+
+
+def format_bytes(num_bytes: Optional[int]) -> str:
+    if num_bytes is None:
+        return 'n/a'
+    sign = '-' if num_bytes < 0 else ''
+    value = float(abs(num_bytes))
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if value < 1024.0 or unit == 'GiB':
+            return f"{sign}{'%.4g' % value} {unit}"
+        value /= 1024.0
@@ -0,0 +1,378 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import cProfile
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict, replace
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from typing import *
+
+from ..log import (
+    info,
+    rule,
+)
+from .memory_usage import current_rss, peak_rss, peak_children_rss, format_bytes
+
+
+StagePath = str  # the names of the enclosing stages and the stage, separated by '/'
+
+ProfileStats = Dict[Tuple, Tuple]  # see cProfile.Profile.create_stats()
+
+MetricGroup = str
+Metrics = Dict[MetricGroup, Dict[str, int]]  # e.g. {'layer polygons': {'met1_con': 1234, ...}, ...}
+
+
+@dataclass
+class StageTiming:
+    """
+    NOTE: the memory sizes are in bytes (None: unknown on this platform),
+          and are measured for the whole process,
+          i.e. they include the stages of concurrently running engines (threads)
+    """
+    path: StagePath
+    thread_name: str
+    start: float      # seconds since the creation of the timer
+    duration: float   # wall clock seconds, including the nested stages
+    pid: int = 0
+    rss_start: Optional[int] = None
+    rss_end: Optional[int] = None
+    peak_rss: Optional[int] = None            # high-water mark of the process at the end of the stage
+    peak_rss_increase: Optional[int] = None   # how much the stage raised the high-water mark
+    peak_children_rss: Optional[int] = None   # largest terminated child process (e.g. FasterCap) so far
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def rss_delta(self) -> Optional[int]:
+        if self.rss_start is None or self.rss_end is None:
+            return None
+        return self.rss_end - self.rss_start
+
+
+@dataclass
+class StageTotals:
+    count: int = 0
+    duration: float = 0.0
+    max_rss_delta: Optional[int] = None
+    peak_rss: Optional[int] = None
+    peak_rss_increase: Optional[int] = None
+    peak_children_rss: Optional[int] = None
+
+    def add(self, timing: StageTiming):
+        def max_of(a: Optional[int], b: Optional[int]) -> Optional[int]:
+            return b if a is None else (a if b is None else max(a, b))
+
+        self.count += 1
+        self.duration += timing.duration
+        self.max_rss_delta = max_of(self.max_rss_delta, timing.rss_delta)
+        self.peak_rss = max_of(self.peak_rss, timing.peak_rss)
+        if timing.peak_rss_increase is not None:
+            self.peak_rss_increase = (self.peak_rss_increase or 0) + timing.peak_rss_increase
+        self.peak_children_rss = max_of(self.peak_children_rss, timing.peak_children_rss)
+
+
+@dataclass
+class StageTimerExport:
+    """
+    Picklable timings, profiles and metrics, e.g. of a worker process (see StageTimer.merge)
+    """
+    origin: float
+    timings: List[StageTiming]
+    profile_stats: Dict[StagePath, ProfileStats]
+    metrics: Metrics
+
+
+class _ProfileStatsHolder:
+    # NOTE: pstats.Stats loads any object with create_stats() and stats
+    def __init__(self, stats: ProfileStats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class StageTimer:
+    """
+    Times the stages of a run (LVS, extraction context, engine passes, solver runs, ...),
+    which are nested per thread, e.g. 'k25d/overlap',
+    and measures their memory usage (see StageTiming).
+
+    The timer also collects the metrics of the run (geometry volume, callback counts, ...),
+    see count_metric() and record_metric().
+
+    Optionally, each stage is profiled (cProfile), one profile per stage path,
+    accumulated over all runs of the stage (e.g. the overlap passes of all layers).
+
+    NOTE: a profile only covers its own stage, excluding the nested stages
+          (the profiler of the enclosing stage is paused), while the timings include them.
+
+    NOTE: only one thread is profiled at a time (e.g. of concurrently running engines),
+          as since Python 3.12 only a single profiler can be active per process (sys.monitoring).
+          While a thread profiles its stages, the stages started by other threads are only timed.
+    """
+
+    def __init__(self, profile: bool = False):
+        self.profile = profile
+        self.origin = time.time()
+        self.timings: List[StageTiming] = []
+        self._lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._profiles: Dict[StagePath, cProfile.Profile] = {}
+        self._profiling_thread_id: Optional[int] = None
+        self._merged_profile_stats: Dict[StagePath, List[ProfileStats]] = {}
+        self.metrics: Metrics = {}
+
+    def _stack(self) -> List[Tuple[StagePath, Optional[cProfile.Profile]]]:
+        stack = getattr(self._thread_local, 'stack', None)
+        if stack is None:
+            stack = []
+            self._thread_local.stack = stack
+        return stack
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StagePath]:
+        stack = self._stack()
+        path = name if len(stack) == 0 else f"{stack[-1][0]}/{name}"
+
+        profiler: Optional[cProfile.Profile] = None
+        if self.profile:
+            thread_id = threading.get_ident()
+            with self._lock:
+                if self._profiling_thread_id in (None, thread_id):
+                    self._profiling_thread_id = thread_id
+                    profiler = self._profiles.get(path)
+                    if profiler is None:
+                        profiler = cProfile.Profile()
+                        self._profiles[path] = profiler
+            if profiler is not None and len(stack) >= 1 and stack[-1][1] is not None:
+                stack[-1][1].disable()
+
+        stack.append((path, profiler))
+        rss_start = current_rss()
+        peak_rss_start = peak_rss()
+        start = time.time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield path
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            duration = time.time() - start
+            stack.pop()
+            if profiler is not None:
+                if len(stack) >= 1 and stack[-1][1] is not None:
+                    stack[-1][1].enable()
+                elif all(p is None for _, p in stack):
+                    with self._lock:
+                        self._profiling_thread_id = None  # NOTE: other threads may profile now
+            peak_rss_end = peak_rss()
+            timing = StageTiming(path=path,
+                                 thread_name=threading.current_thread().name,
+                                 start=start - self.origin,
+                                 duration=duration,
+                                 pid=os.getpid(),
+                                 rss_start=rss_start,
+                                 rss_end=current_rss(),
+                                 peak_rss=peak_rss_end,
+                                 peak_rss_increase=None if peak_rss_start is None
+                                                   else peak_rss_end - peak_rss_start,
+                                 peak_children_rss=peak_children_rss())
+            with self._lock:
+                self.timings.append(timing)
+
+    def count_metric(self, group: MetricGroup, key: str, value: int = 1):
+        with self._lock:
+            values = self.metrics.setdefault(group, {})
+            values[key] = values.get(key, 0) + value
+
+    def record_metric(self, group: MetricGroup, key: str, value: int):
+        with self._lock:
+            self.metrics.setdefault(group, {})[key] = value
+
+    def export(self) -> StageTimerExport:
+        profile_stats: Dict[StagePath, ProfileStats] = {}
+        for path, profiler in self._profiles.items():
+            profiler.create_stats()
+            profile_stats[path] = profiler.stats
+        with self._lock:
+            return StageTimerExport(origin=self.origin,
+                                    timings=list(self.timings),
+                                    profile_stats=profile_stats,
+                                    metrics={group: dict(values) for group, values in self.metrics.items()})
+
+    def merge(self, exported: StageTimerExport):
+        """
+        Merges the timings, profiles and metrics of another timer (e.g. of a worker process),
+        nesting its stages into the current stage of this thread.
+        The metrics are added up.
+        """
+        stack = self._stack()
+        prefix = '' if len(stack) == 0 else f"{stack[-1][0]}/"
+        with self._lock:
+            for t in exported.timings:
+                self.timings.append(replace(t,
+                                            path=f"{prefix}{t.path}",
+                                            start=t.start + exported.origin - self.origin))
+            for path, stats in exported.profile_stats.items():
+                self._merged_profile_stats.setdefault(f"{prefix}{path}", []).append(stats)
+            for group, values in exported.metrics.items():
+                merged_values = self.metrics.setdefault(group, {})
+                for key, value in values.items():
+                    merged_values[key] = merged_values.get(key, 0) + value
+
+    def totals(self) -> Dict[StagePath, StageTotals]:
+        """
+        :return: the totals per stage path (in the order of the first start)
+        """
+        totals: Dict[StagePath, StageTotals] = {}
+        for t in sorted(self.timings, key=lambda t: t.start):
+            totals.setdefault(t.path, StageTotals()).add(t)
+        return totals
+
+    def log_summary(self):
+        rule('Stage timing summary')
+        for path, totals in self.totals().items():
+            runs = '' if totals.count == 1 else f" ({totals.count} runs)"
+            memory = ''
+            if totals.max_rss_delta is not None:
+                sign = '+' if totals.max_rss_delta >= 0 else ''
+                memory += f", RSS {sign}{format_bytes(totals.max_rss_delta)}"
+            if totals.peak_rss is not None:
+                memory += f", peak RSS {format_bytes(totals.peak_rss)}"
+                if totals.peak_rss_increase:
+                    memory += f" (raised by {format_bytes(totals.peak_rss_increase)})"
+            info(f"{path}: {'%.4g' % totals.duration}s{runs}{memory}")
+
+    def log_metrics_summary(self, max_entries_per_group: int = 20):
+        """
+        Logs the metrics, for each group only the largest entries (the metrics file has all of them)
+        """
+        if len(self.metrics) == 0:
+            return
+        rule('Run metrics')
+        for group, values in self.metrics.items():
+            info(f"{group}: {sum(values.values()):,} in total")
+            largest = sorted(values.items(), key=lambda kv: kv[1], reverse=True)
+            for key, value in largest[:max_entries_per_group]:
+                info(f"    {key}: {value:,}")
+            if len(largest) > max_entries_per_group:
+                info(f"    … {len(largest) - max_entries_per_group} more")
+
+    def write_json(self, path: str):
+        content = {
+            'stages': [asdict(t) for t in sorted(self.timings, key=lambda t: t.start)],
+            'totals': {p: {'count': totals.count, 'duration': totals.duration}
+                       for p, totals in self.totals().items()}
+        }
+        with open(path, 'w') as f:
+            json.dump(content, f, indent=2)
+
+    def write_metrics_json(self, path: str):
+        content = {
+            'stages': {p: asdict(totals) for p, totals in self.totals().items()},
+            'metrics': self.metrics
+        }
+        with open(path, 'w') as f:
+            json.dump(content, f, indent=2)
+
+    @staticmethod
+    def profile_file_name(path: StagePath) -> str:
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', path.replace('/', '.')) + '.pstats'
+
+    def write_profiles(self, dir_path: str) -> List[str]:
+        """
+        Writes one .pstats file per stage path (see profile_file_name)
+
+        :return: the paths of the written files
+        """
+        os.makedirs(dir_path, exist_ok=True)
+        written_paths = []
+        for path in sorted(set(self._profiles.keys()) | set(self._merged_profile_stats.keys())):
+            stats_list = [_ProfileStatsHolder(s) for s in self._merged_profile_stats.get(path, [])]
+            profiler = self._profiles.get(path)
+            if profiler is not None:
+                profiler.create_stats()
+                stats_list.insert(0, profiler)
+            stats = pstats.Stats(*stats_list)
+            file_path = os.path.join(dir_path, self.profile_file_name(path))
+            stats.dump_stats(file_path)
+            written_paths.append(file_path)
+        return written_paths
+
+
+_stage_timer: Optional[StageTimer] = None
+
+
+def stage_timer() -> Optional[StageTimer]:
+    return _stage_timer
+
+
+def set_stage_timer(timer: Optional[StageTimer]) -> Optional[StageTimer]:
+    """
+    Sets the timer used by stage() (None: stages are not timed)
+
+    :return: the previous timer
+    """
+    global _stage_timer
+    previous = _stage_timer
+    _stage_timer = timer
+    return previous
+
+
+def stage(name: str) -> ContextManager[Optional[StagePath]]:
+    """
+    Times (and optionally profiles) a stage using the current timer (if any),
+    nested into the current stage of the thread:
+
+        with stage('overlap'):
+            ...
+    """
+    if _stage_timer is None:
+        return nullcontext()
+    return _stage_timer.stage(name)
+
+
+def count_metric(group: MetricGroup, key: str, value: int = 1):
+    """
+    Adds to a metric of the current timer (if any), e.g. count_metric('edge neighborhood callbacks', 'met1', n)
+    """
+    if _stage_timer is not None:
+        _stage_timer.count_metric(group=group, key=key, value=value)
+
+
+def record_metric(group: MetricGroup, key: str, value: int):
+    """
+    Sets a metric of the current timer (if any), e.g. record_metric('layer polygons', 'met1_con', n)
+    """
+    if _stage_timer is not None:
+        _stage_timer.record_metric(group=group, key=key, value=value)
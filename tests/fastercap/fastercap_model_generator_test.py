@@ -96,6 +96,10 @@ def test_fastercap_model_generator(tmp_path):
     # self-check
     gen.check()
 
+    triangle_counts = gen.triangle_counts_by_net()
+    assert {nn: len(gen._collect_cond_tris(nn)) for nn in ('Net1', 'Net2')} == triangle_counts
+    assert all(count > 0 for count in triangle_counts.values())
+
     output_dir_path_fc = os.path.join(tmp_path, 'FasterCap')
     output_dir_path_stl = os.path.join(tmp_path, 'STL')
     os.makedirs(output_dir_path_fc)
@@ -0,0 +1,141 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+import os
+import tempfile
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.klayout.extraction_context_cache import ExtractionContextCache, ExtractionContextCacheKey
+from klayout_pex.klayout.lvsdb_extractor import KLayoutExtractionContext
+from klayout_pex.tech_info import TechInfo
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("LVSDB", "KLayout", "Cache")
+class ExtractionContextCacheTest(unittest.TestCase):
+    @property
+    def lvsdb_path(self) -> str:
+        return os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                             'testdata', 'fastercap', 'nmos_diode2.lvsdb.gz'))
+
+    @property
+    def tech_info_json_path(self) -> str:
+        return os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                             'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory(prefix='context_cache_')
+        self.cache = ExtractionContextCache(cache_dir_path=self.tmp_dir.name, max_size_bytes=1 << 30)
+        self.key = ExtractionContextCacheKey(lvsdb_path=self.lvsdb_path,
+                                             tech_pbjson_path=self.tech_info_json_path,
+                                             top_cell='nmos_diode2',
+                                             blackbox_devices=False,
+                                             tool_version='test')
+        self.tech = TechInfo.from_json(self.tech_info_json_path, dielectric_filter=None)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_lvsdb(self) -> kdb.LayoutVsSchematic:
+        lvsdb = kdb.LayoutVsSchematic()
+        lvsdb.read(self.lvsdb_path)
+        return lvsdb
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.lookup(key=self.key, lvsdb=self.read_lvsdb(), tech=self.tech,
+                                            blackbox_devices=False))
+
+    def test_digest_depends_on_options(self):
+        other_key = ExtractionContextCacheKey(lvsdb_path=self.lvsdb_path,
+                                              tech_pbjson_path=self.tech_info_json_path,
+                                              top_cell='nmos_diode2',
+                                              blackbox_devices=True,
+                                              tool_version='test')
+        self.assertNotEqual(self.key.digest, other_key.digest)
+
+    def prepare_extraction(self) -> KLayoutExtractionContext:
+        return KLayoutExtractionContext.prepare_extraction(top_cell='nmos_diode2',
+                                                           lvsdb=self.read_lvsdb(),
+                                                           tech=self.tech,
+                                                           blackbox_devices=False)
+
+    def test_round_trip(self):
+        pex_context = self.prepare_extraction()
+        self.cache.store(key=self.key, pex_context=pex_context)
+
+        restored = self.cache.lookup(key=self.key, lvsdb=self.read_lvsdb(), tech=self.tech,
+                                     blackbox_devices=False)
+        self.assertIsNotNone(restored)
+        self.assertEqual(pex_context.layer_index_map, restored.layer_index_map)
+        self.assertEqual(list(pex_context.extracted_layers.keys()), list(restored.extracted_layers.keys()))
+        for gds_pair, lyr in pex_context.extracted_layers.items():
+            self.assertEqual(pex_context.shapes_of_layer(gds_pair).count(),
+                             restored.shapes_of_layer(gds_pair).count())
+            self.assertEqual(pex_context.shapes_by_net(gds_pair).keys(),
+                             restored.shapes_by_net(gds_pair).keys())
+        self.assertEqual(pex_context.devices_by_name, restored.devices_by_name)
+        self.assertEqual(dict(pex_context.pins_pb2_by_layer), restored.pins_pb2_by_layer)
+
+    def test_identical_shapes_survive(self):
+        pex_context = self.prepare_extraction()
+        layout = pex_context.annotated_layout
+        layer_index = next(iter(pex_context.layer_index_map.values()))
+        shapes = pex_context.annotated_top_cell.shapes(layer_index)
+        box = kdb.Box(0, 0, 100, 100)
+        for _ in range(3):
+            shapes.insert(box)
+        expected_count = shapes.size()
+        self.cache.store(key=self.key, pex_context=pex_context)
+
+        restored = self.cache.lookup(key=self.key, lvsdb=self.read_lvsdb(), tech=self.tech,
+                                     blackbox_devices=False)
+        restored_shapes = restored.annotated_top_cell.shapes(layer_index)
+        self.assertEqual(expected_count, restored_shapes.size())
+        restored_boxes = [s for s in restored_shapes.each() if s.is_box() and s.box == box]
+        self.assertEqual(3, len(restored_boxes))
+        for s in restored_boxes:
+            self.assertFalse(s.has_prop_id())
+        self.assertEqual(layout.dbu, restored.annotated_layout.dbu)
+
+    def test_evicts_least_recently_used(self):
+        pex_context = self.prepare_extraction()
+        other_key = ExtractionContextCacheKey(lvsdb_path=self.lvsdb_path,
+                                              tech_pbjson_path=self.tech_info_json_path,
+                                              top_cell='nmos_diode2',
+                                              blackbox_devices=True,
+                                              tool_version='test')
+        self.cache.store(key=self.key, pex_context=pex_context)
+        self.cache.store(key=other_key, pex_context=pex_context)
+        self.assertTrue(os.path.isdir(self.cache.entry_path(self.key)))
+
+        self.cache.max_size_bytes = 1  # NOTE: only the most recently stored entry is kept
+        self.cache.store(key=self.key, pex_context=pex_context)
+        self.assertTrue(os.path.isdir(self.cache.entry_path(self.key)))
+        self.assertFalse(os.path.isdir(self.cache.entry_path(other_key)))
+        self.assertIsNone(self.cache.lookup(key=other_key, lvsdb=self.read_lvsdb(), tech=self.tech,
+                                            blackbox_devices=True))
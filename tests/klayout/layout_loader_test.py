@@ -0,0 +1,57 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+import os
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.klayout.layout_loader import LayoutLoader
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Layout", "KLayout")
+class LayoutLoaderTest(unittest.TestCase):
+    @property
+    def gds_path(self) -> str:
+        return os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                             'testdata', 'designs', 'sky130A', 'sky130_fd_sc_hs__a2111o_1',
+                                             'sky130_fd_sc_hs.gds.gz'))
+
+    def test_hierarchy_info_matches_full_load(self):
+        layout = kdb.Layout()
+        layout.read(self.gds_path)
+
+        hierarchy_info = LayoutLoader().hierarchy_info(self.gds_path)
+        self.assertEqual(layout.dbu, hierarchy_info.dbu)
+        self.assertEqual(sorted(c.name for c in layout.each_cell()), sorted(hierarchy_info.cell_names))
+        self.assertEqual(sorted(c.name for c in layout.top_cells()), sorted(hierarchy_info.top_cell_names))
+
+    def test_layout_is_loaded_once(self):
+        loader = LayoutLoader()
+        layout = loader.layout(self.gds_path)
+        self.assertIs(layout, loader.layout(self.gds_path))
+        self.assertGreater(len(layout.layer_indexes()), 0)
@@ -0,0 +1,134 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+from dataclasses import replace
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from klayout_pex.klayout.lvsdb_cache import LVSDBCache, LVSDBCacheKey
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("LVS", "Cache")
+class LVSDBCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory(prefix='lvsdb_cache_')
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+
+    @property
+    def dest_path(self) -> str:
+        return os.path.join(self.tmp_dir.name, 'dest.lvsdb.gz')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_file(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def key(self, gds_content: bytes = b'gds') -> LVSDBCacheKey:
+        return LVSDBCacheKey(gds_path=self.write_file(f"{gds_content.decode()}.gds", gds_content),
+                             cell_name='TOP',
+                             schematic_path=self.write_file('top.spice', b'.subckt TOP\n.ends\n'),
+                             lvs_script_path=self.write_file('pdk.lvs', b'lvs'),
+                             pdk='sky130A',
+                             tool_version='kpex 0.1, KLayout 0.30.0')
+
+    def test_digest_depends_on_content(self):
+        key = self.key()
+        self.assertEqual(key.digest, self.key().digest)
+        self.assertNotEqual(key.digest, self.key(gds_content=b'other').digest)
+        self.assertNotEqual(key.digest, replace(key, cell_name='OTHER').digest)
+        self.assertNotEqual(key.digest, replace(key, tool_version='kpex 0.2, KLayout 0.30.0').digest)
+
+    def test_miss_and_hit(self):
+        cache = LVSDBCache(cache_dir_path=self.cache_dir, max_size_bytes=1000)
+        key = self.key()
+        self.assertFalse(cache.lookup(key, self.dest_path))
+        self.assertFalse(os.path.exists(self.dest_path))
+
+        cache.store(key, self.write_file('out.lvsdb.gz', b'lvsdb'))
+        self.assertTrue(cache.lookup(key, self.dest_path))
+        with open(self.dest_path, 'rb') as f:
+            self.assertEqual(b'lvsdb', f.read())
+
+    def test_removed_entry_is_a_miss(self):
+        cache = LVSDBCache(cache_dir_path=self.cache_dir, max_size_bytes=1000)
+        key = self.key()
+        cache.store(key, self.write_file('out.lvsdb.gz', b'lvsdb'))
+        os.remove(cache.entry_path(key))
+        self.assertFalse(cache.lookup(key, self.dest_path))
+
+    def test_lru_eviction(self):
+        cache = LVSDBCache(cache_dir_path=self.cache_dir, max_size_bytes=25)
+        lvsdb_path = self.write_file('out.lvsdb.gz', b'0123456789')
+        key_a, key_b, key_c = self.key(b'a'), self.key(b'b'), self.key(b'c')
+        cache.store(key_a, lvsdb_path)
+        cache.store(key_b, lvsdb_path)
+        self.assertTrue(cache.lookup(key_a, self.dest_path))  # NOTE: b is now the least recently used
+        cache.store(key_c, lvsdb_path)
+        self.assertTrue(cache.lookup(key_a, self.dest_path))
+        self.assertFalse(cache.lookup(key_b, self.dest_path))
+        self.assertTrue(cache.lookup(key_c, self.dest_path))
+        self.assertFalse(os.path.exists(cache.entry_path(key_b)))
+
+    def test_failed_store_leaves_no_temp_file(self):
+        cache = LVSDBCache(cache_dir_path=self.cache_dir, max_size_bytes=1000)
+        key = self.key()
+        with patch('klayout_pex.klayout.lvsdb_cache.shutil.copyfile', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                cache.store(key, self.write_file('out.lvsdb.gz', b'lvsdb'))
+        self.assertEqual([], [f for f in os.listdir(self.cache_dir) if f.endswith('.tmp')])
+        self.assertFalse(cache.lookup(key, self.dest_path))
+
+    @unittest.skipIf(fcntl is None, "requires fcntl")
+    def test_lookup_copies_while_locked(self):
+        cache = LVSDBCache(cache_dir_path=self.cache_dir, max_size_bytes=1000)
+        key = self.key()
+        cache.store(key, self.write_file('out.lvsdb.gz', b'lvsdb'))
+
+        original_copyfile = shutil.copyfile
+
+        def copyfile(src: str, dst: str):
+            # NOTE: a parallel run (e.g. evicting the entry) must not get the lock during the copy
+            with open(os.path.join(self.cache_dir, LVSDBCache.LOCK_FILE_NAME), 'a') as lock_file:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            original_copyfile(src, dst)
+
+        with patch('klayout_pex.klayout.lvsdb_cache.shutil.copyfile', side_effect=copyfile) as patched:
+            self.assertTrue(cache.lookup(key, self.dest_path))
+            self.assertEqual(1, patched.call_count)
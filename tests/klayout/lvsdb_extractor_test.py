@@ -0,0 +1,123 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+import os
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.klayout.lvsdb_extractor import KLayoutExtractionContext
+from klayout_pex.tech_info import TechInfo
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("LVSDB", "KLayout")
+class KLayoutExtractionContextTest(unittest.TestCase):
+    @property
+    def klayout_testdata_dir(self) -> str:
+        return os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                             'testdata', 'fastercap'))
+
+    @property
+    def tech_info_json_path(self) -> str:
+        return os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                             'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+
+    def setUp(self):
+        cell_name = 'nmos_diode2'
+
+        lvsdb = kdb.LayoutVsSchematic()
+        lvsdb.read(os.path.join(self.klayout_testdata_dir, f"{cell_name}.lvsdb.gz"))
+
+        tech = TechInfo.from_json(self.tech_info_json_path,
+                                  dielectric_filter=None)
+
+        self.pex_context = KLayoutExtractionContext.prepare_extraction(top_cell=cell_name,
+                                                                       lvsdb=lvsdb,
+                                                                       tech=tech,
+                                                                       blackbox_devices=False)
+
+    def test_shapes_by_net_partitions_layer(self):
+        for gds_pair in self.pex_context.extracted_layers.keys():
+            shapes_by_net = self.pex_context.shapes_by_net(gds_pair)
+            self.assertIsNotNone(shapes_by_net)
+
+            layer_shapes = self.pex_context.shapes_of_layer(gds_pair)
+            self.assertEqual(layer_shapes.count(),
+                             sum(r.count() for r in shapes_by_net.values()))
+
+    def test_shapes_by_net_is_cached(self):
+        gds_pair = next(iter(self.pex_context.extracted_layers.keys()))
+        self.assertIs(self.pex_context.shapes_by_net(gds_pair),
+                      self.pex_context.shapes_by_net(gds_pair))
+
+    def scan_shapes_of_net(self, gds_pair, net_name: str) -> kdb.Region:
+        """
+        Independent per-net scan of the source layers (the former shapes_of_net implementation)
+        """
+        shapes = kdb.Region()
+        for sl in self.pex_context.extracted_layers[gds_pair].source_layers:
+            iter, transform = sl.region.begin_shapes_rec()
+            while not iter.at_end():
+                shape = iter.shape()
+                if shape.property('net') == net_name:
+                    shapes.insert(transform * iter.trans() * shape.polygon)
+                iter.next()
+        return shapes
+
+    def test_warm_caches(self):
+        self.pex_context.warm_caches()
+        self.assertEqual(set(self.pex_context.extracted_layers.keys()),
+                         set(self.pex_context.shapes_by_net_by_gds_pair.keys()))
+        for name in ('top_circuit', 'devices_by_name', 'pins_pb2_by_layer'):
+            self.assertIn(name, self.pex_context.__dict__)
+
+    def test_shapes_of_net(self):
+        non_empty_count = 0
+        for net in self.pex_context.top_circuit.each_net():
+            for gds_pair in self.pex_context.extracted_layers.keys():
+                shapes = self.pex_context.shapes_of_net(gds_pair, net)
+                self.assertIsNotNone(shapes)
+                expected_shapes = self.scan_shapes_of_net(gds_pair, net.name)
+                self.assertEqual(expected_shapes.count(), shapes.count())
+                self.assertTrue((expected_shapes ^ shapes).is_empty())
+                if not shapes.is_empty():
+                    non_empty_count += 1
+        self.assertGreater(non_empty_count, 0)
+
+    def test_shapes_of_net_returns_copy(self):
+        gds_pair, net_name, expected_count = next((gds_pair, net_name, shapes.count())
+                                                  for gds_pair in self.pex_context.extracted_layers.keys()
+                                                  for net_name, shapes in
+                                                  self.pex_context.shapes_by_net(gds_pair).items()
+                                                  if not shapes.is_empty())
+        shapes = self.pex_context.shapes_of_net(gds_pair, net_name)
+        shapes.insert(kdb.Box(0, 0, 1, 1))
+        self.assertEqual(expected_count, self.pex_context.shapes_by_net(gds_pair)[net_name].count())
+        self.assertEqual(expected_count, self.pex_context.shapes_of_net(gds_pair, net_name).count())
+
+    def test_shapes_of_net_unknown_layer(self):
+        self.assertIsNone(self.pex_context.shapes_of_net((9999, 9999), 'VDD'))
@@ -0,0 +1,84 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.klayout.pin_label_join import PinLabelJoin
+
+
+def _pin(left: int, bottom: int, right: int, top: int, net: str) -> kdb.PolygonWithProperties:
+    return kdb.PolygonWithProperties(kdb.Polygon(kdb.Box(left, bottom, right, top)), {'net': net})
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Pins", "Labels", "KLayout")
+class PinLabelJoinTest(unittest.TestCase):
+    def test_matched(self):
+        pins = [_pin(0, 0, 100, 100, 'A'), _pin(1000, 0, 1100, 100, 'B')]
+        labels = [kdb.Text('a', kdb.Trans(50, 50)), kdb.Text('b', kdb.Trans(1050, 50))]
+        result = PinLabelJoin(pins).join(labels)
+        self.assertEqual(['A', 'B'], [p.property('net') for l, p in result.matched])
+        self.assertEqual([], result.unmatched)
+        self.assertEqual([], result.ambiguous)
+
+    def test_label_on_pin_edge(self):
+        pins = [_pin(0, 0, 100, 100, 'A')]
+        labels = [kdb.Text('a', kdb.Trans(100, 100))]
+        result = PinLabelJoin(pins).join(labels)
+        self.assertEqual(1, len(result.matched))
+
+    def test_unmatched(self):
+        pins = [_pin(0, 0, 100, 100, 'A')]
+        labels = [kdb.Text('a', kdb.Trans(500, 500))]
+        result = PinLabelJoin(pins).join(labels)
+        self.assertEqual([], result.matched)
+        self.assertEqual(['a'], [l.string for l in result.unmatched])
+
+    def test_ambiguous(self):
+        pins = [_pin(0, 0, 100, 100, 'A'), _pin(50, 50, 150, 150, 'B')]
+        labels = [kdb.Text('ab', kdb.Trans(75, 75))]
+        result = PinLabelJoin(pins).join(labels)
+        self.assertEqual(1, len(result.ambiguous))
+        self.assertEqual('A', result.matched[0][1].property('net'))  # first pin wins
+
+    def test_overlapping_pins_of_same_net_are_not_ambiguous(self):
+        pins = [_pin(0, 0, 100, 100, 'A'), _pin(50, 50, 150, 150, 'A')]
+        labels = [kdb.Text('a', kdb.Trans(75, 75))]
+        result = PinLabelJoin(pins).join(labels)
+        self.assertEqual(1, len(result.matched))
+        self.assertEqual([], result.ambiguous)
+
+    def test_oversized_pin(self):
+        pins = [_pin(0, 0, 10, 10, 'A'), _pin(20, 20, 30, 30, 'A'), _pin(0, 1000, 100000, 100000, 'BIG')]
+        labels = [kdb.Text('big', kdb.Trans(90000, 90000)), kdb.Text('a', kdb.Trans(5, 5))]
+        join = PinLabelJoin(pins)
+        self.assertEqual([2], join.oversized_pin_indices)
+        result = join.join(labels)
+        self.assertEqual(['BIG', 'A'], [p.property('net') for l, p in result.matched])
+
+    def test_no_pins(self):
+        result = PinLabelJoin([]).join([kdb.Text('a', kdb.Trans(0, 0))])
+        self.assertEqual(1, len(result.unmatched))
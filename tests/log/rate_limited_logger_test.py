@@ -0,0 +1,67 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import unittest
+
+from klayout_pex.log import (
+    LogLevel,
+    RateLimitedLogger,
+)
+
+
+class NotFormattable:
+    def __str__(self) -> str:
+        raise AssertionError("message formatted although it is not logged")
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Log")
+class RateLimitedLoggerTest(unittest.TestCase):
+    def test_only_first_messages_logged_and_rest_summarized(self):
+        log = RateLimitedLogger('sidewall contributions', level=LogLevel.INFO, max_messages=3)
+        with self.assertLogs('__kpex__', level=LogLevel.INFO) as cm:
+            for i in range(12_345 + 3):
+                log("contribution %d", i)
+            log.log_summary()
+        self.assertEqual(['contribution 0', 'contribution 1', 'contribution 2',
+                          '12,345 sidewall contributions suppressed (only the first 3 are logged)'],
+                         [r.getMessage() for r in cm.records])
+        self.assertEqual(0, log.suppressed_count)
+
+    def test_hidden_level_not_formatted(self):
+        log = RateLimitedLogger('overlap contributions', level=LogLevel.DEBUG)
+        with self.assertNoLogs('__kpex__', level=LogLevel.INFO):
+            self.assertFalse(log.enabled())
+            log("contribution %s", NotFormattable())
+            log.log_summary()
+        self.assertEqual(0, log.logged_count)
+        self.assertEqual(0, log.suppressed_count)
+
+    def test_debug_level_not_limited(self):
+        log = RateLimitedLogger('overlap contributions', level=LogLevel.DEBUG, max_messages=1)
+        with self.assertLogs('__kpex__', level=LogLevel.DEBUG) as cm:
+            for i in range(5):
+                log("contribution %d", i)
+            log.log_summary()
+        self.assertEqual(5, len(cm.records))
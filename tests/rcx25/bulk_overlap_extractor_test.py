@@ -0,0 +1,155 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+from types import SimpleNamespace
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.rcx25.c.bulk_overlap_extractor import BulkOverlapExtractor
+from klayout_pex.rcx25.c.overlap_extractor import OverlapExtractor
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.extraction_results import *
+
+import klayout_pex_protobuf.kpex.tech.process_parasitics_pb2 as process_parasitics_pb2
+
+from klayout_pex.rcx25.hierarchy import INSTANCE_PROPERTY
+
+from tests.rcx25.region_helpers import region
+
+
+def overlap_spec(capacitance: float) -> process_parasitics_pb2.CapacitanceInfo.OverlapCapacitance:
+    spec = process_parasitics_pb2.CapacitanceInfo.OverlapCapacitance()
+    spec.capacitance = capacitance
+    return spec
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Overlap")
+class BulkOverlapExtractorTest(unittest.TestCase):
+    @staticmethod
+    def extract(layer_regions_by_name: Dict[LayerName, kdb.Region],
+                extractor_class: type = BulkOverlapExtractor) -> Dict[OverlapKey, float]:
+        tech_info = SimpleNamespace(
+            internal_substrate_layer_name='VSUBS',
+            overlap_cap_by_layer_names={
+                'm1': {'VSUBS': overlap_spec(10.0)},
+                'm2': {'VSUBS': overlap_spec(5.0), 'm1': overlap_spec(100.0)},
+                'm3': {'VSUBS': overlap_spec(2.0), 'm1': overlap_spec(40.0), 'm2': overlap_spec(80.0)},
+            },
+            side_overlap_cap_by_layer_names={},
+            sidewall_cap_by_layer_name={}
+        )
+        results = CellExtractionResults(cell_name='TOP')
+        extractor = extractor_class(all_layer_names=list(layer_regions_by_name.keys()),
+                                    layer_regions_by_name=layer_regions_by_name,
+                                    dbu=0.001,
+                                    tech_info=tech_info,
+                                    results=results,
+                                    report=ExtractionReporter(cell_name='TOP', dbu=0.001))
+        extractor.extract()
+        return {key: sum(c.cap_value for c in caps) for key, caps in results.overlap_table.items()}
+
+    def test_overlap_and_shielding(self):
+        # NOTE: 10x10 µm substrate, m1 covers the left half, m2 the whole area
+        caps = self.extract({
+            'VSUBS': region((kdb.Box(0, 0, 10000, 10000), None)),
+            'm1': region((kdb.Box(0, 0, 5000, 10000), 'A')),
+            'm2': region((kdb.Box(0, 0, 10000, 10000), 'B')),
+        })
+        self.assertAlmostEqual(0.5, caps[OverlapKey('m1', 'A', 'VSUBS', 'VSUBS')])  # 50 µm^2 * 10 aF/µm^2
+        self.assertAlmostEqual(0.25, caps[OverlapKey('m2', 'B', 'VSUBS', 'VSUBS')])  # only the unshielded half
+        self.assertAlmostEqual(5.0, caps[OverlapKey('m2', 'B', 'm1', 'A')])
+        self.assertEqual(3, len(caps))
+
+    def test_areas_summed_per_net_pair(self):
+        caps = self.extract({
+            'VSUBS': region(),
+            'm1': region((kdb.Box(0, 0, 1000, 1000), 'A'),
+                         (kdb.Box(2000, 0, 3000, 1000), 'A'),
+                         (kdb.Box(4000, 0, 5000, 1000), 'C')),
+            'm2': region((kdb.Box(0, 0, 5000, 1000), 'B')),
+        })
+        self.assertAlmostEqual(0.2, caps[OverlapKey('m2', 'B', 'm1', 'A')])
+        self.assertAlmostEqual(0.1, caps[OverlapKey('m2', 'B', 'm1', 'C')])
+
+    def test_overlapping_shapes_counted_once(self):
+        caps = self.extract({
+            'VSUBS': region(),
+            'm1': region((kdb.Box(0, 0, 1000, 1000), 'A'),
+                         (kdb.Box(0, 0, 1000, 1000), 'A'),
+                         (kdb.Box(500, 0, 1500, 1000), 'A')),
+            'm2': region((kdb.Box(0, 0, 2000, 1000), 'B'),
+                         (kdb.Box(0, 0, 1000, 1000), 'B')),
+        })
+        self.assertAlmostEqual(0.15, caps[OverlapKey('m2', 'B', 'm1', 'A')])
+
+    def test_same_net_is_skipped(self):
+        caps = self.extract({
+            'VSUBS': region(),
+            'm1': region((kdb.Box(0, 0, 1000, 1000), 'A')),
+            'm2': region((kdb.Box(0, 0, 1000, 1000), 'A')),
+        })
+        self.assertEqual({}, caps)
+
+
+    def assertCapsEqual(self, expected: Dict[OverlapKey, float], obtained: Dict[OverlapKey, float]):
+        self.assertEqual(set(expected.keys()), set(obtained.keys()))
+        for key, value in expected.items():
+            self.assertAlmostEqual(value, obtained[key], places=6)
+
+    def test_same_net_does_not_shield_like_visitor(self):
+        # NOTE: the m2 shape of net A lies between A and B, but doesn't shield A from B
+        layer_regions_by_name = {
+            'VSUBS': region((kdb.Box(0, 0, 10000, 10000), None)),
+            'm1': region((kdb.Box(0, 0, 4000, 4000), 'A')),
+            'm2': region((kdb.Box(0, 0, 2000, 4000), 'A'),
+                         (kdb.Box(3000, 0, 4000, 4000), 'C')),
+            'm3': region((kdb.Box(0, 0, 10000, 10000), 'B')),
+        }
+        expected = self.extract(layer_regions_by_name, extractor_class=OverlapExtractor)
+        obtained = self.extract(layer_regions_by_name)
+        self.assertAlmostEqual(0.48, obtained[OverlapKey('m3', 'B', 'm1', 'A')])  # 4x4 µm^2 minus C's 1x4 µm^2
+        self.assertCapsEqual(expected, obtained)
+
+    def test_same_net_of_other_instance_does_not_shield_like_visitor(self):
+        def instance_region(*boxes_nets_and_instances: Tuple[kdb.Box, str, int]) -> kdb.Region:
+            r = kdb.Region()
+            r.enable_properties()
+            for box, net, instance in boxes_nets_and_instances:
+                r.insert(kdb.PolygonWithProperties(kdb.Polygon(box), {'net': net, INSTANCE_PROPERTY: instance}))
+            return r
+
+        layer_regions_by_name = {
+            'VSUBS': region((kdb.Box(0, 0, 10000, 10000), None)),
+            'm1': instance_region((kdb.Box(0, 0, 4000, 4000), 'A', 0)),
+            'm2': instance_region((kdb.Box(0, 0, 2000, 4000), 'A', 1),
+                                  (kdb.Box(3000, 0, 4000, 4000), 'C', 0)),
+            'm3': instance_region((kdb.Box(0, 0, 10000, 10000), 'B', 1)),
+        }
+        expected = self.extract(layer_regions_by_name, extractor_class=OverlapExtractor)
+        obtained = self.extract(layer_regions_by_name)
+        self.assertAlmostEqual(0.48, obtained[OverlapKey('m3', 'B', 'm1', 'A')])
+        self.assertNotIn(OverlapKey('m2', 'C', 'm1', 'A'), obtained)  # intra instance
+        self.assertCapsEqual(expected, obtained)
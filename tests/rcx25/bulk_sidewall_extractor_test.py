@@ -0,0 +1,130 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import os
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.rcx25.c.bulk_sidewall_extractor import BulkSidewallExtractor
+from klayout_pex.rcx25.c.sidewall_and_fringe_extractor import SidewallAndFringeExtractor
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.tech_info import TechInfo
+
+from tests.rcx25.region_helpers import region
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Sidewall")
+class BulkSidewallExtractorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tech_info_json_path = os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                                            'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+        cls.tech_info = TechInfo.from_json(tech_info_json_path, dielectric_filter=None)
+
+    def layer_regions(self, li1_region: kdb.Region) -> Dict[LayerName, kdb.Region]:
+        substrate_region = kdb.Region()
+        substrate_region.enable_properties()
+        return {self.tech_info.internal_substrate_layer_name: substrate_region, 'li1': li1_region}
+
+    def sidewall_caps(self,
+                      extractor_class: type,
+                      layer_regions_by_name: Dict[LayerName, kdb.Region],
+                      tile: Optional[kdb.Box] = None) -> Dict[NetCoupleKey, float]:
+        results = CellExtractionResults(cell_name='TOP')
+        kwargs = dict(all_layer_names=list(layer_regions_by_name.keys()),
+                      layer_regions_by_name=layer_regions_by_name,
+                      dbu=0.001,
+                      tech_info=self.tech_info,
+                      results=results,
+                      report=ExtractionReporter(cell_name='TOP', dbu=0.001),
+                      tile=tile)
+        if extractor_class is SidewallAndFringeExtractor:
+            kwargs['scale_ratio_to_fit_halo'] = True
+        extractor_class(**kwargs).extract()
+        caps: Dict[NetCoupleKey, float] = defaultdict(float)
+        for key, entries in results.sidewall_table.items():
+            caps[NetCoupleKey(key.net1, key.net2).normed()] += sum(e.cap_value for e in entries)
+        return caps
+
+    def assertCapsEqual(self, expected: Dict[NetCoupleKey, float], obtained: Dict[NetCoupleKey, float]):
+        self.assertEqual(set(expected.keys()), set(obtained.keys()))
+        for key, value in expected.items():
+            self.assertAlmostEqual(value, obtained[key], places=6)
+
+    def test_parallel_wires_match_visitor(self):
+        layer_regions_by_name = self.layer_regions(region((kdb.Box(0, 0, 200, 10000), 'A'),
+                                                          (kdb.Box(400, 0, 600, 10000), 'B'),
+                                                          (kdb.Box(900, 2000, 1100, 8000), 'C')))
+        expected = self.sidewall_caps(SidewallAndFringeExtractor, layer_regions_by_name)
+        obtained = self.sidewall_caps(BulkSidewallExtractor, layer_regions_by_name)
+        self.assertEqual(2, len(obtained))
+        self.assertCapsEqual(expected, obtained)
+
+    def test_partially_shielded_by_third_net_matches_visitor(self):
+        # NOTE: C lies between A and B for 2 µm of the 10 µm, and only shields that part
+        layer_regions_by_name = self.layer_regions(region((kdb.Box(0, 0, 200, 10000), 'A'),
+                                                          (kdb.Box(600, 0, 800, 10000), 'B'),
+                                                          (kdb.Box(300, 4000, 400, 6000), 'C')))
+        expected = self.sidewall_caps(SidewallAndFringeExtractor, layer_regions_by_name)
+        obtained = self.sidewall_caps(BulkSidewallExtractor, layer_regions_by_name)
+        self.assertEqual(3, len(obtained))
+        self.assertCapsEqual(expected, obtained)
+
+    def test_u_shaped_net_matches_visitor(self):
+        # NOTE: the inner edge of the U sees B through its own polygon (only counted from that side),
+        #       while B is shielded from that edge by the arm of the U
+        layer_regions_by_name = self.layer_regions(region((kdb.Box(0, 0, 200, 10000), 'A'),
+                                                          (kdb.Box(200, 0, 1000, 200), 'A'),
+                                                          (kdb.Box(800, 200, 1000, 10000), 'A'),
+                                                          (kdb.Box(1400, 0, 1600, 10000), 'B')))
+        expected = self.sidewall_caps(SidewallAndFringeExtractor, layer_regions_by_name)
+        obtained = self.sidewall_caps(BulkSidewallExtractor, layer_regions_by_name)
+        self.assertEqual(1, len(obtained))
+        self.assertCapsEqual(expected, obtained)
+
+    def test_shielded_by_same_net(self):
+        # NOTE: the second wire of net A shields the first one from net B
+        caps = self.sidewall_caps(BulkSidewallExtractor,
+                                  self.layer_regions(region((kdb.Box(0, 0, 200, 10000), 'A'),
+                                                            (kdb.Box(400, 0, 600, 10000), 'A'),
+                                                            (kdb.Box(800, 0, 1000, 10000), 'B'))))
+        self.assertEqual([NetCoupleKey('A', 'B').normed()], list(caps.keys()))
+        expected = self.sidewall_caps(BulkSidewallExtractor,
+                                      self.layer_regions(region((kdb.Box(400, 0, 600, 10000), 'A'),
+                                                                (kdb.Box(800, 0, 1000, 10000), 'B'))))
+        self.assertCapsEqual(expected, caps)
+
+    def test_tiles_sum_up_to_untiled(self):
+        layer_regions_by_name = self.layer_regions(region((kdb.Box(0, 0, 200, 10000), 'A'),
+                                                          (kdb.Box(400, 0, 600, 10000), 'B'),
+                                                          (kdb.Box(800, 3000, 1000, 7000), 'C')))
+        untiled = self.sidewall_caps(BulkSidewallExtractor, layer_regions_by_name)
+        tiled: Dict[NetCoupleKey, float] = defaultdict(float)
+        for tile in (kdb.Box(-1000, -1000, 5000, 5000), kdb.Box(-1000, 5000, 5000, 11000)):
+            for key, value in self.sidewall_caps(BulkSidewallExtractor, layer_regions_by_name, tile).items():
+                tiled[key] += value
+        self.assertCapsEqual(untiled, tiled)
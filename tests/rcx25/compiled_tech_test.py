@@ -0,0 +1,82 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import math
+import os
+import unittest
+
+from klayout_pex.rcx25.c.compiled_tech import CompiledTech
+from klayout_pex.tech_info import TechInfo
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Tech")
+class CompiledTechTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tech_info_json_path = os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                                            'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+        cls.tech_info = TechInfo.from_json(tech_info_json_path, dielectric_filter=None)
+        cls.all_layer_names = [cls.tech_info.internal_substrate_layer_name, 'poly', 'li1', 'met1', 'met2']
+        cls.compiled_tech = CompiledTech(tech_info=cls.tech_info, all_layer_names=cls.all_layer_names)
+
+    def test_overlap_caps(self):
+        for top_idx, top_layer_name in enumerate(self.all_layer_names):
+            for bot_idx, bot_layer_name in enumerate(self.all_layer_names):
+                spec = self.tech_info.overlap_cap_by_layer_names.get(top_layer_name, {}).get(bot_layer_name, None)
+                self.assertIs(spec, self.compiled_tech.overlap_spec(top_idx, bot_idx))
+                if spec is None:
+                    self.assertTrue(math.isnan(self.compiled_tech.overlap_caps[top_idx, bot_idx]))
+                else:
+                    self.assertEqual(spec.capacitance, self.compiled_tech.overlap_caps[top_idx, bot_idx])
+
+    def test_fringe_caps_use_either_overlap_order(self):
+        li1, met1 = self.all_layer_names.index('li1'), self.all_layer_names.index('met1')
+        expected = self.tech_info.overlap_cap_by_layer_names['met1']['li1'].capacitance
+        self.assertEqual(expected, self.compiled_tech.fringe_overlap_caps[li1, met1])
+        self.assertEqual(expected, self.compiled_tech.fringe_overlap_caps[met1, li1])
+        self.assertEqual(self.tech_info.side_overlap_cap_by_layer_names['li1']['met1'].capacitance,
+                         self.compiled_tech.side_overlap_caps[li1, met1])
+        self.assertTrue(self.compiled_tech.has_fringe_caps(li1, met1))
+
+    def test_sidewall_caps(self):
+        met1 = self.all_layer_names.index('met1')
+        spec = self.tech_info.sidewall_cap_by_layer_name['met1']
+        self.assertIs(spec, self.compiled_tech.sidewall_spec(met1))
+        self.assertEqual(spec.capacitance, self.compiled_tech.sidewall_caps[met1])
+        self.assertEqual(spec.offset, self.compiled_tech.sidewall_offsets[met1])
+        self.assertIsNone(self.compiled_tech.sidewall_spec(0))  # substrate
+
+    def test_child_layer_indices(self):
+        all_layer_names = [self.tech_info.internal_substrate_layer_name,
+                           'poly', 'li1', 'met1', 'met2', 'met3', 'capm', 'met4', 'capm2', 'met5']
+        compiled_tech = CompiledTech(tech_info=self.tech_info, all_layer_names=all_layer_names)
+
+        self.assertEqual([7, 8, 9], compiled_tech.overlap_child_layer_indices(6))
+        self.assertEqual([], compiled_tech.overlap_child_layer_indices(9))
+
+        # NOTE: capm/capm2 have no coefficients, but shield the fringe from met3 to met4/met5
+        self.assertEqual(list(range(0, 10)), compiled_tech.fringe_child_layer_indices(5))
+        self.assertEqual([6], compiled_tech.fringe_child_layer_indices(6))
+        self.assertEqual([0], compiled_tech.fringe_child_layer_indices(0))
@@ -0,0 +1,110 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import os
+import tempfile
+import unittest
+
+import klayout.db as kdb
+import klayout.rdb as rdb
+
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter, ReportLevel
+from klayout_pex.rcx25.extraction_results import *
+
+
+def sidewall_cap(net1: str, net2: str, cap_value: float) -> SidewallCap:
+    return SidewallCap(key=SidewallKey(layer='met1', net1=net1, net2=net2),
+                       cap_value=cap_value,
+                       distance=0.2,
+                       length=1.0,
+                       tech_spec=None)
+
+
+def category_names(report: ExtractionReporter) -> List[str]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'report.rdb')
+        report.save(path)
+        loaded = rdb.ReportDatabase('')
+        loaded.load(path)
+
+    names = []
+
+    def walk(category: rdb.RdbCategory, depth: int):
+        names.append('  ' * depth + category.name())
+        for c in category.each_sub_category():
+            walk(c, depth + 1)
+
+    for c in loaded.each_category():
+        walk(c, 0)
+    return names
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Report")
+class ExtractionReporterTest(unittest.TestCase):
+    def output_sidewalls(self, report: ExtractionReporter):
+        for net1, net2, cap_value in (('A', 'B', 0.5), ('A', 'B', 0.25), ('A', 'B', 0.125), ('A', 'C', 1.0)):
+            report.output_sidewall(sidewall_cap=sidewall_cap(net1, net2, cap_value),
+                                   inside_edge=kdb.Edge(0, 0, 1000, 0),
+                                   outside_edge=kdb.Edge(1000, 200, 0, 200))
+
+    def test_off(self):
+        report = ExtractionReporter(cell_name='TOP', dbu=0.001, level=ReportLevel.OFF)
+        self.output_sidewalls(report)
+        self.assertEqual([], category_names(report))
+
+    def test_net_pairs(self):
+        report = ExtractionReporter(cell_name='TOP', dbu=0.001, level=ReportLevel.NET_PAIRS)
+        self.output_sidewalls(report)
+        self.assertEqual(['[C] Sidewall',
+                          '  A – B: 0.875 fF (3 contributions)',
+                          '  A – C: 1.0 fF (1 contributions)'],
+                         category_names(report))
+
+    def test_layer_pairs_merged_totals(self):
+        report = ExtractionReporter(cell_name='TOP', dbu=0.001, level=ReportLevel.LAYER_PAIRS)
+        partial_report = ExtractionReporter(cell_name='TOP', dbu=0.001, level=ReportLevel.LAYER_PAIRS)
+        self.output_sidewalls(report)
+        self.output_sidewalls(partial_report)
+        report.totals.merge(partial_report.totals)
+        self.assertEqual(['[C] Sidewall',
+                          '  layer=met1',
+                          '    A – B: 1.75 fF (6 contributions)',
+                          '    A – C: 2.0 fF (2 contributions)'],
+                         category_names(report))
+
+    def test_full_max_items_per_category(self):
+        report = ExtractionReporter(cell_name='TOP', dbu=0.001, max_items_per_category=2)
+        self.output_sidewalls(report)
+        names = category_names(report)
+        self.assertIn('        … 1 more, omitted (limit 2)', names)
+        self.assertEqual(3, len([n for n in names if n.lstrip().startswith('#')]))
+
+    def test_deferred(self):
+        expected_report = ExtractionReporter(cell_name='TOP', dbu=0.001)
+        self.output_sidewalls(expected_report)
+        report = ExtractionReporter(cell_name='TOP', dbu=0.001, deferred=True)
+        self.output_sidewalls(report)
+        self.assertEqual(4, len(report.deferred_outputs))
+        self.assertEqual(category_names(expected_report), category_names(report))
@@ -25,6 +25,7 @@ import allure
 import pytest
 import unittest
 
+import klayout_pex_protobuf.kpex.r.r_network_pb2 as r_network_pb2
 from klayout_pex.rcx25.extraction_results import *
 
 
@@ -177,3 +178,140 @@ class CellExtractionResultsTest(unittest.TestCase):
         obtained_cap_value = summary.capacitances[NetCoupleKey('net1', 'net3').normed()]
         expected_cap_value = c2.cap_value
         self.assertEqual(expected_cap_value, obtained_cap_value)
+
+    def test_merge_keeps_pass_order(self):
+        k1 = SidewallKey(layer='m1', net1='net1', net2='net2')
+        k2 = SidewallKey(layer='m2', net1='net1', net2='net2')
+
+        def cap(key: SidewallKey, cap_value: float) -> SidewallCap:
+            return SidewallCap(key=key, cap_value=cap_value, distance=1.0, length=1.0, tech_spec=None)
+
+        serial_results = CellExtractionResults(cell_name='Cell')
+        pass1_results = CellExtractionResults(cell_name='Cell')
+        pass2_results = CellExtractionResults(cell_name='Cell')
+
+        for r in (serial_results, pass1_results):
+            r.add_sidewall_cap(cap(k1, 1.0))
+            r.add_sidewall_cap(cap(k2, 2.0))
+        for r in (serial_results, pass2_results):
+            r.add_sidewall_cap(cap(k2, 3.0))
+            r.add_sidewall_cap(cap(k1, 4.0))
+
+        merged_results = CellExtractionResults(cell_name='Cell')
+        merged_results.merge(pass1_results)
+        merged_results.merge(pass2_results)
+
+        self.assertEqual(list(serial_results.sidewall_table.items()),
+                         list(merged_results.sidewall_table.items()))
+        self.assertEqual(serial_results.summarize().capacitances,
+                         merged_results.summarize().capacitances)
+
+    def test_accumulated_statistics(self):
+        k1 = SideOverlapKey(layer_inside='m1', net_inside='net1', layer_outside='m2', net_outside='net2')
+        k2 = SideOverlapKey(layer_inside='m2', net_inside='net2', layer_outside='m1', net_outside='net1')
+
+        results = CellExtractionResults(cell_name='Cell', mode=ResultsMode.STATISTICS)
+        for key, cap_value in ((k1, 1.0), (k2, 2.0), (k1, 4.0)):
+            results.add_sideoverlap_cap(SideOverlapCap(key=key, cap_value=cap_value))
+
+        self.assertEqual({}, results.sideoverlap_table)
+        self.assertEqual({k1: CapacitanceStatistics(total=5.0, count=2, min=1.0, max=4.0),
+                          k2: CapacitanceStatistics(total=2.0, count=1, min=2.0, max=2.0)},
+                         results.sideoverlap_statistics())
+        self.assertEqual(['net1', 'net2'], results.net_names.names)
+        self.assertEqual({NetCoupleKey('net1', 'net2'): 7.0}, results.summarize().capacitances)
+
+    def test_merge_without_details(self):
+        k1 = SidewallKey(layer='m1', net1='net1', net2='net2')
+        k2 = SidewallKey(layer='m2', net1='net1', net2='net2')
+
+        def cap(key: SidewallKey, cap_value: float) -> SidewallCap:
+            return SidewallCap(key=key, cap_value=cap_value, distance=1.0, length=1.0, tech_spec=None)
+
+        detailed_results = CellExtractionResults(cell_name='Cell')
+        pass1_results = CellExtractionResults(cell_name='Cell', mode=ResultsMode.STATISTICS)
+        pass2_results = CellExtractionResults(cell_name='Cell', mode=ResultsMode.STATISTICS)
+
+        for r in (detailed_results, pass1_results):
+            r.add_sidewall_cap(cap(k1, 1.0))
+            r.add_sidewall_cap(cap(k2, 2.0))
+        for r in (detailed_results, pass2_results):
+            r.add_sidewall_cap(cap(k2, 3.0))
+            r.add_sidewall_cap(cap(k1, 4.0))
+
+        merged_results = CellExtractionResults(cell_name='Cell', mode=ResultsMode.STATISTICS)
+        merged_results.merge(pass1_results)
+        merged_results.merge(pass2_results)
+
+        self.assertEqual(detailed_results.sidewall_statistics(), merged_results.sidewall_statistics())
+        self.assertEqual(detailed_results.summarize().capacitances,
+                         merged_results.summarize().capacitances)
+        with self.assertRaises(ValueError):
+            detailed_results.merge(pass1_results)
+
+    def test_summary_only(self):
+        results = CellExtractionResults(cell_name='Cell', mode=ResultsMode.SUMMARY)
+        results.add_overlap_cap(OverlapCap(key=OverlapKey(layer_top='m2', net_top='net2',
+                                                          layer_bot='m1', net_bot='net1'),
+                                           cap_value=1.0, shielded_area=0.0, unshielded_area=0.0, tech_spec=None))
+        results.add_sidewall_cap(SidewallCap(key=SidewallKey(layer='m1', net1='net1', net2='net2'),
+                                             cap_value=2.0, distance=1.0, length=1.0, tech_spec=None))
+        results.add_sideoverlap_cap(SideOverlapCap(key=SideOverlapKey(layer_inside='m1', net_inside='net2',
+                                                                      layer_outside='m2', net_outside='net3'),
+                                                   cap_value=4.0))
+
+        self.assertEqual({}, results.overlap_table)
+        self.assertEqual(0, len(results.sidewall_accumulator))
+        self.assertEqual({NetCoupleKey('net1', 'net2'): 3.0, NetCoupleKey('net2', 'net3'): 4.0},
+                         results.net_couple_totals)
+
+        merged_results = CellExtractionResults(cell_name='Cell', mode=ResultsMode.SUMMARY)
+        merged_results.merge(results)
+        merged_results.merge(results)
+        self.assertEqual({NetCoupleKey('net1', 'net2'): 6.0, NetCoupleKey('net2', 'net3'): 8.0},
+                         merged_results.summarize().capacitances)
+
+    def test_net_couple_totals_in_all_modes(self):
+        k1 = SidewallKey(layer='m1', net1='net2', net2='net1')
+        k2 = OverlapKey(layer_top='m2', net_top='net1', layer_bot='m1', net_bot='net3')
+
+        for mode in ResultsMode:
+            with self.subTest(mode=mode):
+                results = CellExtractionResults(cell_name='Cell', mode=mode)
+                results.add_sidewall_cap(SidewallCap(key=k1, cap_value=1.0, distance=1.0, length=1.0,
+                                                     tech_spec=None))
+                results.add_overlap_cap(OverlapCap(key=k2, cap_value=2.0, shielded_area=0.0,
+                                                   unshielded_area=0.0, tech_spec=None))
+                results.add_sidewall_cap(SidewallCap(key=k1, cap_value=4.0, distance=1.0, length=1.0,
+                                                     tech_spec=None))
+                self.assertEqual({NetCoupleKey('net1', 'net2'): 5.0, NetCoupleKey('net1', 'net3'): 2.0},
+                                 results.net_couple_totals)
+                self.assertEqual(results.net_couple_totals, results.summarize().capacitances)
+
+    def test_summary_is_read_only(self):
+        results = CellExtractionResults(cell_name='Cell')
+        results.add_sidewall_cap(SidewallCap(key=SidewallKey(layer='m1', net1='net1', net2='net2'),
+                                             cap_value=1.0, distance=1.0, length=1.0, tech_spec=None))
+        summary = results.summarize()
+        with self.assertRaises(TypeError):
+            summary.capacitances[NetCoupleKey('net1', 'net3')] = 1.0
+        with self.assertRaises(TypeError):
+            summary.resistances[NetCoupleKey('net1', 'net2')] = 1.0
+        self.assertEqual({NetCoupleKey('net1', 'net2'): 1.0}, results.net_couple_totals)
+
+    def test_summarize_resistances(self):
+        network = r_network_pb2.RNetwork(net_name='net1')
+        network.nodes.add(node_id=1, net_name='net1')
+        network.nodes.add(node_id=2, net_name='net1')
+        network.nodes.add(node_id=3, net_name='net2')
+        network.elements.add(element_id=1, resistance=10.0).node_a.node_id = 1
+        network.elements[0].node_b.node_id = 2
+        network.elements.add(element_id=2, resistance=20.0).node_a.node_id = 3
+        network.elements[1].node_b.node_id = 1
+
+        results = CellExtractionResults(cell_name='Cell')
+        results.set_r_extraction_result(pex_result_pb2.RExtractionResult(networks=[network]))
+        self.assertEqual({NetCoupleKey('net1', 'net1'): 10.0, NetCoupleKey('net1', 'net2'): 20.0},
+                         results.summarize().resistances)
+        self.assertEqual({NetCoupleKey('net1', 'net1'): 10.0, NetCoupleKey('net1', 'net2'): 20.0},
+                         ExtractionResults(cell_extraction_results={'Cell': results}).summarize().resistances)
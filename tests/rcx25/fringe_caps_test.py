@@ -0,0 +1,158 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import math
+import os
+import unittest
+from unittest.mock import patch
+
+import klayout.db as kdb
+import numpy as np
+
+from klayout_pex.rcx25.c.sidewall_and_fringe_extractor import SidewallAndFringeExtractor, fringe_caps
+from klayout_pex.rcx25.c.geometry_restorer import GeometryRestorer
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter, ReportLevel
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.tech_info import TechInfo
+
+from tests.rcx25.region_helpers import region
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Fringe")
+class FringeCapsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tech_info_json_path = os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                                            'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+        cls.tech_info = TechInfo.from_json(tech_info_json_path, dielectric_filter=None)
+
+    def extract(self,
+                report_level: ReportLevel = ReportLevel.FULL,
+                mode: ResultsMode = ResultsMode.DETAILS,
+                report: Optional[ExtractionReporter] = None,
+                segmented: bool = False) -> CellExtractionResults:
+        """
+        :param segmented: split the li1 shapes, so there are multiple contributions per net pair
+        """
+        substrate_region = kdb.Region()
+        substrate_region.enable_properties()
+        if segmented:
+            li1_region = region((kdb.Box(0, 0, 1000, 4000), 'A'),
+                                (kdb.Box(0, 5000, 1000, 10000), 'A'),
+                                (kdb.Box(3000, 0, 4000, 3000), 'C'),
+                                (kdb.Box(3000, 4000, 4000, 7000), 'C'),
+                                (kdb.Box(3000, 8000, 4000, 10000), 'C'))
+        else:
+            li1_region = region((kdb.Box(0, 0, 1000, 10000), 'A'),
+                                (kdb.Box(3000, 0, 4000, 10000), 'C'))
+        layer_regions_by_name = {
+            self.tech_info.internal_substrate_layer_name: substrate_region,
+            'li1': li1_region,
+            'met1': region((kdb.Box(1500, -2000, 2500, 12000), 'B')),
+        }
+        results = CellExtractionResults(cell_name='TOP', mode=mode)
+        SidewallAndFringeExtractor(all_layer_names=list(layer_regions_by_name.keys()),
+                                   layer_regions_by_name=layer_regions_by_name,
+                                   dbu=0.001,
+                                   scale_ratio_to_fit_halo=True,
+                                   tech_info=self.tech_info,
+                                   results=results,
+                                   report=report or ExtractionReporter(cell_name='TOP', dbu=0.001,
+                                                                       level=report_level)).extract()
+        return results
+
+    def sideoverlap_caps(self) -> List[Tuple[SideOverlapKey, float]]:
+        return [(key, e.cap_value)
+                for key, entries in self.extract().sideoverlap_table.items()
+                for e in entries]
+
+    def test_fringe_caps(self):
+        alpha_c = 0.5
+        distances_near_um = np.array([0.0, 0.25, 1.0])
+        distances_far_um = np.array([0.5, 2.0, 1.5])
+        obtained = fringe_caps(edge_interval_lengths_um=np.array([1.0, 2.0, 3.0]),
+                               distances_near_um=distances_near_um,
+                               distances_far_um=distances_far_um,
+                               alpha_c=alpha_c,
+                               full_halo_ratio=None,
+                               sideoverlap_capacitance=10.0)
+        for idx, length in enumerate([1.0, 2.0, 3.0]):
+            cnear = (2.0 / math.pi) * math.atan(alpha_c * distances_near_um[idx])
+            cfar = (2.0 / math.pi) * math.atan(alpha_c * distances_far_um[idx])
+            self.assertAlmostEqual((cfar - cnear) * length * 10.0 / 1000.0, obtained[idx], places=12)
+
+    def test_batches_match_single_flush(self):
+        expected = self.sideoverlap_caps()
+        self.assertGreater(len(expected), 0)
+        with patch.object(SidewallAndFringeExtractor.PEXEdgeNeighborhoodVisitor, 'FRINGE_BATCH_SIZE', 1):
+            obtained = self.sideoverlap_caps()
+        self.assertEqual([k for k, _ in expected], [k for k, _ in obtained])
+        for (_, e), (_, o) in zip(expected, obtained):
+            self.assertAlmostEqual(e, o, places=12)
+
+    def test_geometry_is_only_restored_for_full_report(self):
+        expected = self.extract(report_level=ReportLevel.FULL).summarize().capacitances
+        self.assertGreater(len(expected), 0)
+        for report_level in (ReportLevel.OFF, ReportLevel.NET_PAIRS):
+            with self.subTest(report_level=report_level), \
+                 patch.object(GeometryRestorer, 'restore_edge', side_effect=AssertionError), \
+                 patch.object(GeometryRestorer, 'restore_edge_interval', side_effect=AssertionError), \
+                 patch.object(GeometryRestorer, 'restore_polygon', side_effect=AssertionError):
+                obtained = self.extract(report_level=report_level).summarize().capacitances
+                self.assertEqual(expected.keys(), obtained.keys())
+                for key, cap_value in expected.items():
+                    self.assertAlmostEqual(cap_value, obtained[key], places=12)
+
+    def test_aggregated_contributions_match_details(self):
+        details = self.extract(mode=ResultsMode.DETAILS, segmented=True)
+        expected = details.sideoverlap_statistics()
+        self.assertGreater(max(e.count for e in expected.values()), 1)
+
+        statistics = self.extract(mode=ResultsMode.STATISTICS, segmented=True)
+        obtained = statistics.sideoverlap_statistics()
+        self.assertEqual(list(expected.keys()), list(obtained.keys()))
+        for key, e in expected.items():
+            o = obtained[key]
+            self.assertAlmostEqual(e.total, o.total, places=12)
+            self.assertEqual(e.count, o.count)
+            self.assertEqual(e.min, o.min)
+            self.assertEqual(e.max, o.max)
+
+        summary = self.extract(mode=ResultsMode.SUMMARY, segmented=True)
+        for key, cap_value in details.summarize().capacitances.items():
+            self.assertAlmostEqual(cap_value, summary.summarize().capacitances[key], places=12)
+
+    def test_report_totals_count_contributions(self):
+        report = ExtractionReporter(cell_name='TOP', dbu=0.001, level=ReportLevel.LAYER_PAIRS)
+        results = self.extract(mode=ResultsMode.STATISTICS, report=report, segmented=True)
+        for key, statistics in results.sideoverlap_statistics().items():
+            category_path = report.capacitance_category_path(
+                category_name=report.cat_fringe.name(),
+                layer_names=(f"inside_layer={key.layer_inside}", f'outside_layer={key.layer_outside}'),
+                net_pair_name=f'{key.net_inside} – {key.net_outside}'
+            )
+            cap_value, count = report.totals.capacitances[category_path]
+            self.assertAlmostEqual(statistics.total, cap_value, places=12)
+            self.assertEqual(statistics.count, count)
@@ -0,0 +1,336 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+from collections import defaultdict
+import os
+import re
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.klayout.lvsdb_extractor import KLayoutExtractionContext
+from klayout_pex.rcx25.c.bulk_overlap_extractor import OverlapEngine
+from klayout_pex.rcx25.c.bulk_sidewall_extractor import SidewallEngine
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.rcx25.extractor import RCX25Extractor
+from klayout_pex.rcx25.pex_mode import PEXMode
+from klayout_pex.tech_info import TechInfo
+from klayout_pex.rcx25.hierarchy import (
+    CONTEXT_INSTANCE,
+    CONTEXT_NET_NAME,
+    CellInstance,
+    HierarchicalGeometry,
+    INSTANCE_PROPERTY,
+    TOP_LEVEL_INSTANCE,
+    add_instance_results,
+    is_extracted_elsewhere,
+    is_intra_instance,
+    layer_shapes,
+)
+
+
+@allure.parent_suite("Unit Tests")
+class IsIntraInstanceTest(unittest.TestCase):
+    def test_same_instance(self):
+        self.assertTrue(is_intra_instance(3, 3))
+
+    def test_different_instances(self):
+        self.assertFalse(is_intra_instance(3, 4))
+
+    def test_top_level(self):
+        self.assertFalse(is_intra_instance(TOP_LEVEL_INSTANCE, TOP_LEVEL_INSTANCE))
+        self.assertFalse(is_intra_instance(TOP_LEVEL_INSTANCE, 3))
+
+    def test_without_instance(self):
+        # NOTE: substrate, or flat mode
+        self.assertFalse(is_intra_instance(None, None))
+        self.assertFalse(is_intra_instance(3, None))
+        self.assertFalse(is_intra_instance(None, 3))
+
+    def test_context(self):
+        # NOTE: the context shapes around a cell only shield, their contributions are extracted on the parent level
+        self.assertTrue(is_extracted_elsewhere(CONTEXT_INSTANCE, TOP_LEVEL_INSTANCE))
+        self.assertTrue(is_extracted_elsewhere(TOP_LEVEL_INSTANCE, CONTEXT_INSTANCE))
+        self.assertTrue(is_extracted_elsewhere(None, CONTEXT_INSTANCE))
+        self.assertTrue(is_extracted_elsewhere(3, 3))
+        self.assertFalse(is_extracted_elsewhere(TOP_LEVEL_INSTANCE, TOP_LEVEL_INSTANCE))
+        self.assertFalse(is_extracted_elsewhere(None, TOP_LEVEL_INSTANCE))
+
+
+@allure.parent_suite("Unit Tests")
+class AddInstanceResultsTest(unittest.TestCase):
+    @staticmethod
+    def cell_results(mode: ResultsMode = ResultsMode.DEFAULT) -> CellExtractionResults:
+        results = CellExtractionResults(cell_name='inv', mode=mode)
+        for net_top, net_bot in (('A', 'Y'), ('A', 'VSUBS'), ('VPWR', 'VGND')):
+            results.add_overlap_cap(OverlapCap(key=OverlapKey(layer_top='m1', net_top=net_top,
+                                                              layer_bot='li1', net_bot=net_bot),
+                                               cap_value=1.0,
+                                               shielded_area=0.0,
+                                               unshielded_area=0.0,
+                                               tech_spec=None))
+        return results
+
+    @staticmethod
+    def instance(net_name_map: Dict[str, str],
+                 instance_id: int = 0,
+                 path: str = 'I0') -> CellInstance:
+        return CellInstance(instance_id=instance_id, cell_name='inv', path=path, trans=kdb.ICplxTrans(),
+                            net_name_map=net_name_map, global_net_names=frozenset({'VSUBS'}))
+
+    def test_maps_net_names(self):
+        instance = self.instance(net_name_map={'A': 'in', 'Y': 'out', 'VPWR': 'VDD', 'VGND': 'VSS'})
+        results = CellExtractionResults(cell_name='top')
+        add_instance_results(results=results, cell_results=self.cell_results(), instance=instance)
+        self.assertEqual({('in', 'out'), ('in', 'VSUBS'), ('VDD', 'VSS')},
+                         {(k.net_top, k.net_bot) for k in results.overlap_table.keys()})
+
+    def test_internal_nets_are_prefixed_with_instance_path(self):
+        # NOTE: like KLayout's Netlist.flatten_circuit names them,
+        #       the internal nets of different instances must not collapse into one net
+        results = CellExtractionResults(cell_name='top')
+        for instance_id, path in enumerate(('I0', 'X1.I1')):
+            add_instance_results(results=results,
+                                 cell_results=self.cell_results(),
+                                 instance=self.instance(net_name_map={'A': 'in'}, instance_id=instance_id, path=path))
+        self.assertEqual({('in', 'I0.Y'), ('in', 'X1.I1.Y'), ('in', 'VSUBS'),
+                          ('I0.VPWR', 'I0.VGND'), ('X1.I1.VPWR', 'X1.I1.VGND')},
+                         {(k.net_top, k.net_bot) for k in results.overlap_table.keys()})
+        self.assertEqual(2.0, results.summarize().capacitances[NetCoupleKey('VSUBS', 'in')])
+
+    def test_skips_shorted_pins(self):
+        instance = self.instance(net_name_map={'VPWR': 'VDD', 'VGND': 'VDD'})
+        results = CellExtractionResults(cell_name='top')
+        add_instance_results(results=results, cell_results=self.cell_results(), instance=instance)
+        self.assertNotIn(('VDD', 'VDD'), {(k.net_top, k.net_bot) for k in results.overlap_table.keys()})
+
+    def test_skips_net(self):
+        instance = self.instance(net_name_map={})
+        results = CellExtractionResults(cell_name='top')
+        add_instance_results(results=results, cell_results=self.cell_results(), instance=instance,
+                             skipped_net_name='VSUBS')
+        self.assertEqual({('I0.A', 'I0.Y'), ('I0.VPWR', 'I0.VGND')},
+                         {(k.net_top, k.net_bot) for k in results.overlap_table.keys()})
+
+    def test_without_details(self):
+        instance = self.instance(net_name_map={'A': 'in', 'Y': 'out', 'VPWR': 'VDD', 'VGND': 'VDD'})
+        expected = CellExtractionResults(cell_name='top')
+        add_instance_results(results=expected, cell_results=self.cell_results(), instance=instance,
+                             skipped_net_name='VSUBS')
+        for mode in (ResultsMode.STATISTICS, ResultsMode.SUMMARY):
+            results = CellExtractionResults(cell_name='top', mode=mode)
+            add_instance_results(results=results, cell_results=self.cell_results(mode), instance=instance,
+                                 skipped_net_name='VSUBS')
+            self.assertEqual(expected.summarize().capacitances, results.summarize().capacitances)
+
+
+@allure.parent_suite("Unit Tests")
+class HierarchicalGeometryTest(unittest.TestCase):
+    @staticmethod
+    def extracted_lvsdb() -> kdb.LayoutToNetlist:
+        """
+        TOP (net T) with 2 instances of MID (net X and internal net m1),
+        each with 2 instances of LEAF (pin A and internal net n1)
+        """
+        layout = kdb.Layout()
+        layout.dbu = 0.001
+        li1 = layout.layer(1, 0)
+        li1_text = layout.layer(1, 5)
+
+        def add_net_shape(cell: kdb.Cell, box: kdb.Box, net_name: str):
+            cell.shapes(li1).insert(box)
+            cell.shapes(li1_text).insert(kdb.Text(net_name, kdb.Trans(box.center().x, box.center().y)))
+
+        leaf = layout.create_cell('LEAF')
+        add_net_shape(leaf, kdb.Box(0, 0, 100, 1000), 'A')
+        add_net_shape(leaf, kdb.Box(300, 0, 400, 800), 'n1')
+
+        mid = layout.create_cell('MID')
+        mid.insert(kdb.CellInstArray(leaf.cell_index(), kdb.Trans(0, 0)))
+        mid.insert(kdb.CellInstArray(leaf.cell_index(), kdb.Trans(1000, 0)))
+        add_net_shape(mid, kdb.Box(0, 900, 1100, 1000), 'X')
+        add_net_shape(mid, kdb.Box(0, -500, 100, -400), 'm1')
+
+        top = layout.create_cell('TOP')
+        top.insert(kdb.CellInstArray(mid.cell_index(), kdb.Trans(0, 0)))
+        top.insert(kdb.CellInstArray(mid.cell_index(), kdb.Trans(5000, 0)))
+        add_net_shape(top, kdb.Box(0, 1000, 6100, 1100), 'T')
+
+        lvsdb = kdb.LayoutToNetlist(kdb.RecursiveShapeIterator(layout, top, []))
+        li1_region = lvsdb.make_layer(li1, 'li1')
+        li1_text_region = lvsdb.make_text_layer(li1_text, 'li1_text')
+        lvsdb.connect(li1_region)
+        lvsdb.connect(li1_region, li1_text_region)
+        lvsdb.extract_netlist()
+        return lvsdb
+
+    def test_net_names_like_flattened_netlist(self):
+        lvsdb = self.extracted_lvsdb()
+        pex_context = SimpleNamespace(lvsdb=lvsdb,
+                                      dbu=0.001,
+                                      extracted_layers={(1, 0): SimpleNamespace(source_layers=[SimpleNamespace(index=0)])})
+        geometry = HierarchicalGeometry.build(pex_context=pex_context,
+                                              gds_pairs_by_layer_name={'li1': [(1, 0)]},
+                                              global_net_names=frozenset({'VSUBS'}))
+        self.assertEqual(4, len(geometry.instances))
+
+        obtained_net_names = {p.property('net') for p in geometry.top_layer_regions_by_name['li1'].each()}
+        for instance in geometry.instances:
+            cell_region = geometry.cells[instance.cell_name].layer_regions_by_name['li1']
+            obtained_net_names |= {instance.parent_net_name(p.property('net')) for p in cell_region.each()}
+        self.assertEqual('VSUBS', geometry.instances[0].parent_net_name('VSUBS'))
+
+        flat_netlist = lvsdb.netlist().dup()
+        flat_netlist.flatten()
+        expected_net_names = {n.expanded_name() for n in flat_netlist.top_circuit().each_net()}
+        self.assertEqual(expected_net_names, obtained_net_names)
+        self.assertIn('$1.$2.n1', obtained_net_names)
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Hierarchy")
+class HierarchicalExtractionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tech_info_json_path = os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                                            'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+        cls.tech_info = TechInfo.from_json(tech_info_json_path, dielectric_filter=None)
+
+    @staticmethod
+    def extracted_lvsdb() -> kdb.LayoutToNetlist:
+        """
+        TOP with 2 instances of LEAF (pin A, internal nets B and C), connected by wire P (landing on pin A).
+        The first instance is surrounded by parent wiring:
+        wire T runs between A and B, and wire M is routed over the cell.
+        """
+        layout = kdb.Layout()
+        layout.dbu = 0.001
+        layers = {'li1': ((67, 20), (67, 5), 'li_con'),
+                  'met1': ((68, 20), (68, 5), 'met1_con')}
+        layer_indexes = {ln: (layout.layer(*drw), layout.layer(*label)) for ln, (drw, label, _) in layers.items()}
+
+        def add_net_shape(cell: kdb.Cell, layer_name: str, box: kdb.Box, net_name: str):
+            drw, label = layer_indexes[layer_name]
+            cell.shapes(drw).insert(box)
+            cell.shapes(label).insert(kdb.Text(net_name, kdb.Trans(box.center().x, box.center().y)))
+
+        leaf = layout.create_cell('LEAF')
+        add_net_shape(leaf, 'li1', kdb.Box(0, 0, 200, 4000), 'A')
+        add_net_shape(leaf, 'li1', kdb.Box(1000, 0, 1200, 3000), 'B')
+        add_net_shape(leaf, 'met1', kdb.Box(0, 1000, 1200, 1300), 'C')
+
+        top = layout.create_cell('TOP')
+        top.insert(kdb.CellInstArray(leaf.cell_index(), kdb.Trans(0, 0)))
+        top.insert(kdb.CellInstArray(leaf.cell_index(), kdb.Trans(30000, 0)))
+        add_net_shape(top, 'li1', kdb.Box(0, 3800, 30200, 4000), 'P')
+        add_net_shape(top, 'li1', kdb.Box(500, 0, 700, 3000), 'T')
+        add_net_shape(top, 'met1', kdb.Box(-500, 2000, 1700, 2300), 'M')
+
+        lvsdb = kdb.LayoutToNetlist(kdb.RecursiveShapeIterator(layout, top, []))
+        for ln, (_, _, lvs_layer_name) in layers.items():
+            drw, label = layer_indexes[ln]
+            region = lvsdb.make_layer(drw, lvs_layer_name)
+            text_region = lvsdb.make_text_layer(label, f"{lvs_layer_name}_text")
+            lvsdb.connect(region)
+            lvsdb.connect(region, text_region)
+        lvsdb.extract_netlist()
+        return lvsdb
+
+    def test_context_layer_regions(self):
+        pex_context = SimpleNamespace(lvsdb=self.extracted_lvsdb(),
+                                      dbu=0.001,
+                                      extracted_layers={(67, 20): SimpleNamespace(source_layers=[SimpleNamespace(index=0)]),
+                                                        (68, 20): SimpleNamespace(source_layers=[SimpleNamespace(index=2)])})
+        geometry = HierarchicalGeometry.build(pex_context=pex_context,
+                                              gds_pairs_by_layer_name={'li1': [(67, 20)], 'met1': [(68, 20)]},
+                                              global_net_names=frozenset({'VSUBS'}))
+        parent_layer_regions = geometry.parent_layer_regions({inst.instance_id for inst in geometry.instances})
+        first_instance = geometry.instances[0]
+        layer_regions_by_name = geometry.context_layer_regions(instance=first_instance,
+                                                               parent_layer_shapes=layer_shapes(parent_layer_regions),
+                                                               halo=2000)
+
+        def shapes(layer_name: str) -> Set[Tuple[str, str, int]]:
+            return {(str(p.downcast()), p.property('net'), p.property(INSTANCE_PROPERTY))
+                    for p in layer_regions_by_name[layer_name].each()}
+
+        # NOTE: wire P is clipped to the halo box, and where it lands on pin A,
+        #       and like pin A, it takes the local net name
+        self.assertEqual({('(0,0;0,4000;200,4000;200,0)', 'A', TOP_LEVEL_INSTANCE),
+                          ('(1000,0;1000,3000;1200,3000;1200,0)', 'B', TOP_LEVEL_INSTANCE),
+                          ('(200,3800;200,4000;3200,4000;3200,3800)', 'A', CONTEXT_INSTANCE),
+                          ('(500,0;500,3000;700,3000;700,0)', CONTEXT_NET_NAME, CONTEXT_INSTANCE)},
+                         shapes('li1'))
+        self.assertEqual({('(0,1000;0,1300;1200,1300;1200,1000)', 'C', TOP_LEVEL_INSTANCE),
+                          ('(-500,2000;-500,2300;1700,2300;1700,2000)', CONTEXT_NET_NAME, CONTEXT_INSTANCE)},
+                         shapes('met1'))
+
+    def capacitances(self,
+                     hierarchical: bool,
+                     overlap_engine: OverlapEngine,
+                     sidewall_engine: SidewallEngine) -> Dict[Tuple[NetName, NetName], float]:
+        pex_context = KLayoutExtractionContext.prepare_extraction(lvsdb=self.extracted_lvsdb(),
+                                                                  top_cell='TOP',
+                                                                  tech=self.tech_info,
+                                                                  blackbox_devices=False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            extractor = RCX25Extractor(pex_context=pex_context,
+                                       pex_mode=PEXMode.CC,
+                                       scale_ratio_to_fit_halo=True,
+                                       delaunay_amax=0.0,
+                                       delaunay_b=0.0,
+                                       tech_info=self.tech_info,
+                                       report_path=os.path.join(tmp_dir, 'report.rdb.gz'),
+                                       hierarchical=hierarchical,
+                                       overlap_engine=overlap_engine,
+                                       sidewall_engine=sidewall_engine)
+            results = extractor.extract().cell_extraction_results['TOP']
+
+        # NOTE: the flat extraction names the internal nets of both instances alike (e.g. B),
+        #       so the instance paths of the hierarchical net names (e.g. $1.B) are dropped
+        caps: Dict[Tuple[NetName, NetName], float] = defaultdict(float)
+        for key, cap in results.summarize().capacitances.items():
+            caps[tuple(sorted(re.sub(r'^\$\d+\.', '', n) for n in (key.net1, key.net2)))] += cap
+        return caps
+
+    def test_totals_like_flat_extraction(self):
+        for overlap_engine, sidewall_engine in ((OverlapEngine.VISITOR, SidewallEngine.VISITOR),
+                                                (OverlapEngine.BULK, SidewallEngine.BULK)):
+            with self.subTest(overlap_engine=overlap_engine, sidewall_engine=sidewall_engine):
+                flat_caps = self.capacitances(hierarchical=False,
+                                              overlap_engine=overlap_engine,
+                                              sidewall_engine=sidewall_engine)
+                hierarchical_caps = self.capacitances(hierarchical=True,
+                                                      overlap_engine=overlap_engine,
+                                                      sidewall_engine=sidewall_engine)
+
+                # NOTE: the parent wiring couples to the first instance, and shields the couplings within it
+                self.assertIn(('B', 'T'), flat_caps)
+                self.assertIn(('C', 'M'), flat_caps)
+                self.assertEqual(set(flat_caps.keys()), set(hierarchical_caps.keys()))
+                for key, cap in flat_caps.items():
+                    self.assertAlmostEqual(cap, hierarchical_caps[key], places=9, msg=str(key))
+                self.assertAlmostEqual(sum(flat_caps.values()), sum(hierarchical_caps.values()), places=9)
@@ -0,0 +1,102 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import os
+import unittest
+from unittest.mock import patch
+
+import klayout.db as kdb
+
+from klayout_pex.rcx25.c.interval_shielding import (
+    interval_polygons_by_layer,
+    merge_intervals,
+    unshielded_intervals,
+)
+from klayout_pex.rcx25.c.sidewall_and_fringe_extractor import SidewallAndFringeExtractor
+from klayout_pex.rcx25.extraction_reporter import ExtractionReporter
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.tech_info import TechInfo
+
+from tests.rcx25.region_helpers import polygon, region
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Capacitance", "Fringe")
+class IntervalShieldingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tech_info_json_path = os.path.realpath(os.path.join(__file__, '..', '..', '..',
+                                                            'klayout_pex_protobuf', 'sky130A_tech.pb.json'))
+        cls.tech_info = TechInfo.from_json(tech_info_json_path, dielectric_filter=None)
+
+    def test_merge_intervals(self):
+        self.assertEqual([], merge_intervals([]))
+        self.assertEqual([(0, 30), (40, 50)],
+                         merge_intervals([(40, 50), (10, 30), (0, 10), (5, 20)]))
+
+    def test_unshielded_intervals(self):
+        shield = merge_intervals([(200, 300), (500, 600), (550, 700)])
+        self.assertEqual([(0, 200), (300, 500), (700, 1000)], unshielded_intervals(0, 1000, shield))
+        self.assertEqual([(300, 400)], unshielded_intervals(250, 400, shield))
+        self.assertEqual([], unshielded_intervals(520, 690, shield))
+        self.assertEqual([(800, 900)], unshielded_intervals(800, 900, shield))
+        self.assertEqual([(0, 100)], unshielded_intervals(0, 100, []))
+
+    def test_interval_polygons_by_layer(self):
+        obtained = interval_polygons_by_layer((0, 100), {
+            1: [polygon(kdb.Box(0, 500, 100, 700), 'B'), polygon(kdb.Box(0, 200, 100, 300), 'A')]
+        })
+        self.assertEqual({1: [(200, 300, 'A'), (500, 700, 'B')]}, obtained)
+
+        # NOTE: not spanning the whole edge interval, requires the 2-D fallback
+        self.assertIsNone(interval_polygons_by_layer((0, 100), {1: [polygon(kdb.Box(10, 200, 100, 300), 'A')]}))
+
+    def sideoverlap_caps(self) -> Dict[SideOverlapKey, List[float]]:
+        substrate_region = kdb.Region()
+        substrate_region.enable_properties()
+        layer_regions_by_name = {
+            self.tech_info.internal_substrate_layer_name: substrate_region,
+            'li1': region((kdb.Box(0, 0, 1000, 10000), 'A')),
+            'met1': region((kdb.Box(1300, 0, 1600, 10000), 'B')),
+            'met2': region((kdb.Box(1100, -2000, 3500, 12000), 'C')),
+        }
+        results = CellExtractionResults(cell_name='TOP')
+        SidewallAndFringeExtractor(all_layer_names=list(layer_regions_by_name.keys()),
+                                   layer_regions_by_name=layer_regions_by_name,
+                                   dbu=0.001,
+                                   scale_ratio_to_fit_halo=True,
+                                   tech_info=self.tech_info,
+                                   results=results,
+                                   report=ExtractionReporter(cell_name='TOP', dbu=0.001)).extract()
+        return {key: [e.cap_value for e in entries]
+                for key, entries in results.sideoverlap_table.items()}
+
+    def test_matches_region_shielding(self):
+        expected = self.sideoverlap_caps()
+        self.assertIn(SideOverlapKey(layer_inside='li1', net_inside='A', layer_outside='met2', net_outside='C'),
+                      expected)
+        with patch('klayout_pex.rcx25.c.sidewall_and_fringe_extractor.interval_polygons_by_layer',
+                   return_value=None):
+            obtained = self.sideoverlap_caps()
+        self.assertEqual(expected, obtained)
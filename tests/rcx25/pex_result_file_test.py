@@ -0,0 +1,122 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import os
+import tempfile
+import unittest
+
+import klayout_pex_protobuf.kpex.r.r_network_pb2 as r_network_pb2
+from klayout_pex.rcx25.extraction_results import *
+from klayout_pex.rcx25.pex_result_file import *
+
+
+def _results(mode: ResultsMode) -> ExtractionResults:
+    results = CellExtractionResults(cell_name='Cell', mode=mode)
+    results.add_overlap_cap(OverlapCap(key=OverlapKey(layer_top='m2', net_top='net2', layer_bot='m1', net_bot='net1'),
+                                       cap_value=1.0, shielded_area=0.0, unshielded_area=0.0, tech_spec=None))
+    results.add_sidewall_cap(SidewallCap(key=SidewallKey(layer='m1', net1='net2', net2='net1'),
+                                         cap_value=2.0, distance=1.0, length=1.0, tech_spec=None))
+    results.add_sidewall_cap(SidewallCap(key=SidewallKey(layer='m1', net1='net2', net2='net1'),
+                                         cap_value=3.0, distance=1.0, length=1.0, tech_spec=None))
+    results.add_sideoverlap_cap(SideOverlapCap(key=SideOverlapKey(layer_inside='m1', net_inside='net3',
+                                                                  layer_outside='m2', net_outside='net2'),
+                                               cap_value=4.0))
+
+    network = r_network_pb2.RNetwork(net_name='net1')
+    network.nodes.add(node_id=1, net_name='net1')
+    network.nodes.add(node_id=2, net_name='net1')
+    element = network.elements.add(element_id=1, resistance=10.0)
+    element.node_a.node_id = 1
+    element.node_b.node_id = 2
+    results.set_r_extraction_result(pex_result_pb2.RExtractionResult(networks=[network]))
+
+    return ExtractionResults(cell_extraction_results={'Cell': results})
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("PEX", "2.5D")
+class PEXResultFileTest(unittest.TestCase):
+    def test_roundtrip(self):
+        for mode in ResultsMode:
+            with self.subTest(mode=mode), tempfile.TemporaryDirectory() as tmp_dir:
+                results = _results(mode)
+                path = os.path.join(tmp_dir, 'Cell_k25d_pex_result.pb')
+                write_pex_result(path, results)
+
+                pex_result = read_pex_result(path)
+                c_result = pex_result.top_cell_extraction_result.c_result
+                self.assertEqual('Cell', c_result.cell_name)
+                self.assertEqual(2, len(c_result.net_couple_capacitances))
+
+                restored_results = cell_extraction_results(pex_result)
+                self.assertEqual(results.summarize(), restored_results.summarize())
+                self.assertEqual({NetCoupleKey('net1', 'net2'): 6.0, NetCoupleKey('net2', 'net3'): 4.0},
+                                 restored_results.summarize().capacitances)
+                self.assertEqual({NetCoupleKey('net1', 'net1'): 10.0},
+                                 restored_results.summarize().resistances)
+
+    def test_layer_couples(self):
+        c_result = pex_result_pb(_results(ResultsMode.STATISTICS).cell_extraction_results['Cell']).\
+            top_cell_extraction_result.c_result
+        self.assertEqual(['m2', 'm1'], list(c_result.layer_names))
+        self.assertEqual(3, len(c_result.layer_couple_capacitances))
+
+        sidewall = c_result.layer_couple_capacitances[1]
+        self.assertEqual(CKind.KIND_SIDEWALL, sidewall.kind)
+        self.assertEqual('m1', c_result.layer_names[sidewall.layer1])
+        self.assertEqual(sidewall.layer1, sidewall.layer2)
+        self.assertEqual(('net2', 'net1'), (c_result.net_names[sidewall.net1], c_result.net_names[sidewall.net2]))
+        self.assertEqual((5.0, 2, 2.0, 3.0), (sidewall.capacitance, sidewall.count,
+                                              sidewall.min_capacitance, sidewall.max_capacitance))
+
+        restored_results = cell_extraction_results(pex_result_pb2.PEXResult(
+            top_cell_extraction_result=pex_result_pb2.CellExtractionResult(c_result=c_result)))
+        self.assertEqual(ResultsMode.STATISTICS, restored_results.mode)
+        self.assertEqual(_results(ResultsMode.STATISTICS).cell_extraction_results['Cell'].sidewall_statistics(),
+                         restored_results.sidewall_statistics())
+
+    def test_summary_only_has_no_layer_couples(self):
+        c_result = pex_result_pb(_results(ResultsMode.SUMMARY).cell_extraction_results['Cell']).\
+            top_cell_extraction_result.c_result
+        self.assertEqual(0, len(c_result.layer_couple_capacitances))
+        self.assertEqual(0, len(c_result.layer_names))
+        self.assertEqual(['net1', 'net2', 'net3'], sorted(c_result.net_names))
+
+    def test_length_delimited(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'Cell_k25d_pex_result.pb')
+            write_pex_result(path, _results(ResultsMode.DETAILS))
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            with open(path, 'wb') as f:
+                f.write(data + data)
+            self.assertEqual(2, len(list(read_pex_results(path))))
+            with self.assertRaises(ValueError):
+                read_pex_result(path)
+
+            with open(path, 'wb') as f:
+                f.write(data[:-1])
+            with self.assertRaises(ValueError):
+                list(read_pex_results(path))
@@ -0,0 +1,101 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import gzip
+import os
+import tempfile
+import unittest
+
+import klayout.db as kdb
+import klayout.rdb as rdb
+
+from klayout_pex.rcx25.rdb_writer import StreamingReportDatabase, word_or_quoted_string
+
+
+def output_items(report: rdb.ReportDatabase | StreamingReportDatabase):
+    cell = report.create_cell('TOP')
+    trans = kdb.CplxTrans(mag=0.001)
+    cat_common = report.create_category('Common')
+    cat_nets = report.create_category(cat_common, "VDD – VSS <&> it's")
+    report.create_items(cell.rdb_id(), cat_nets.rdb_id(), trans,
+                        [kdb.PolygonWithProperties(kdb.Polygon(kdb.Box(0, 0, 100, 200)), {'net': 'VDD'})])
+    report.create_items(cell.rdb_id(), cat_nets.rdb_id(), trans, [kdb.Edge(0, 0, 100, 0)])
+    shapes = kdb.Shapes()
+    shapes.insert(kdb.Box(0, 0, 10, 10))
+    shapes.insert(kdb.Text('label', 5, 5))
+    shapes.insert(kdb.Path([kdb.Point(0, 0), kdb.Point(10, 0)], 4))
+    report.create_items(cell.rdb_id(), report.create_category(cat_common, 'Shapes').rdb_id(), trans, shapes)
+    report.create_items(cell.rdb_id(), report.create_category('Region').rdb_id(), trans,
+                        kdb.Region(kdb.Box(-5, -5, 5, 5)))
+
+
+def read_text(path: str) -> str:
+    with (gzip.open(path, 'rt', encoding='utf-8') if path.endswith('.gz') else open(path, encoding='utf-8')) as f:
+        return f.read()
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Report")
+class StreamingReportDatabaseTest(unittest.TestCase):
+    def test_word_or_quoted_string(self):
+        self.assertEqual('a_1$', word_or_quoted_string('a_1$'))
+        self.assertEqual("'1a'", word_or_quoted_string('1a'))
+        self.assertEqual("'it\\'s \\303\\251'", word_or_quoted_string("it's é"))
+
+    def test_same_as_klayout(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_name in ('report.rdb', 'report.rdb.gz'):
+                expected_path = os.path.join(tmp_dir, f"expected_{file_name}")
+                expected = rdb.ReportDatabase('PEX TOP')
+                output_items(expected)
+                expected.save(expected_path)
+
+                obtained_path = os.path.join(tmp_dir, f"obtained_{file_name}")
+                obtained = StreamingReportDatabase('PEX TOP')
+                output_items(obtained)
+                obtained.save(obtained_path)
+
+                self.assertEqual(read_text(expected_path), read_text(obtained_path))
+
+                loaded = rdb.ReportDatabase('')
+                loaded.load(obtained_path)
+                self.assertEqual(6, loaded.num_items())
+
+    def test_merge_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            partial_path = os.path.join(tmp_dir, 'partial.rdb')
+            partial = rdb.ReportDatabase('PEX TOP')
+            output_items(partial)
+            partial.save(partial_path)
+
+            merged_path = os.path.join(tmp_dir, 'merged.rdb.gz')
+            merged = StreamingReportDatabase('PEX TOP')
+            output_items(merged)
+            merged.merge_file(partial_path)
+            merged.save(merged_path)
+
+            loaded = rdb.ReportDatabase('')
+            loaded.load(merged_path)
+            self.assertEqual(12, loaded.num_items())
+            self.assertEqual(['Common', 'Region'], [c.name() for c in loaded.each_category()])
@@ -0,0 +1,44 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+from typing import *
+
+import klayout.db as kdb
+
+
+def polygon(box: kdb.Box, net: Optional[str]) -> kdb.PolygonWithProperties:
+    return kdb.PolygonWithProperties(kdb.Polygon(box), {} if net is None else {'net': net})
+
+
+def region(*boxes_and_nets: Tuple[kdb.Box, Optional[str]]) -> kdb.Region:
+    """
+    Builds a region with net annotations (like the extracted layers),
+    a net of None inserts the polygon without a net
+    """
+    r = kdb.Region()
+    r.enable_properties()
+    for box, net in boxes_and_nets:
+        r.insert(polygon(box, net))
+    return r
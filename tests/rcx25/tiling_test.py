@@ -0,0 +1,86 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX 
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+import allure
+import unittest
+
+import klayout.db as kdb
+
+from klayout_pex.rcx25.tiling import clip_region, make_tiles, owned_edge_interval
+
+
+@allure.parent_suite("Unit Tests")
+class MakeTilesTest(unittest.TestCase):
+    def test_tiles_cover_bbox(self):
+        bbox = kdb.Box(-100, 0, 250, 100)
+        tiles = make_tiles(bbox=bbox, tile_size=100)
+        self.assertEqual(8, len(tiles))
+        self.assertEqual(kdb.Box(-100, 0, 0, 100), tiles[0])
+        covered = kdb.Region()
+        for t in tiles:
+            covered.insert(t)
+        self.assertTrue((kdb.Region(bbox) - covered).is_empty())
+
+    def test_empty_bbox(self):
+        self.assertEqual([], make_tiles(bbox=kdb.Box(), tile_size=100))
+
+    def test_invalid_tile_size(self):
+        with self.assertRaises(ValueError):
+            make_tiles(bbox=kdb.Box(0, 0, 100, 100), tile_size=0)
+
+
+@allure.parent_suite("Unit Tests")
+class ClipRegionTest(unittest.TestCase):
+    def test_keeps_net_property(self):
+        region = kdb.Region()
+        region.enable_properties()
+        region.insert(kdb.PolygonWithProperties(kdb.Polygon(kdb.Box(0, 0, 100, 10)), {'net': 'A'}))
+        clipped = clip_region(region, kdb.Box(50, -10, 200, 20))
+        polygons = list(clipped.each())
+        self.assertEqual(1, len(polygons))
+        self.assertEqual(kdb.Box(50, 0, 100, 10), polygons[0].bbox())
+        self.assertEqual('A', polygons[0].property('net'))
+
+
+@allure.parent_suite("Unit Tests")
+class OwnedEdgeIntervalTest(unittest.TestCase):
+    def test_edge_partitioned_by_tiles(self):
+        edge = kdb.Edge(50, 10, 250, 10)
+        tiles = make_tiles(bbox=kdb.Box(0, 0, 300, 100), tile_size=100)
+        intervals = [iv for iv in (owned_edge_interval(edge, t) for t in tiles) if iv is not None]
+        self.assertEqual([(0.0, 50.0), (50.0, 150.0), (150.0, 200.0)], intervals)
+
+    def test_reversed_edge(self):
+        edge = kdb.Edge(250, 10, 50, 10)
+        self.assertEqual((150.0, 200.0), owned_edge_interval(edge, kdb.Box(0, 0, 100, 100)))
+
+    def test_edge_on_tile_border_has_single_owner(self):
+        edge = kdb.Edge(10, 100, 90, 100)
+        self.assertIsNone(owned_edge_interval(edge, kdb.Box(0, 0, 100, 100)))
+        self.assertEqual((0.0, 80.0), owned_edge_interval(edge, kdb.Box(0, 100, 100, 200)))
+
+    def test_diagonal_edge(self):
+        edge = kdb.Edge(0, 0, 200, 200)
+        obtained = owned_edge_interval(edge, kdb.Box(100, 100, 200, 200))
+        self.assertAlmostEqual(edge.length() / 2, obtained[0], delta=1)
+        self.assertAlmostEqual(edge.length(), obtained[1], delta=1)
@@ -0,0 +1,61 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+import unittest
+
+from klayout_pex.util.artifact_writer import ArtifactPolicy, ArtifactWriter
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Artifacts", "Util")
+class ArtifactPolicyTest(unittest.TestCase):
+    def test_includes(self):
+        self.assertTrue(ArtifactPolicy.ALL.includes(ArtifactPolicy.MINIMAL))
+        self.assertTrue(ArtifactPolicy.DEBUG.includes(ArtifactPolicy.DEBUG))
+        self.assertFalse(ArtifactPolicy.MINIMAL.includes(ArtifactPolicy.DEBUG))
+        self.assertFalse(ArtifactPolicy.NONE.includes(ArtifactPolicy.MINIMAL))
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Artifacts", "Util")
+class ArtifactWriterTest(unittest.TestCase):
+    def test_writes_synchronously(self):
+        writer = ArtifactWriter()
+        written = []
+        writer.write(description='a', write=lambda: written.append('a'))
+        self.assertEqual(['a'], written)
+
+    def test_failures_do_not_stop_the_writer(self):
+        writer = ArtifactWriter()
+        written = []
+
+        def fail():
+            raise OSError('disk full')
+
+        writer.write(description='a', write=fail)
+        writer.write(description='b', write=lambda: written.append('b'))
+        self.assertEqual(['b'], written)
+        self.assertEqual(['a'], [d for d, e in writer.failures])
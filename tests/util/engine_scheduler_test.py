@@ -0,0 +1,96 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+import os
+import tempfile
+import threading
+import unittest
+
+from klayout_pex.log import info
+from klayout_pex.util.engine_scheduler import EngineScheduler, EngineSpec
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Engines", "Util")
+class EngineSchedulerTest(unittest.TestCase):
+    def test_thread_budgets_concurrent(self):
+        scheduler = EngineScheduler(engines=[EngineSpec(name='MAGIC', max_threads=1),
+                                             EngineSpec(name='FasterCap'),
+                                             EngineSpec(name='kpex/2.5D')],
+                                    num_threads=8,
+                                    concurrent=True)
+        self.assertEqual({'MAGIC': 1, 'FasterCap': 4, 'kpex/2.5D': 3}, scheduler.thread_budgets)
+
+    def test_thread_budgets_serial(self):
+        scheduler = EngineScheduler(engines=[EngineSpec(name='MAGIC', max_threads=1),
+                                             EngineSpec(name='FasterCap')],
+                                    num_threads=8,
+                                    concurrent=False)
+        self.assertEqual({'MAGIC': 1, 'FasterCap': 8}, scheduler.thread_budgets)
+
+    def test_engines_run_concurrently(self):
+        scheduler = EngineScheduler(engines=[EngineSpec(name='A'), EngineSpec(name='B')],
+                                    num_threads=2,
+                                    concurrent=True)
+        barrier = threading.Barrier(2, timeout=10)  # NOTE: would time out if run one after another
+        scheduler.start(name='A', run=lambda num_threads: barrier.wait())
+        scheduler.start(name='B', run=lambda num_threads: barrier.wait())
+        scheduler.wait()
+        self.assertTrue(all(t.succeeded for t in scheduler.timings.values()))
+
+    def test_failure_is_reraised_after_all_engines(self):
+        scheduler = EngineScheduler(engines=[EngineSpec(name='A'), EngineSpec(name='B')],
+                                    num_threads=2,
+                                    concurrent=True)
+        finished = []
+
+        def fail(num_threads: int):
+            raise ValueError('engine A failed')
+
+        scheduler.start(name='A', run=fail)
+        scheduler.start(name='B', run=lambda num_threads: finished.append('B'))
+        with self.assertRaises(ValueError):
+            scheduler.wait()
+        self.assertEqual(['B'], finished)
+        self.assertFalse(scheduler.timings['A'].succeeded)
+
+    def test_log_stream_per_engine(self):
+        scheduler = EngineScheduler(engines=[EngineSpec(name='A'), EngineSpec(name='B')],
+                                    num_threads=2,
+                                    concurrent=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path_a = os.path.join(tmp_dir, 'a.log')
+            log_path_b = os.path.join(tmp_dir, 'b.log')
+            scheduler.start(name='A', run=lambda num_threads: info('message of A'), log_path=log_path_a)
+            scheduler.start(name='B', run=lambda num_threads: info('message of B'), log_path=log_path_b)
+            scheduler.wait()
+            with open(log_path_a) as f:
+                content_a = f.read()
+            with open(log_path_b) as f:
+                content_b = f.read()
+        self.assertIn('message of A', content_a)
+        self.assertNotIn('message of B', content_a)
+        self.assertIn('message of B', content_b)
@@ -0,0 +1,192 @@
+#
+# --------------------------------------------------------------------------------
+# SPDX-FileCopyrightText: 2024-2025 Martin Jan Köhler and Harald Pretl
+# Johannes Kepler University, Institute for Integrated Circuits.
+#
+# This file is part of KPEX
+# (see https://github.com/iic-jku/klayout-pex).
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+# SPDX-License-Identifier: GPL-3.0-or-later
+# --------------------------------------------------------------------------------
+#
+from __future__ import annotations
+
+import allure
+import json
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+
+from klayout_pex.util.stage_timer import StageTimer, stage, set_stage_timer, count_metric, record_metric
+
+
+def busy(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+@allure.parent_suite("Unit Tests")
+@allure.tag("Profiling", "Util")
+class StageTimerTest(unittest.TestCase):
+    def test_nested_stages(self):
+        timer = StageTimer()
+        with timer.stage('k25d') as path:
+            self.assertEqual('k25d', path)
+            for _ in range(3):
+                with timer.stage('overlap') as path:
+                    self.assertEqual('k25d/overlap', path)
+        totals = timer.totals()
+        self.assertEqual(['k25d', 'k25d/overlap'], list(totals.keys()))
+        self.assertEqual(3, totals['k25d/overlap'].count)
+        self.assertGreaterEqual(totals['k25d'].duration, totals['k25d/overlap'].duration)
+
+    def test_stages_nested_per_thread(self):
+        timer = StageTimer()
+
+        def run_engine():
+            with timer.stage('FasterCap'):
+                with timer.stage('solver'):
+                    pass
+
+        with timer.stage('k25d'):
+            thread = threading.Thread(target=run_engine)
+            thread.start()
+            thread.join()
+        self.assertEqual({'k25d', 'FasterCap', 'FasterCap/solver'}, set(timer.totals().keys()))
+
+    def test_profiles_one_thread_at_a_time(self):
+        timer = StageTimer(profile=True)
+        both_started = threading.Barrier(2)
+        errors = []
+
+        def run_engine(name: str):
+            try:
+                with timer.stage(name):
+                    both_started.wait(timeout=10)
+                    busy(1000)
+                    both_started.wait(timeout=10)
+            except BaseException as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run_engine, args=(name,)) for name in ('FasterCap', 'k25d')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual({'FasterCap', 'k25d'}, set(timer.totals().keys()))
+        self.assertEqual(1, len(timer._profiles))  # NOTE: the other thread was only timed
+
+        # NOTE: once the profiled stages have ended, any thread can be profiled
+        thread = threading.Thread(target=run_engine, args=('MAGIC',))
+        both_started.reset()
+        thread.start()
+        both_started.wait(timeout=10)
+        both_started.wait(timeout=10)
+        thread.join()
+        self.assertEqual([], errors)
+        self.assertIn('MAGIC', timer._profiles)
+
+    def test_merge_worker_timings(self):
+        worker_timer = StageTimer()
+        with worker_timer.stage('sidewall_and_fringe'):
+            pass
+        timer = StageTimer()
+        with timer.stage('k25d'):
+            timer.merge(worker_timer.export())
+        self.assertEqual(['k25d', 'k25d/sidewall_and_fringe'], sorted(timer.totals().keys()))
+
+    def test_memory_usage(self):
+        timer = StageTimer()
+        with timer.stage('allocation'):
+            data = bytearray(64 * 1024 * 1024)
+            data[::4096] = b'x' * len(data[::4096])  # NOTE: touch the pages, so they become resident
+        del data
+        timing = timer.timings[0]
+        if timing.rss_start is None:
+            self.skipTest('RSS not available on this platform')
+        self.assertEqual(os.getpid(), timing.pid)
+        self.assertGreater(timing.rss_delta, 32 * 1024 * 1024)
+        self.assertGreater(timing.peak_rss, 32 * 1024 * 1024)
+        self.assertGreaterEqual(timing.peak_rss_increase, 0)
+        self.assertEqual(timing.rss_delta, timer.totals()['allocation'].max_rss_delta)
+
+    def test_metrics(self):
+        worker_timer = StageTimer()
+        worker_timer.count_metric('edge neighborhood callbacks by layer', 'met1', 5)
+        timer = StageTimer()
+        previous_timer = set_stage_timer(timer)
+        try:
+            count_metric('edge neighborhood callbacks by layer', 'met1', 2)
+            record_metric('polygons by layer', 'met1_con', 7)
+            record_metric('polygons by layer', 'met1_con', 8)
+        finally:
+            set_stage_timer(previous_timer)
+        timer.merge(worker_timer.export())
+        self.assertEqual({'edge neighborhood callbacks by layer': {'met1': 7},
+                          'polygons by layer': {'met1_con': 8}},
+                         timer.metrics)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            metrics_path = os.path.join(tmp, 'metrics.json')
+            timer.write_metrics_json(metrics_path)
+            with open(metrics_path) as f:
+                content = json.load(f)
+            self.assertEqual(timer.metrics, content['metrics'])
+
+    def test_stage_without_timer(self):
+        previous_timer = set_stage_timer(None)
+        try:
+            with stage('LVS') as path:
+                self.assertIsNone(path)
+            count_metric('polygons by layer', 'met1_con', 1)  # ignored
+        finally:
+            set_stage_timer(previous_timer)
+
+    def test_write_json_and_profiles(self):
+        worker_timer = StageTimer(profile=True)
+        with worker_timer.stage('overlap'):
+            busy(1000)
+
+        timer = StageTimer(profile=True)
+        previous_timer = set_stage_timer(timer)
+        try:
+            with stage('k25d'):
+                busy(1000)
+                with stage('overlap'):
+                    busy(1000)
+                timer.merge(worker_timer.export())
+        finally:
+            set_stage_timer(previous_timer)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'timings.json')
+            timer.write_json(json_path)
+            with open(json_path) as f:
+                content = json.load(f)
+            self.assertEqual(['k25d', 'k25d/overlap', 'k25d/overlap'], sorted(t['path'] for t in content['stages']))
+            self.assertEqual(2, content['totals']['k25d/overlap']['count'])
+
+            paths = timer.write_profiles(os.path.join(tmp, 'profiles'))
+            self.assertEqual(['k25d.pstats', 'k25d.overlap.pstats'], [os.path.basename(p) for p in paths])
+            overlap_stats = pstats.Stats(paths[1])
+            busy_calls = [calls for (file, line, name), (calls, *_) in overlap_stats.stats.items()
+                          if name == 'busy']
+            self.assertEqual([2], busy_calls)  # the local and the merged profile
+            k25d_stats = pstats.Stats(paths[0])
+            busy_calls = [calls for (file, line, name), (calls, *_) in k25d_stats.stats.items()
+                          if name == 'busy']
+            self.assertEqual([1], busy_calls)  # the nested stage is excluded